@@ -0,0 +1,669 @@
+# Micro-benchmarks for the helpers of PR_Final_WinYaoPhil_functions, run with: python PR_Final_WinYaoPhil_benchmarks.py
+
+import os
+import sys
+import copy
+import json
+import math
+import time
+import shutil
+import timeit
+import zipfile
+import tracemalloc
+import platform
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from PR_Final_WinYaoPhil_functions import *
+from PR_Final_WinYaoPhil_panel import Panel
+from PR_Final_WinYaoPhil_levels import pyramid_matrix
+from PR_Final_WinYaoPhil_stats import bootstrap_pyramid
+
+# packages that must not be imported with the functions module, they are loaded on first use by the plot and scrape
+# functions
+LAZY_PACKAGES = ['matplotlib', 'seaborn', 'requests', 'bs4']
+
+# cumulative import time allowed for PR_Final_WinYaoPhil_functions, in microseconds
+IMPORT_BUDGET = 1000000
+
+# thresholds checked by the benchmark runner (python PR_Final_WinYaoPhil_benchmarks.py) on the result of every
+# benchmark: the result key, its smallest and its largest allowed value; the doctests only check the shape of the
+# results, since the timings depend on the load of the machine, except for the import budget, which is generous enough
+# to be enforced by the import_times doctest
+TARGETS = {
+    'bench_sorted_pairs': ('speedup', 2, None),
+    'bench_marriage_rate': ('speedup', 2, None),
+    'bench_pyramid': ('speedup', 1, None),
+    'bench_bootstrap': ('seconds', None, 5),
+    'bench_compact': ('factor', 2, None),
+    'import_times': ('PR_Final_WinYaoPhil_functions', None, IMPORT_BUDGET),
+}
+
+
+def legacy_sorted_pairs(df: pd.DataFrame, x_col: str, y_col: str) -> (np.ndarray, np.ndarray):
+    """
+    The row by row NaN filtering that the analysis functions used before sorted_pairs, kept as the benchmark baseline
+
+    :param df: Data Frame holding the lower and higher level columns
+    :param x_col: name of the lower level column
+    :param y_col: name of the higher level column
+    :return: arrays of the lower level data (sorted) and the corresponding higher level data
+    """
+    dd = df.sort_values(by=x_col, ascending=True)
+    x = np.asarray(dd[x_col])
+    y = np.asarray(dd[y_col])
+    index_list = []
+    for j in range(x.shape[0]):
+        if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
+            index_list.append(j)
+    new_x = np.delete(x, index_list)
+    new_y = np.delete(y, index_list)
+    return new_x, new_y
+
+
+def synthetic_panel(n_countries: int = 5000, n_years: int = 10, nan_share: float = 0.1,
+                    seed: int = 0) -> pd.DataFrame:
+    """
+    The function to make a wide panel shaped like the merged frames of the analysis functions, with one lower level
+    column (x_<year>) and one higher level column (y_<year>) per year and some missing values
+
+    :param n_countries: number of rows
+    :param n_years: number of years
+    :param nan_share: share of missing values in every column
+    :param seed: seed of the random generator
+    :return: the synthetic Data Frame
+
+    >>> synthetic_panel(10, 2).shape
+    (10, 5)
+    """
+    rng = np.random.default_rng(seed)
+    data = {'Country': ['country_%d' % i for i in range(n_countries)]}
+    for year in range(2010, 2010 + n_years):
+        x = rng.uniform(0, 50, n_countries)
+        y = 4 - x / 25 + rng.normal(0, 0.3, n_countries)
+        x[rng.random(n_countries) < nan_share] = np.nan
+        y[rng.random(n_countries) < nan_share] = np.nan
+        data['x_%d' % year] = x
+        data['y_%d' % year] = y
+    return pd.DataFrame(data)
+
+
+def bench_sorted_pairs(n_countries: int = 5000, n_years: int = 10, repeat: int = 3) -> dict:
+    """
+    The micro-benchmark comparing the row by row NaN filtering with sorted_pairs on a countries x years panel
+
+    :param n_countries: number of countries of the synthetic panel
+    :param n_years: number of years of the synthetic panel
+    :param repeat: number of timing runs, the best one is kept
+    :return: dict with the best time in seconds of both versions and the speedup
+
+    >>> result = bench_sorted_pairs(2000, 5, repeat=1)
+    >>> sorted(result), all(isinstance(value, float) for value in result.values())
+    (['legacy', 'speedup', 'vectorized'], True)
+    """
+    df = synthetic_panel(n_countries, n_years)
+    years = range(2010, 2010 + n_years)
+
+    def run(extract):
+        for year in years:
+            extract(df, 'x_%d' % year, 'y_%d' % year)
+
+    legacy = min(timeit.repeat(lambda: run(legacy_sorted_pairs), number=1, repeat=repeat))
+    vectorized = min(timeit.repeat(lambda: run(sorted_pairs), number=1, repeat=repeat))
+    return {'legacy': legacy, 'vectorized': vectorized, 'speedup': legacy / vectorized}
+
+
+def legacy_get_marriage_rate(married: pd.DataFrame) -> list:
+    """
+    The year by year marriage rate calculation that get_marriage_rate used before the single pivot table pass, kept as
+    the benchmark baseline
+
+    :param married: The original marriage dataset
+    :return: list of the per year Data Frames
+    """
+    percent_married = []
+    for i in range(8):
+        total = married.loc[(married['Marital status']=='Total') & (married['Age']=='Total')].groupby(['Year', 'Country or Area'], as_index=False).sum()
+        single = married.loc[(married['Marital status']=='Single (never married)') & (married['Age']=='Total')].groupby(['Year', 'Country or Area'], as_index=False).sum()
+        single_pop = single[single['Year'] == 2010+i].groupby(['Year', 'Country or Area']).sum()['Value']
+        total_pop = total[total['Year'] == 2010+i].groupby(['Year', 'Country or Area']).sum()['Value']
+        df1 = (total_pop-single_pop)/total_pop
+        df = pd.concat([total_pop.to_frame().reset_index(), df1.to_frame().reset_index()['Value']],axis=1)
+        df.columns = ['Year','Country','Total_pop','Marriage_Rate']
+        percent_married.append(df)
+    return percent_married
+
+
+def synthetic_marital(n_countries: int = 200, seed: int = 0, names: list = None) -> pd.DataFrame:
+    """
+    The function to make a frame shaped like the UN marital status dataset: every country has, for the years 2010 to
+    2017, the population by sex, age group and marital status
+
+    :param n_countries: number of countries
+    :param seed: seed of the random generator
+    :param names: names of the countries, 'country_<i>' if None (then n_countries is ignored)
+    :return: the synthetic Data Frame
+
+    >>> synthetic_marital(2).shape
+    (960, 5)
+    """
+    rng = np.random.default_rng(seed)
+    if names is None:
+        names = ['country_%d' % i for i in range(n_countries)]
+    index = pd.MultiIndex.from_product([list(names), range(2010, 2018),
+                                        ['Both Sexes', 'Male', 'Female'], ['Total', '15-19', '20-24', '25-29'],
+                                        ['Total', 'Single (never married)', 'Married', 'Widowed', 'Divorced']],
+                                       names=['Country or Area', 'Year', 'Sex', 'Age', 'Marital status'])
+    df = index.to_frame(index=False)
+    df['Value'] = rng.integers(1000, 100000, len(df)).astype(float)
+    return df.drop(columns='Sex')
+
+
+def bench_marriage_rate(n_countries: int = 200, repeat: int = 3) -> dict:
+    """
+    The micro-benchmark comparing the year by year marriage rate calculation with the single pivot table pass
+
+    :param n_countries: number of countries of the synthetic marital dataset
+    :param repeat: number of timing runs, the best one is kept
+    :return: dict with the best time in seconds of both versions and the speedup
+
+    >>> result = bench_marriage_rate(50, repeat=1)
+    >>> sorted(result), all(isinstance(value, float) for value in result.values())
+    (['legacy', 'speedup', 'vectorized'], True)
+    """
+    married = synthetic_marital(n_countries)
+    legacy = min(timeit.repeat(lambda: legacy_get_marriage_rate(married), number=1, repeat=repeat))
+    vectorized = min(timeit.repeat(lambda: get_marriage_rate(married), number=1, repeat=repeat))
+    return {'legacy': legacy, 'vectorized': vectorized, 'speedup': legacy / vectorized}
+
+
+def sequential_parts() -> list:
+    """
+    The analysis steps of the driver script run one after the other, as done before the pyramid matrix: parts 1 and
+    2-2 to 7 (part 2 needs the marital status files, which are not shipped with the datasets)
+
+    :return: list of the (x_list, y_list) of every part
+    """
+    data = Data()
+    hunger_data = data.get_hunger()
+    peace_data = data.get_peace()
+    happiness = data.get_happiness()
+    happiness['2017.csv'] = happiness['2017.csv'][['Country', 'Happiness.Score']]
+    happiness['2017.csv'].columns = ['Country', 'Happiness Score']
+    freedom = data.get_freedom()
+    df_free_data = pd.concat([freedom['year'], freedom['countries'], freedom['hf_score']], axis=1)
+    df_free_data.columns = ['Year', 'Country', 'Human_Freedom_Score']
+    free_list = prep_freedom()
+    inno_list = prep_innovation()
+    results = [analysis_first_two_level(hunger_data, peace_data),
+               analysis_peace_happiness_level(peace_data, happiness),
+               analysis_happiness_Freedom_level(happiness, df_free_data),
+               analysis_two_fourth_level(peace_data, df_free_data),
+               analysis_level45(inno_list, free_list),
+               analysis_first_fourth_level(hunger_data, df_free_data),
+               analysis_level15(hunger_data, inno_list)]
+    return [result[:2] for result in results]
+
+
+def bench_pyramid(repeat: int = 3) -> dict:
+    """
+    The benchmark comparing the sequential analysis parts of the driver script with building the panel and computing
+    every pair of levels in every year with pyramid_matrix (both read the datasets through the loader memo)
+
+    :param repeat: number of timing runs, the best one is kept
+    :return: dict with the best time in seconds of both versions and the speedup
+
+    >>> result = bench_pyramid(repeat=1)
+    >>> sorted(result), all(isinstance(value, float) for value in result.values())
+    (['legacy', 'speedup', 'vectorized'], True)
+    """
+    sequential_parts()
+    legacy = min(timeit.repeat(sequential_parts, number=1, repeat=repeat))
+    batched = min(timeit.repeat(lambda: pyramid_matrix(Panel.from_data()), number=1, repeat=repeat))
+    return {'legacy': legacy, 'vectorized': batched, 'speedup': legacy / batched}
+
+
+def bench_bootstrap(n_boot: int = 2000, repeat: int = 3) -> dict:
+    """
+    The benchmark of the bootstrap confidence intervals of the binned trends of every pair of levels in every year
+
+    :param n_boot: number of bootstrap replicates
+    :param repeat: number of timing runs, the best one is kept
+    :return: dict with the best time in seconds, the number of bins and the number of resampled values per replicate
+
+    >>> result = bench_bootstrap(n_boot=100, repeat=1)
+    >>> sorted(result), isinstance(result['seconds'], float), result['bins'] > 0, result['values'] > 0
+    (['bins', 'seconds', 'values'], True, True, True)
+    """
+    panel = Panel.from_data()
+    bands = bootstrap_pyramid(panel, n_boot=10)
+    seconds = min(timeit.repeat(lambda: bootstrap_pyramid(panel, n_boot=n_boot), number=1, repeat=repeat))
+    return {'seconds': seconds, 'bins': len(bands), 'values': int(bands['count'].sum())}
+
+
+def import_times(module: str = 'PR_Final_WinYaoPhil_functions') -> dict:
+    """
+    The function to measure the import of a module in a new interpreter with python -X importtime
+
+    :param module: name of the module to import
+    :return: dict of every module imported on the way -> cumulative import time in microseconds
+
+    >>> times = import_times('PR_Final_WinYaoPhil_functions')
+    >>> sorted(name for name in times if name.split('.')[0] in LAZY_PACKAGES)
+    []
+    >>> times['PR_Final_WinYaoPhil_functions'] < IMPORT_BUDGET
+    True
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+# the loaders whose frames are measured by bench_compact
+COMPACT_LOADERS = ['get_freedom', 'get_suicide', 'get_trade', 'get_hunger', 'get_happiness', 'get_peace']
+
+
+def loaded_memory(compact: bool) -> (float, float):
+    """
+    The function to measure with tracemalloc the memory taken by the frames of COMPACT_LOADERS (numpy and pandas
+    report their buffers to tracemalloc), the loader memo is emptied before and after
+
+    :param compact: whether the frames are loaded in the compact mode
+    :return: memory held by the loaded frames and peak memory while loading them, in MB
+    """
+    Data.clear()
+    data = Data(compact=compact)
+    tracemalloc.start()
+    try:
+        frames = [getattr(data, name)() for name in COMPACT_LOADERS]
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        Data.clear()
+    return current / 1024 ** 2, peak / 1024 ** 2
+
+
+def bench_compact() -> dict:
+    """
+    The benchmark comparing the memory of the loaded frames with and without the compact load mode (the on-disk frame
+    cache is filled first, so both modes load from it)
+
+    :return: dict with the memory in MB held by the frames of both modes, their peak while loading and the factor
+    between the held memory
+
+    >>> result = bench_compact()
+    >>> sorted(result), all(isinstance(value, float) and value > 0 for value in result.values())
+    (['compact', 'compact_peak', 'factor', 'full', 'full_peak'], True)
+    """
+    loaded_memory(False)
+    loaded_memory(True)
+    full, full_peak = loaded_memory(False)
+    compact, compact_peak = loaded_memory(True)
+    return {'full': full, 'compact': compact, 'full_peak': full_peak, 'compact_peak': compact_peak,
+            'factor': full / compact}
+
+
+# the files of the data folder copied by scaled_datasets, with the column holding the country names and the separator
+SCALED_FILES = {
+    'Hunger.csv': ('Country Name', '\t'),
+    'gpi_2010-2018.csv': ('country', ','),
+    'world-happiness-report.zip': ('Country', ','),
+    'the-human-freedom-index.zip': ('countries', ','),
+    'Innovation.zip': ('Economy', ','),
+}
+
+# the analysis functions of the driver script: the inputs they take, their plot functions and their box plot function
+ANALYSES = [
+    ('analysis_first_two_level', ('hunger', 'peace'), ['plot12', 'plot_cat12'], 'box_plot_level12'),
+    ('analysis_two_third_level', ('peace', 'percent_married'), ['plot_level_23'], None),
+    ('analysis_peace_happiness_level', ('peace', 'happiness'), ['plot_level_p_h', 'plot_cat_ph'], 'box_plot_level_ph'),
+    ('analysis_happiness_Freedom_level', ('happiness', 'df_free'), ['plot_level_h_f', 'plot_cat_hf'],
+     'box_plot_level_hf'),
+    ('analysis_two_fourth_level', ('peace', 'df_free'), ['plot_level_24', 'plot_cat24'], 'box_plot_level24'),
+    ('analysis_level45', ('inno_list', 'free_list'), ['plot45', 'plot45_cat'], 'box_plot_45'),
+    ('analysis_first_fourth_level', ('hunger', 'df_free'), ['plot_14', 'plot_cat_level14'], 'box_plot_level14'),
+    ('analysis_level15', ('hunger', 'inno_list'), ['plot_15', 'plot_cat_level15'], 'box_plot_level15'),
+]
+
+# the Data loaders timed by the suite, with whether their files are in SCALED_FILES (the others only run at scale 1)
+LOADERS = {'get_hunger': True, 'get_peace': True, 'get_happiness': True, 'get_freedom': True, 'get_innovation': True,
+           'get_marital': False, 'get_unemployment': False, 'get_suicide': False, 'get_poverty': False,
+           'get_trade': False}
+
+# json lines file the suite results are appended to, one line per benchmark and scale
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmarks', 'results.jsonl')
+
+
+def scale_frame(df: pd.DataFrame, column: str, scale: int) -> pd.DataFrame:
+    """
+    The function to repeat the rows of a dataset scale times, the copies get the country name followed by their number
+
+    :param df: the dataset
+    :param column: name of the country column
+    :param scale: number of copies
+    :return: the scaled Data Frame
+
+    >>> scale_frame(pd.DataFrame({'Country': ['Chad', 'Peru'], 'Value': [1, 2]}), 'Country', 2)['Country'].tolist()
+    ['Chad', 'Peru', 'Chad 1', 'Peru 1']
+    """
+    copies = []
+    for k in range(scale):
+        part = df.copy()
+        if k:
+            part[column] = part[column] + ' %d' % k
+        copies.append(part)
+    return pd.concat(copies, ignore_index=True)
+
+
+def scaled_datasets(scale: int, directory: str, source: str = '590PR_final_datasets') -> str:
+    """
+    The function to write a data folder with every dataset of SCALED_FILES scaled up to scale times the countries, so
+    the loaders, analyses and plots can be timed on bigger panels than the bundled ones. The files keep their name,
+    format and zip members, the values are read and written back as text.
+
+    :param scale: number of copies of every country
+    :param directory: folder to write, created if missing
+    :param source: the bundled data folder
+    :return: the folder
+
+    >>> folder = scaled_datasets(3, tempfile.mkdtemp())
+    >>> len(Data(folder).get_hunger()) == 3 * len(Data().get_hunger())
+    True
+    """
+    os.makedirs(directory, exist_ok=True)
+    for file_name, (column, sep) in SCALED_FILES.items():
+        path = os.path.join(source, file_name)
+        target = os.path.join(directory, file_name)
+        options = {'sep': sep, 'dtype': str, 'keep_default_na': False}
+        if not file_name.endswith('.zip'):
+            scale_frame(pd.read_csv(path, **options), column, scale).to_csv(target, sep=sep, index=False)
+            continue
+        with zipfile.ZipFile(path) as zf, zipfile.ZipFile(target, 'w', zipfile.ZIP_DEFLATED) as out:
+            for member in zf.namelist():
+                df = scale_frame(pd.read_csv(zf.open(member), **options), column, scale)
+                out.writestr(member, df.to_csv(sep=sep, index=False))
+    return directory
+
+
+def suite_inputs(data: Data) -> dict:
+    """
+    The function to prepare the inputs of the analysis functions the way the driver script does. The marital status
+    files are not shipped with the datasets, so the marriage rates come from synthetic_marital on the peace countries.
+
+    :param data: the Data object to load from
+    :return: dict of input name -> value, with the married dataset under 'married'
+    """
+    hunger = data.get_hunger()
+    peace = data.get_peace()
+    happiness = data.get_happiness()
+    happiness['2017.csv'] = happiness['2017.csv'][['Country', 'Happiness.Score']]
+    happiness['2017.csv'].columns = ['Country', 'Happiness Score']
+    freedom = data.get_freedom()
+    df_free = pd.concat([freedom['year'], freedom['countries'], freedom['hf_score']], axis=1)
+    df_free.columns = ['Year', 'Country', 'Human_Freedom_Score']
+    married = synthetic_marital(names=peace['Country'])
+    return {'hunger': hunger, 'peace': peace, 'happiness': happiness, 'df_free': df_free,
+            'free_list': prep_freedom(data), 'inno_list': prep_innovation(data), 'married': married,
+            'percent_married': get_marriage_rate(married)}
+
+
+def time_case(run, setup=None, repeat: int = 5) -> dict:
+    """
+    The function to time one benchmark the asv way: one untimed warm up call, then repeat timed calls, each one after
+    its own untimed setup
+
+    :param run: the function to time, called with the values returned by setup
+    :param setup: function returning the tuple of arguments of run, no arguments if None
+    :param repeat: number of timed calls
+    :return: dict with the min, median and mean time in seconds and the number of timed calls
+
+    >>> time_case(lambda n: sum(range(n)), lambda: (1000,), repeat=3)['repeat']
+    3
+    """
+    if setup is None:
+        setup = tuple
+    run(*setup())
+    times = []
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': float(np.median(times)), 'mean': float(np.mean(times)), 'repeat': repeat}
+
+
+def suite_cases(data: Data, out_dir: str, scaled: bool = False) -> list:
+    """
+    The function to list the benchmarks of the suite on one data folder: every Data loader (its memoized value is
+    dropped before each call, the on-disk frame cache stays warm), prep_freedom, prep_innovation, get_marriage_rate,
+    every analysis function and every plot function drawn by the headless renderer without the plot cache
+
+    :param data: the Data object to load from
+    :param out_dir: folder of the figures
+    :param scaled: whether the data folder was written by scaled_datasets, then only the loaders of its files are timed
+    :return: list of (group, name, run, setup) tuples, setup is None for the loaders
+    """
+    inputs = suite_inputs(data)
+    results = {}
+    cases = []
+
+    def loader(name):
+        def setup():
+            Data.memo.discard(name)
+            if name == 'get_peace':
+                Data.memo.discard('read_peace')
+            return ()
+        return lambda: getattr(data, name)(), setup
+
+    for name in LOADERS:
+        if scaled and not LOADERS[name]:
+            continue
+        run, setup = loader(name)
+        cases.append(('loaders', name, run, setup))
+    cases.append(('prep', 'prep_freedom', lambda: prep_freedom(data), None))
+    cases.append(('prep', 'prep_innovation', lambda: prep_innovation(data), None))
+    cases.append(('prep', 'get_marriage_rate', get_marriage_rate, lambda: (inputs['married'].copy(),)))
+    for analysis, names, plots, box_plot in ANALYSES:
+        function = globals()[analysis]
+        setup = lambda names=names: tuple(copy.deepcopy(inputs[name]) for name in names)
+        results[analysis] = function(*setup())
+        cases.append(('analyses', analysis, function, setup))
+        for plot in plots:
+            cases.append(('plots', plot, globals()[plot], lambda analysis=analysis: results[analysis][:2]))
+        if box_plot is not None:
+            cases.append(('plots', box_plot, globals()[box_plot], lambda analysis=analysis: results[analysis][2:]))
+    render.start(out_dir, cache=False)
+    return cases
+
+
+def git_commit() -> (str, bool):
+    """
+    The function to find the commit the benchmarks run on
+
+    :return: the commit hash (None outside of a git repository) and whether the working tree has changes
+    """
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=cwd, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, universal_newlines=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=cwd,
+                                stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def run_suite(scales: list = (1, 10, 100), only: list = None, repeat: int = 5,
+              results_path: str = RESULTS_PATH) -> pd.DataFrame:
+    """
+    The function to run the benchmark suite on the bundled datasets (scale 1) and on scaled up copies of them, and to
+    append the results to a json lines file together with the git commit, so runs of different commits can be compared
+    with compare_results. A benchmark that fails, like get_marital without the marital status files, is recorded with
+    its error.
+
+    :param scales: numbers of copies of every country, 1 is the bundled datasets
+    :param only: names of the benchmarks to run, every one if None
+    :param repeat: number of timed calls of every benchmark
+    :param results_path: json lines file to append to, nothing is written if None
+    :return: Data Frame of the results, one row per benchmark and scale
+
+    >>> path = os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+    >>> results = run_suite([1, 2], only=['get_hunger', 'analysis_level45', 'plot45'], repeat=1, results_path=path)
+    >>> results[['group', 'benchmark', 'scale']].values.tolist()[:3]
+    [['loaders', 'get_hunger', 1], ['analyses', 'analysis_level45', 1], ['plots', 'plot45', 1]]
+    >>> len(pd.read_json(path, lines=True)), results['error'].isna().all()
+    (6, True)
+    """
+    commit, dirty = git_commit()
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+    rows = []
+    work = tempfile.mkdtemp(prefix='bench-')
+    try:
+        for scale in scales:
+            if scale == 1:
+                data = Data()
+            else:
+                data = Data(scaled_datasets(scale, os.path.join(work, 'data-%d' % scale)))
+            Data.clear()
+            try:
+                cases = suite_cases(data, os.path.join(work, 'figures-%d' % scale), scale != 1)
+                countries = len(data.get_peace())
+                for group, name, run, setup in cases:
+                    if only is not None and name not in only:
+                        continue
+                    row = {'commit': commit, 'dirty': dirty, 'date': stamp, 'python': platform.python_version(),
+                           'machine': platform.node(), 'group': group, 'benchmark': name, 'scale': scale,
+                           'countries': countries, 'error': None}
+                    try:
+                        row.update(time_case(run, setup, repeat))
+                    except Exception as e:
+                        row['error'] = '%s: %s' % (type(e).__name__, e)
+                    rows.append(row)
+            finally:
+                render.stop()
+                Data.clear()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    if results_path is not None:
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+        with open(results_path, 'a') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    return pd.DataFrame(rows)
+
+
+def compare_results(results_path: str = RESULTS_PATH, base: str = None, head: str = None,
+                    factor: float = 1.2) -> pd.DataFrame:
+    """
+    The function to compare the best times of two commits in the results file, like asv compare
+
+    :param results_path: json lines file written by run_suite
+    :param base: commit to compare against, the one before head in the file if None
+    :param head: commit to compare, the last one of the file if None
+    :param factor: ratio of the times above which a benchmark is marked as a regression
+    :return: Data Frame with the base and head time, their ratio and the regression flag per benchmark and scale
+
+    >>> path = os.path.join(tempfile.mkdtemp(), 'results.jsonl')
+    >>> pd.DataFrame({'commit': ['a', 'b', 'a', 'b'], 'benchmark': ['plot', 'plot', 'load', 'load'], 'scale': 1,
+    ...               'min': [1.0, 1.5, 2.0, 1.0]}).to_json(path, orient='records', lines=True)
+    >>> compare_results(path)[['benchmark', 'ratio', 'regression']].values.tolist()
+    [['load', 0.5, False], ['plot', 1.5, True]]
+    >>> try:
+    ...     compare_results(path, head='a')
+    ... except ValueError as e:
+    ...     str(e).startswith('no commit before a in')
+    True
+    """
+    results = pd.read_json(results_path, lines=True, dtype={'commit': str})
+    commits = list(dict.fromkeys(results['commit']))
+    if head is None:
+        head = commits[-1]
+    if base is None:
+        if commits.index(head) == 0:
+            raise ValueError('no commit before %s in %s to compare with, run the suite on another commit first'
+                             % (head, results_path))
+        base = commits[commits.index(head) - 1]
+    if base == head:
+        raise ValueError('can not compare commit %s with itself' % head)
+    best = results.groupby(['commit', 'benchmark', 'scale'])['min'].min()
+    table = pd.concat([best[base].rename('base'), best[head].rename('head')], axis=1).reset_index()
+    table['ratio'] = table['head'] / table['base']
+    table['regression'] = table['ratio'] > factor
+    return table
+
+
+def missed_target(benchmark: str, result: dict) -> str:
+    """
+    The function to check the result of a benchmark against its entry of TARGETS
+
+    :param benchmark: name of the benchmark function
+    :param result: dict returned by the benchmark
+    :return: message telling which threshold was missed, None when the result meets its target
+
+    >>> missed_target('bench_sorted_pairs', {'speedup': 1.5})
+    'bench_sorted_pairs: speedup 1.5 below 2'
+    >>> missed_target('bench_sorted_pairs', {'speedup': 3.0}) is None
+    True
+    """
+    key, low, high = TARGETS[benchmark]
+    value = result[key]
+    if low is not None and value < low:
+        return '%s: %s %g below %g' % (benchmark, key, value, low)
+    if high is not None and value > high:
+        return '%s: %s %g above %g' % (benchmark, key, value, high)
+    return None
+
+
+if __name__ == '__main__':
+    # python PR_Final_WinYaoPhil_benchmarks.py suite [scale ...] runs the suite and compares with the previous commit
+    if sys.argv[1:2] == ['suite']:
+        results = run_suite([int(scale) for scale in sys.argv[2:]] or (1, 10, 100))
+        print(results.pivot_table(index=['group', 'benchmark'], columns='scale', values='min', sort=False)
+              .round(4).to_string())
+        for row in results.dropna(subset=['error']).itertuples():
+            print('%s at scale %d failed: %s' % (row.benchmark, row.scale, row.error))
+        try:
+            table = compare_results()
+            print(table[table['regression']].to_string(index=False))
+        except ValueError as e:
+            print('not compared: %s' % e)
+        sys.exit()
+    missed = []
+    for n_countries in [200, 2000, 20000]:
+        result = bench_sorted_pairs(n_countries, 10)
+        missed.append(missed_target('bench_sorted_pairs', result))
+        print('sorted_pairs, %6d countries x 10 years: legacy %.4fs, vectorized %.4fs, speedup %.1fx'
+              % (n_countries, result['legacy'], result['vectorized'], result['speedup']))
+    for n_countries in [50, 200, 1000]:
+        result = bench_marriage_rate(n_countries)
+        missed.append(missed_target('bench_marriage_rate', result))
+        print('get_marriage_rate, %4d countries x 8 years: legacy %.4fs, vectorized %.4fs, speedup %.1fx'
+              % (n_countries, result['legacy'], result['vectorized'], result['speedup']))
+    result = bench_pyramid()
+    missed.append(missed_target('bench_pyramid', result))
+    print('7 sequential parts %.4fs, panel + all 10 pairs x all years %.4fs, speedup %.1fx'
+          % (result['legacy'], result['vectorized'], result['speedup']))
+    result = bench_bootstrap()
+    missed.append(missed_target('bench_bootstrap', result))
+    print('bootstrap of %d bins (%d values) x 2000 replicates: %.3fs' % (result['bins'], result['values'],
+                                                                        result['seconds']))
+    result = bench_compact()
+    missed.append(missed_target('bench_compact', result))
+    print('loaded frames: %.1f MB (peak %.1f MB), compact %.1f MB (peak %.1f MB), %.1fx less memory'
+          % (result['full'], result['full_peak'], result['compact'], result['compact_peak'], result['factor']))
+    times = import_times()
+    missed.append(missed_target('import_times', times))
+    print('import PR_Final_WinYaoPhil_functions: %.3fs (budget %.3fs)'
+          % (times['PR_Final_WinYaoPhil_functions'] / 1e6, IMPORT_BUDGET / 1e6))
+    missed = [message for message in missed if message is not None]
+    for message in missed:
+        print('missed target %s' % message)
+    sys.exit(1 if missed else 0)
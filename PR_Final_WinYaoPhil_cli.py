@@ -0,0 +1,412 @@
+# Command line runner of the level pair analyses, for example:
+# python PR_Final_WinYaoPhil_cli.py run --pairs 1-2,4-5 --years 2013-2016 --out results --format csv,png --jobs 4
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+from PR_Final_WinYaoPhil_functions import Data
+from PR_Final_WinYaoPhil_countries import CountryIndex
+from PR_Final_WinYaoPhil_panel import Panel, SOURCES
+from PR_Final_WinYaoPhil_levels import LEVEL_INDICATORS, LEVEL_PAIRS, LevelPair, pair_years, pyramid_matrix
+from PR_Final_WinYaoPhil_parallel import PARTS, part_tasks, run_task, start_worker
+
+DATA_FORMATS = ['csv', 'json', 'parquet']
+FIGURE_FORMATS = ['png', 'svg']
+
+
+class Scheduler(object):
+    """
+    Runs a graph of named tasks, each one as soon as the tasks it depends on are done.
+
+    A task is a function called with the results of its dependencies, in the order they were given. With more than
+    one job, the ready tasks run in a pool of threads (the figure tasks hand their work to a process pool, the loaders
+    mostly wait on files and pandas).
+
+    >>> scheduler = Scheduler()
+    >>> scheduler.add('a', lambda: 2)
+    >>> scheduler.add('b', lambda: 3)
+    >>> scheduler.add('product', lambda a, b: a * b, ['a', 'b'])
+    >>> scheduler.run(jobs=2)['product']
+    6
+    >>> scheduler.order()
+    ['a', 'b', 'product']
+    """
+    def __init__(self: object):
+        self.tasks = OrderedDict()
+        self.seconds = OrderedDict()
+
+    def add(self: object, name: str, task, depends: list = ()):
+        """
+        The function to add one task
+
+        :param name: unique name of the task
+        :param task: function called with the results of the dependencies
+        :param depends: names of the tasks whose results are needed
+        """
+        if name in self.tasks:
+            raise ValueError('task %r is scheduled twice' % name)
+        self.tasks[name] = (task, list(depends))
+
+    def order(self: object) -> list:
+        """
+        The function to sort the tasks so that every task comes after its dependencies
+
+        :return: list of task names
+        """
+        done = []
+        pending = OrderedDict((name, set(depends)) for name, (task, depends) in self.tasks.items())
+        for name, depends in pending.items():
+            unknown = depends - set(self.tasks)
+            if unknown:
+                raise ValueError('task %r depends on unknown tasks %s' % (name, sorted(unknown)))
+        while pending:
+            ready = [name for name, depends in pending.items() if depends <= set(done)]
+            if not ready:
+                raise ValueError('tasks %s depend on each other' % sorted(pending))
+            for name in ready:
+                done.append(name)
+                del pending[name]
+        return done
+
+    def call(self: object, name: str, results: dict):
+        task, depends = self.tasks[name]
+        start = time.time()
+        result = task(*[results[depend] for depend in depends])
+        self.seconds[name] = time.time() - start
+        return result
+
+    def run(self: object, jobs: int = 1) -> dict:
+        """
+        The function to run every task
+
+        :param jobs: number of tasks running at the same time
+        :return: dict of task name -> result
+        """
+        order = self.order()
+        results = {}
+        if jobs <= 1:
+            for name in order:
+                results[name] = self.call(name, results)
+            return results
+        running = {}
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while len(results) < len(order):
+                for name in order:
+                    if name in results or name in running.values():
+                        continue
+                    if all(depend in results for depend in self.tasks[name][1]):
+                        running[pool.submit(self.call, name, dict(results))] = name
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results[running.pop(future)] = future.result()
+        return results
+
+
+def parse_pairs(text: str) -> list:
+    """
+    The function to read the --pairs option: level pairs like 1-2 separated by commas, or 'all'
+
+    :param text: value of the option
+    :return: list of (lower level, higher level) tuples
+
+    >>> parse_pairs('1-2,4-5'), len(parse_pairs('all'))
+    ([(1, 2), (4, 5)], 10)
+    """
+    levels = sorted(LEVEL_INDICATORS)
+    if text == 'all':
+        return [(a, b) for a in levels for b in levels if a < b]
+    pairs = []
+    for item in text.split(','):
+        try:
+            lower, higher = [int(level) for level in item.split('-')]
+        except ValueError:
+            raise argparse.ArgumentTypeError('%r is not a level pair like 1-2' % item)
+        if lower not in levels or higher not in levels or lower >= higher:
+            raise argparse.ArgumentTypeError('%r is not a pair of a lower and a higher level from 1 to 5' % item)
+        if (lower, higher) not in pairs:
+            pairs.append((lower, higher))
+    return pairs
+
+
+def parse_years(text: str) -> list:
+    """
+    The function to read the --years option: years and ranges of years separated by commas
+
+    :param text: value of the option
+    :return: sorted list of years
+
+    >>> parse_years('2013-2015,2010')
+    [2010, 2013, 2014, 2015]
+    """
+    years = set()
+    for item in text.split(','):
+        try:
+            bounds = [int(year) for year in item.split('-')]
+        except ValueError:
+            raise argparse.ArgumentTypeError('%r is not a year or a range of years like 2013-2016' % item)
+        years.update(range(bounds[0], bounds[-1] + 1))
+    return sorted(years)
+
+
+def parse_formats(text: str) -> list:
+    """
+    The function to read the --format option. Parquet needs pyarrow or fastparquet, which are checked here so the run
+    fails before doing any work.
+
+    :param text: value of the option, formats separated by commas
+    :return: list of formats
+
+    >>> parse_formats('csv,png')
+    ['csv', 'png']
+    """
+    formats = []
+    for fmt in text.split(','):
+        if fmt not in DATA_FORMATS + FIGURE_FORMATS:
+            raise argparse.ArgumentTypeError('unknown format %r, use %s' % (fmt, ', '.join(DATA_FORMATS + FIGURE_FORMATS)))
+        if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None \
+                and importlib.util.find_spec('fastparquet') is None:
+            raise argparse.ArgumentTypeError('parquet output needs pyarrow or fastparquet to be installed')
+        if fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+
+def pair_part(lower: int, higher: int) -> str:
+    """
+    The function to find the part of the driver script drawing a level pair
+
+    :param lower: number of the lower level
+    :param higher: number of the higher level
+    :return: key of PARTS, None when no part draws this pair
+
+    >>> pair_part(2, 3), pair_part(1, 3)
+    ('ph', None)
+    """
+    pair = LevelPair.of_levels(lower, higher)
+    for name, registered in LEVEL_PAIRS.items():
+        if name in PARTS and (registered.lower, registered.higher) == (pair.lower, pair.higher):
+            return name
+    return None
+
+
+def pair_table(panel: Panel, lower: int, higher: int, years: list = None) -> pd.DataFrame:
+    """
+    The function to get the aligned data of one level pair as a table, sorted by year and lower level value
+
+    :param panel: the Panel
+    :param lower: number of the lower level
+    :param higher: number of the higher level
+    :param years: years to keep, every year with data if None
+    :return: Data Frame with the columns lower, higher, year, country, name, x and y
+    """
+    pair = LevelPair.of_levels(lower, higher)
+    frames = []
+    for year in pair_years(panel, pair):
+        if years is not None and year not in years:
+            continue
+        x = panel.series(pair.lower, year)
+        y = panel.series(pair.higher, year)
+        keep = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        keep = keep[np.argsort(x[keep], kind='stable')]
+        frames.append(pd.DataFrame({'lower': lower, 'higher': higher, 'year': year,
+                                    'country': np.asarray(panel.countries, dtype=object)[keep],
+                                    'name': np.asarray(panel.names, dtype=object)[keep],
+                                    'x': x[keep], 'y': y[keep]}))
+    if not frames:
+        return pd.DataFrame(columns=['lower', 'higher', 'year', 'country', 'name', 'x', 'y'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_table(df: pd.DataFrame, path: str, fmt: str) -> str:
+    """
+    The function to write a table in one of DATA_FORMATS
+
+    :param df: the table
+    :param path: file name without extension
+    :param fmt: 'csv', 'json' or 'parquet'
+    :return: path of the written file
+    """
+    path = '%s.%s' % (path, fmt)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'json':
+        df.to_json(path, orient='records')
+    else:
+        df.to_parquet(path, index=False)
+    return path
+
+
+def schedule(args: argparse.Namespace, data: Data, figure_pool=None) -> Scheduler:
+    """
+    The function to turn the options of a run into the task graph: one loader per indicator the pairs need, the
+    country index of the datasets of these indicators, the panel, one table per pair, the statistics, the written files and one task per figure
+
+    :param args: parsed options of the run command
+    :param data: the Data object to load from
+    :param figure_pool: process pool drawing the figures, None to draw them in this process
+    :return: the Scheduler
+    """
+    scheduler = Scheduler()
+    indicators = []
+    for lower, higher in args.pairs:
+        for level in (lower, higher):
+            if LEVEL_INDICATORS[level] not in indicators:
+                indicators.append(LEVEL_INDICATORS[level])
+    for indicator in indicators:
+        scheduler.add('load ' + indicator, lambda indicator=indicator: SOURCES[indicator](data))
+    scheduler.add('countries', lambda: CountryIndex.from_data(data, indicators))
+    scheduler.add('panel', lambda index, *frames: Panel.from_frames(dict(zip(indicators, frames)), index),
+                  ['countries'] + ['load ' + indicator for indicator in indicators])
+    data_formats = [fmt for fmt in args.format if fmt in DATA_FORMATS]
+    figure_formats = [fmt for fmt in args.format if fmt in FIGURE_FORMATS]
+    if data_formats:
+        tables = []
+        for lower, higher in args.pairs:
+            name = 'pair %d-%d' % (lower, higher)
+            scheduler.add(name, lambda panel, lower=lower, higher=higher: pair_table(panel, lower, higher, args.years),
+                          ['panel'])
+            tables.append(name)
+        scheduler.add('statistics', lambda panel: select_statistics(
+            pyramid_matrix(panel, args.years, pairs=sorted(args.pairs))), ['panel'])
+        for fmt in data_formats:
+            scheduler.add('write pairs.' + fmt, lambda *tables, fmt=fmt: write_table(
+                pd.concat(tables, ignore_index=True), os.path.join(args.out, 'pairs'), fmt), tables)
+            scheduler.add('write statistics.' + fmt, lambda statistics, fmt=fmt: write_table(
+                statistics, os.path.join(args.out, 'statistics'), fmt), ['statistics'])
+    parts = []
+    for lower, higher in args.pairs:
+        part = pair_part(lower, higher)
+        if part is None or (args.years is not None and not set(args.years) & set(LEVEL_PAIRS[part].years)):
+            continue
+        parts.append(part)
+    if figure_formats and parts:
+        figure_dir = os.path.join(args.out, 'figures')
+        scheduler.add('panel files', lambda panel: save_panel(panel, args.panel_dir), ['panel'])
+        for fmt in figure_formats:
+            for part, plot in part_tasks(parts):
+                task = (part, plot, args.panel_dir, figure_dir, fmt, args.dpi, args.years)
+                scheduler.add('figure %s %s.%s' % (part, plot, fmt),
+                              lambda panel_dir, task=task: draw(figure_pool, task), ['panel files'])
+    return scheduler
+
+
+def select_statistics(matrix: pd.DataFrame) -> pd.DataFrame:
+    """
+    The function to keep the rows of pyramid_matrix that have data
+
+    :param matrix: Data Frame returned by pyramid_matrix for the requested pairs
+    :return: the selected rows
+
+    >>> matrix = pd.DataFrame({'lower': [1, 4], 'higher': [2, 5], 'year': 2015, 'n': [90, 0]})
+    >>> select_statistics(matrix)['higher'].tolist()
+    [2]
+    """
+    return matrix[(matrix['n'] > 0).values].reset_index(drop=True)
+
+
+def save_panel(panel: Panel, panel_dir: str) -> str:
+    """
+    The function to write the panel for the figure workers
+
+    :param panel: the Panel
+    :param panel_dir: folder to write to
+    :return: the folder
+    """
+    panel.save(panel_dir)
+    return panel_dir
+
+
+def draw(pool, task: tuple) -> dict:
+    """
+    The function to draw one figure, in the process pool when there is one
+
+    :param pool: process pool, None to draw in this process
+    :param task: arguments of run_task
+    :return: the result of run_task
+    """
+    if pool is None:
+        return run_task(*task)
+    return pool.submit(run_task, *task).result()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    The function to make the parser of the command line
+
+    :return: the parser
+    """
+    parser = argparse.ArgumentParser(prog='maslow', description='Analyses of the levels of the hierarchy of needs')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    run = commands.add_parser('run', help='align, summarize and draw level pairs')
+    run.add_argument('--pairs', type=parse_pairs, default='all',
+                     help="level pairs like 1-2,4-5, or 'all' (default)")
+    run.add_argument('--years', type=parse_years, default=None,
+                     help='years like 2013-2016 or 2010,2015 (default: every year with data)')
+    run.add_argument('--out', default='results', help='output folder (default: results)')
+    run.add_argument('--format', type=parse_formats, default='csv,png',
+                     help='output formats among %s (default: csv,png)' % ', '.join(DATA_FORMATS + FIGURE_FORMATS))
+    run.add_argument('--jobs', type=int, default=1, help='number of tasks and figure processes at the same time')
+    run.add_argument('--dpi', type=float, default=None, help='resolution of the figures (default: their own)')
+    run.add_argument('--data', default='590PR_final_datasets', help='folder of the datasets')
+    run.add_argument('--quiet', action='store_true', help='do not print the task timings')
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """
+    The function run by the command line
+
+    :param argv: the arguments, sys.argv[1:] if None
+    :return: exit status
+
+    >>> out = tempfile.mkdtemp()
+    >>> main(['run', '--pairs', '3-4', '--years', '2015', '--out', out, '--format', 'csv', '--jobs', '2', '--quiet'])
+    0
+    >>> sorted(os.listdir(out))
+    ['pairs.csv', 'statistics.csv']
+    >>> pd.read_csv(os.path.join(out, 'statistics.csv'))[['lower', 'higher', 'year']].values.tolist()
+    [[3, 4, 2015]]
+    """
+    args = build_parser().parse_args(argv)
+    if isinstance(args.pairs, str):
+        args.pairs = parse_pairs(args.pairs)
+    if isinstance(args.format, str):
+        args.format = parse_formats(args.format)
+    os.makedirs(args.out, exist_ok=True)
+    args.panel_dir = tempfile.mkdtemp(prefix='panel-')
+    figure_pool = None
+    if args.jobs > 1 and any(fmt in FIGURE_FORMATS for fmt in args.format):
+        figure_pool = ProcessPoolExecutor(max_workers=args.jobs, initializer=start_worker)
+    start = time.time()
+    try:
+        scheduler = schedule(args, Data(args.data), figure_pool)
+        results = scheduler.run(args.jobs)
+    finally:
+        if figure_pool is not None:
+            figure_pool.shutdown()
+        shutil.rmtree(args.panel_dir, ignore_errors=True)
+    status = 0
+    for name, seconds in scheduler.seconds.items():
+        result = results[name]
+        note = ''
+        if isinstance(result, dict) and result.get('error'):
+            note = '  failed: ' + result['error']
+            status = 1
+        if not args.quiet or note:
+            print('%-45s %8.3fs%s' % (name, seconds, note))
+    if not args.quiet:
+        print('%-45s %8.3fs' % ('total', time.time() - start))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# Country name -> ISO3 canonicalization shared by every join of the datasets
+
+import os
+import re
+import json
+import difflib
+import unicodedata
+import numpy as np
+import pandas as pd
+from PR_Final_WinYaoPhil_functions import Data, FrameCache
+
+# spellings used by the Wikipedia GPI table, the happiness reports and the innovation files that the World Bank
+# population file does not use (the hunger and freedom files are only read for their own indicators); None marks
+# names that are not a country with an ISO3 code and must not be matched fuzzily
+ALIASES = {
+    'Bolivia, Plurinational St.': 'BOL',
+    'Bolivia, Plurinational State of': 'BOL',
+    'Cape Verde': 'CPV',
+    'Congo (Brazzaville)': 'COG',
+    'Congo (Kinshasa)': 'COD',
+    'Democratic Republic of the Congo': 'COD',
+    'Egypt': 'EGY',
+    'Gambia': 'GMB',
+    'Hong Kong S.A.R., China': 'HKG',
+    'Hong Kong': 'HKG',
+    'Iran, Islamic Republic of': 'IRN',
+    'Ivory Coast': 'CIV',
+    'Korea, Republic of': 'KOR',
+    'Kyrgyzstan': 'KGZ',
+    'Laos': 'LAO',
+    'Macedonia': 'MKD',
+    'Moldova, Rep.': 'MDA',
+    'Moldova, Republic of': 'MDA',
+    'North Cyprus': None,
+    'North Korea': 'PRK',
+    'Palestine': 'PSE',
+    'Palestinian Territories': 'PSE',
+    'Republic of the Congo': 'COG',
+    'Russia': 'RUS',
+    'Slovakia': 'SVK',
+    'Somaliland Region': None,
+    'Somaliland region': None,
+    'South Korea': 'KOR',
+    'Swaziland': 'SWZ',
+    'Syria': 'SYR',
+    'TFYR Macedonia': 'MKD',
+    'Taiwan Province of China': 'TWN',
+    'Taiwan': 'TWN',
+    'Tanzania, United Rep.': 'TZA',
+    'Tanzania, United Republic of': 'TZA',
+    'The Former Yugoslav Republic (FYR) of Macedonia': 'MKD',
+    'United States of America': 'USA',
+    'Venezuela, Bolivarian Rep.': 'VEN',
+    'Venezuela, Bolivarian Republic of': 'VEN',
+    'Viet Nam': 'VNM',
+}
+
+# panel indicators whose datasets list the ISO3 code of their country names; the others only come with names
+CODED_INDICATORS = ['undernourishment', 'freedom']
+
+# words dropped before the fuzzy matching, they only qualify the form of government or the status of a territory
+QUALIFIERS = {'the', 'of', 'and', 'rep', 'republic', 'st', 'state', 'islamic', 'bolivarian', 'plurinational',
+              'united', 'federation', 'province', 'region', 'sar', 'territories', 'territory'}
+
+
+def normalize(name: str) -> str:
+    """
+    The function to reduce a country name to the form used as alias key: accents, case, punctuation and a leading
+    'The' are dropped and white space is collapsed
+
+    :param name: country name as spelled by one of the datasets
+    :return: normalized name
+
+    >>> normalize("Côte d'Ivoire"), normalize('The Bahamas'), normalize('Bosnia & Herzegovina')
+    ('cote divoire', 'bahamas', 'bosnia and herzegovina')
+    """
+    text = unicodedata.normalize('NFKD', str(name))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = text.replace('&', ' and ').replace('-', ' ')
+    text = ' '.join(re.sub(r'[^0-9a-z ]+', '', text).split())
+    if text.startswith('the '):
+        text = text[4:]
+    return text
+
+
+def core(name: str) -> str:
+    """
+    The function to reduce a normalized country name to its words that are not in QUALIFIERS
+
+    :param name: normalized country name
+    :return: the remaining words, sorted
+
+    >>> core('moldova republic of'), core('korea rep')
+    ('moldova', 'korea')
+    """
+    return ' '.join(sorted(w for w in name.split() if w not in QUALIFIERS))
+
+
+class CountryIndex(object):
+    """
+    Alias -> ISO3 index of the country names of every dataset.
+
+    The index is built from the datasets that ship a country code next to the name (the World Bank hunger and
+    population files and the Human Freedom Index) plus the manual ALIASES. A name that is still unknown is matched
+    fuzzily: first on the words left after dropping QUALIFIERS when they point to one code only, then with difflib on
+    the whole normalized name. The fuzzy results are written to a json file in the '.cache' folder of the data, so
+    they are worked out once and stay the same between runs.
+
+    Required:
+    import difflib
+    import unicodedata
+
+    >>> index = CountryIndex({'Korea, Rep.': 'KOR', 'Congo, Rep.': 'COG', 'Congo, Dem. Rep.': 'COD'})
+    >>> index.resolve('Korea, Republic of'), index.resolve('Republic of the Congo'), index.resolve('Atlantis')
+    ('KOR', 'COG', None)
+    >>> index.canonical(pd.Series(['Congo, Dem. Rep.', 'Atlantis']))
+    array(['COD', 'Atlantis'], dtype=object)
+    """
+    def __init__(self: object, codes: dict, names: dict = None, cache_path: str = None):
+        self.aliases = {}
+        for name, code in codes.items():
+            self.aliases.setdefault(normalize(name), code)
+        self.names = dict(names) if names is not None else {}
+        for name, code in codes.items():
+            if code is not None:
+                self.names.setdefault(code, name)
+        self.cores = {}
+        for key, code in self.aliases.items():
+            if code is not None:
+                self.cores.setdefault(core(key), set()).add(code)
+        self.cache_path = cache_path
+        self.fuzzy = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path) as f:
+                self.fuzzy = json.load(f)
+
+    @classmethod
+    def from_data(cls, data: Data = None, indicators: list = None):
+        """
+        The function to build the index from the country codes of the datasets the indicators need: the hunger data
+        and the human freedom index list the ISO3 code of their own names, and the World Bank population file, which
+        also gives the display names, is read when an indicator only comes with country names
+
+        :param data: the Data object to load from, a new one on the default data folder if missing
+        :param indicators: names of the panel indicators the index has to match, every dataset is read if None
+        :return: the CountryIndex
+
+        >>> index = CountryIndex.from_data()
+        >>> index.resolve('Viet Nam'), index.resolve('Korea, South'), index.name('KOR')
+        ('VNM', 'KOR', 'Korea, Rep.')
+        >>> index = CountryIndex.from_data(indicators=['undernourishment'])
+        >>> index.resolve('Viet Nam'), index.resolve('Argentina')
+        ('VNM', 'ARG')
+        """
+        if data is None:
+            data = Data()
+        if indicators is None:
+            indicators = list(CODED_INDICATORS) + [None]
+        columns = ['Country Name', 'Country Code']
+        sources = []
+        display = {}
+        if any(indicator not in CODED_INDICATORS for indicator in indicators):
+            population = data.read_csv('API_SP.POP.TOTL_DS2_en_csv_v2_10576638.csv', skiprows=4, usecols=columns)
+            sources.append(('population', population['Country Name'], population['Country Code']))
+            display = dict(zip(population['Country Code'], population['Country Name']))
+        if 'undernourishment' in indicators:
+            hunger = data.read_csv('Hunger.csv', sep='\t', header=0, usecols=columns)
+            sources.append(('hunger', hunger['Country Name'], hunger['Country Code']))
+        if 'freedom' in indicators:
+            freedom = data.get_freedom()
+            sources.append(('freedom', freedom['countries'], freedom['ISO_code']))
+        codes = {}
+        for source, names, iso in sources:
+            for name, code in zip(names, iso):
+                if isinstance(name, str) and isinstance(code, str):
+                    codes.setdefault(name, code)
+        codes.update(ALIASES)
+        # the fuzzy matches depend on the datasets the index was built from
+        name = 'country-aliases-%s.json' % '-'.join(source for source, names, iso in sources)
+        cache_path = os.path.join(Data.frame_cache.directory(os.path.join(data.file_path, 'Hunger.csv')), name)
+        return cls(codes, display, cache_path)
+
+    def resolve(self: object, name: str) -> str:
+        """
+        The function to find the ISO3 code of one country name, new fuzzy matches are kept in memory until save
+
+        :param name: country name as spelled by one of the datasets
+        :return: ISO3 code, or None when the name matches no country
+        """
+        key = normalize(name)
+        if key in self.aliases:
+            return self.aliases[key]
+        if key not in self.fuzzy:
+            self.fuzzy[key] = self.match(key)
+        return self.fuzzy[key]
+
+    def match(self: object, key: str) -> str:
+        """
+        The function to match a normalized name that is not in the index
+
+        :param key: normalized country name
+        :return: ISO3 code, or None when no alias is close enough
+        """
+        candidates = self.cores.get(core(key), set())
+        if len(candidates) == 1:
+            return next(iter(candidates))
+        close = difflib.get_close_matches(key, list(self.aliases), n=1, cutoff=0.9)
+        if close:
+            return self.aliases[close[0]]
+        return None
+
+    def save(self: object):
+        """
+        The function to write the fuzzy matches to the json cache file
+        """
+        if self.cache_path is None:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = FrameCache.tmp_path(self.cache_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(self.fuzzy, f, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+
+    def name(self: object, code: str) -> str:
+        """
+        The function to get the display name of an ISO3 code
+
+        :param code: ISO3 code
+        :return: the World Bank name of the country, or the code itself when it has none
+        """
+        return self.names.get(code, code)
+
+    def canonical(self: object, names) -> np.ndarray:
+        """
+        The function to replace the country names of a column by their ISO3 codes, resolving every distinct name once.
+        Names that match no country are kept as they are.
+
+        :param names: country names, as a Series or an array
+        :return: object array of ISO3 codes
+        """
+        codes, uniques = pd.factorize(pd.Series(names), use_na_sentinel=True)
+        known = len(self.fuzzy)
+        resolved = np.array([self.resolve(name) or name for name in uniques] + [None], dtype=object)
+        if len(self.fuzzy) > known:
+            self.save()
+        return resolved[codes]
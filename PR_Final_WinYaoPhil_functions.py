@@ -1,24 +1,585 @@
 # additional package requirements: bs4, gdelt, seaborn
 
-import requests
 import re
-from bs4 import BeautifulSoup
 import pandas as pd
-from pandas import read_excel
 import logging
 import zipfile
-import math
+import os
+import json
+import hashlib
+import functools
+import importlib
+import inspect
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+
+class LazyModule(object):
+    """
+    Stand-in for a module that is only imported the first time one of its attributes is used.
+
+    Importing matplotlib.pyplot and seaborn takes longer than everything else this module needs, and only the plot
+    functions use them, so plt and sns are lazy: the Data loaders and the analysis functions can be imported and run
+    without loading the plotting packages. The scraping packages (requests, bs4) are imported inside the functions
+    that use them.
+
+    Required:
+    import importlib
+
+    >>> json_module = LazyModule('json')
+    >>> json_module
+    <LazyModule 'json' (not imported)>
+    >>> json_module.dumps([1])
+    '[1]'
+    """
+    def __init__(self: object, name: str):
+        self.__dict__['name'] = name
+        self.__dict__['module'] = None
+
+    def load(self: object):
+        """
+        The function to import the module, once
+
+        :return: the module
+        """
+        if self.__dict__['module'] is None:
+            self.__dict__['module'] = importlib.import_module(self.__dict__['name'])
+        return self.__dict__['module']
+
+    def __getattr__(self: object, attr: str):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self: object, attr: str, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self: object) -> str:
+        if self.__dict__['module'] is None:
+            return '<LazyModule %r (not imported)>' % self.__dict__['name']
+        return repr(self.__dict__['module'])
+
+
+plt = LazyModule('matplotlib.pyplot')
+sns = LazyModule('seaborn')
+
+
+class FrameCache(object):
+    """
+    On-disk columnar cache for the data frames parsed by the Data loaders.
+
+    Every parsed frame is stored next to its source file in a '.cache' folder as one .npz file (one numpy array per
+    column, text columns are stored as integer codes plus their unique values) and one .json schema file. The schema
+    remembers the modification time, size and sha1 hash of the source file, so an entry is thrown away as soon as the
+    source changes. When only the modification time changed (for example after a fresh checkout) the hash is checked
+    and the entry is kept if the content is still the same.
+
+    One instance is shared by every Data object (Data.frame_cache), so repeated runs load the frames from the cache
+    instead of inflating the zip files and parsing the csv again. Entries are written to uniquely named temporary
+    files under a lock and then renamed, so loaders running in threads or processes at the same time never read or
+    write a half written entry.
+
+    Required:
+    import os
+    import json
+    import uuid
+    import hashlib
+    import threading
+    import numpy as np
+    import pandas as pd
+    """
+    version = 1
+
+    def __init__(self: object, cache_dir: str = None):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+
+    def directory(self: object, source: str) -> str:
+        """
+        The function to find the folder holding the cached frames of one source file
+
+        :param source: path of the source data file
+        :return: path of the cache folder
+        """
+        if self.cache_dir is not None:
+            return self.cache_dir
+        return os.path.join(os.path.dirname(os.path.abspath(source)), '.cache')
+
+    def paths(self: object, source: str, key: str) -> (str, str):
+        """
+        The function to get the .npz and .json file names of one cache entry
+
+        :param source: path of the source data file
+        :param key: text identifying what was parsed from the source (zip member, reader options...)
+        :return: path of the column file and path of the schema file
+        """
+        name = os.path.basename(source)
+        digest = hashlib.sha1(('%s|%s|%s' % (os.path.abspath(source), key, self.version)).encode('utf-8')).hexdigest()
+        stem = os.path.join(self.directory(source), '%s-%s' % (name, digest[:16]))
+        return stem + '.npz', stem + '.json'
+
+    @staticmethod
+    def file_hash(source: str) -> str:
+        """
+        The function to hash the content of a source file
+
+        :param source: path of the source data file
+        :return: sha1 hex digest of the file content
+        """
+        sha = hashlib.sha1()
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def is_fresh(self: object, source: str, schema: dict) -> bool:
+        """
+        The function to check if a cache entry still matches its source file, first by mtime and size, then by hash
+
+        :param source: path of the source data file
+        :param schema: schema dict stored with the cache entry
+        :return: True when the cached frame can be used
+        """
+        stat = os.stat(source)
+        if schema['mtime_ns'] == stat.st_mtime_ns and schema['size'] == stat.st_size:
+            return True
+        if schema['size'] != stat.st_size or schema['sha1'] != self.file_hash(source):
+            return False
+        schema['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    @staticmethod
+    def to_columns(frame: pd.DataFrame) -> (dict, list):
+        """
+        The function to split a data frame into plain numpy arrays
+
+        Numeric and boolean columns are kept as they are, text columns are factorized into int32 codes and the
+        unique strings, categorical columns of text keep their codes and categories. Frames that can not be stored this
+        way (custom index, mixed object columns) give None.
+
+        :param frame: the data frame to store
+        :return: dict of arrays and list of column descriptions, or (None, None)
+        """
+        if not isinstance(frame.index, pd.RangeIndex) or frame.index.start != 0 or frame.index.step != 1:
+            return None, None
+        arrays = {}
+        columns = []
+        for i, name in enumerate(frame.columns):
+            if not isinstance(name, str):
+                return None, None
+            col = frame.iloc[:, i]
+            if col.dtype.kind in 'biuf':
+                arrays['v%d' % i] = col.to_numpy()
+                columns.append({'name': name, 'kind': 'values'})
+            elif col.dtype == object:
+                codes, uniques = pd.factorize(col)
+                if not all(isinstance(u, str) for u in uniques):
+                    return None, None
+                arrays['c%d' % i] = codes.astype(np.int32)
+                arrays['u%d' % i] = np.array(uniques, dtype=str)
+                columns.append({'name': name, 'kind': 'codes'})
+            elif isinstance(col.dtype, pd.CategoricalDtype):
+                if not all(isinstance(u, str) for u in col.cat.categories):
+                    return None, None
+                arrays['c%d' % i] = col.cat.codes.to_numpy().astype(np.int32)
+                arrays['u%d' % i] = np.array(col.cat.categories, dtype=str)
+                columns.append({'name': name, 'kind': 'category'})
+            else:
+                return None, None
+        return arrays, columns
+
+    @staticmethod
+    def from_columns(arrays: dict, columns: list) -> pd.DataFrame:
+        """
+        The function to rebuild a data frame from the arrays written by to_columns
+
+        :param arrays: dict-like of numpy arrays
+        :param columns: list of column descriptions
+        :return: the rebuilt data frame
+        """
+        data = {}
+        for i, column in enumerate(columns):
+            if column['kind'] == 'values':
+                data[i] = arrays['v%d' % i]
+            elif column['kind'] == 'category':
+                data[i] = pd.Categorical.from_codes(arrays['c%d' % i], arrays['u%d' % i].astype(object))
+            else:
+                codes = arrays['c%d' % i]
+                values = arrays['u%d' % i].astype(object)
+                col = np.take(values, codes) if values.size else np.empty(codes.size, dtype=object)
+                col[codes == -1] = np.nan
+                data[i] = col
+        frame = pd.DataFrame(data)
+        frame.columns = [column['name'] for column in columns]
+        return frame
+
+    def load(self: object, source: str, key: str, parse) -> pd.DataFrame:
+        """
+        The function to get a parsed frame from the cache, or parse it and store it when the cache is missing or stale
+
+        :param source: path of the source data file
+        :param key: text identifying what was parsed from the source
+        :param parse: function without arguments returning the parsed data frame
+        :return: the parsed data frame
+
+        >>> import tempfile
+        >>> cache = FrameCache(tempfile.mkdtemp())
+        >>> source = '590PR_final_datasets/Hunger.csv'
+        >>> first = cache.load(source, 'raw', lambda: pd.read_csv(source, sep='\\t'))
+        >>> second = cache.load(source, 'raw', lambda: 1 / 0)
+        >>> first.equals(second)
+        True
+        """
+        npz_path, json_path = self.paths(source, key)
+        if os.path.exists(npz_path) and os.path.exists(json_path):
+            try:
+                with open(json_path) as f:
+                    schema = json.load(f)
+                mtime = schema['mtime_ns']
+                if self.is_fresh(source, schema):
+                    with np.load(npz_path) as arrays:
+                        frame = self.from_columns(arrays, schema['columns'])
+                    if schema['mtime_ns'] != mtime:
+                        self.write_schema(json_path, schema)
+                    return frame
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+                logging.debug('ignoring broken cache entry %s: %s' % (npz_path, e))
+        frame = parse()
+        self.store(source, npz_path, json_path, frame)
+        return frame
+
+    def store(self: object, source: str, npz_path: str, json_path: str, frame: pd.DataFrame):
+        """
+        The function to write one parsed frame and its schema into the cache folder
+
+        :param source: path of the source data file
+        :param npz_path: path of the column file
+        :param json_path: path of the schema file
+        :param frame: the parsed data frame
+        """
+        arrays, columns = self.to_columns(frame)
+        if arrays is None:
+            logging.debug('frame from %s can not be cached' % source)
+            return
+        stat = os.stat(source)
+        schema = {'source': os.path.basename(source), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                  'sha1': self.file_hash(source), 'columns': columns}
+        tmp_path = FrameCache.tmp_path(npz_path)
+        try:
+            os.makedirs(os.path.dirname(npz_path), exist_ok=True)
+            with self.lock:
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp_path, npz_path)
+                self.write_schema(json_path, schema)
+        except OSError as e:
+            logging.debug('could not write cache entry %s: %s' % (npz_path, e))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def tmp_path(path: str) -> str:
+        """
+        The function to name the temporary file an entry is written to before being renamed, unique to the process and
+        the call
+
+        :param path: path of the cache file
+        :return: path of the temporary file
+
+        >>> FrameCache.tmp_path('a.npz') != FrameCache.tmp_path('a.npz')
+        True
+        """
+        return '%s.%d.%s.tmp' % (path, os.getpid(), uuid.uuid4().hex)
+
+    @staticmethod
+    def write_schema(json_path: str, schema: dict):
+        tmp_path = FrameCache.tmp_path(json_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(schema, f)
+        os.replace(tmp_path, json_path)
+
+    def clear(self: object, file_path: str = "590PR_final_datasets"):
+        """
+        The function to delete every cached frame of one data folder
+
+        :param file_path: the data folder whose cache should be removed
+        """
+        cache_dir = self.cache_dir or os.path.join(os.path.abspath(file_path), '.cache')
+        if os.path.isdir(cache_dir):
+            for name in os.listdir(cache_dir):
+                if name.endswith('.npz') or name.endswith('.json'):
+                    os.remove(os.path.join(cache_dir, name))
+
+
+def compact_frame(frame: pd.DataFrame, max_share: float = 0.5) -> pd.DataFrame:
+    """
+    The function to shrink the columns of a parsed frame for the compact load mode of Data: year columns become
+    int16, the other integer columns int32 when their values fit, float columns float32, and text columns (country,
+    region, sex...) with few distinct values categories
+
+    :param frame: the parsed data frame
+    :param max_share: largest share of distinct values in a text column turned into a category
+    :return: the compact data frame
+
+    >>> df = compact_frame(pd.DataFrame({'year': [2015, 2015, 2016, 2016], 'country': ['Chad', 'Peru', 'Chad', 'Peru'],
+    ...                                  'score': [1.5, 2.5, 3.5, 4.5], 'name': ['a', 'b', 'c', 'd']}))
+    >>> [str(dtype) for dtype in df.dtypes]
+    ['int16', 'category', 'float32', 'object']
+    """
+    columns = {}
+    for name in frame.columns:
+        col = frame[name]
+        if col.dtype.kind == 'f':
+            columns[name] = col.astype(np.float32)
+        elif col.dtype.kind in 'iu':
+            for dtype in ([np.int16] if str(name).strip().lower() == 'year' else []) + [np.int32]:
+                info = np.iinfo(dtype)
+                if len(col) == 0 or (col.min() >= info.min and col.max() <= info.max):
+                    col = col.astype(dtype)
+                    break
+            columns[name] = col
+        elif col.dtype == object and col.nunique() <= max_share * len(col):
+            columns[name] = col.astype('category')
+        else:
+            columns[name] = col
+    return pd.DataFrame(columns, index=frame.index)
+
+
+class LoaderMemo(object):
+    """
+    Process-wide memo of the values returned by the Data loaders, with least recently used eviction.
+
+    Keys are built from the loader name, the data folder and the call arguments. The memo hands out cheap shallow
+    copies of the stored frames (and new dicts of shallow copies for the loaders returning dicts), so callers can
+    rename, slice or reassign columns without changing what later callers get. Editing values in place through a
+    returned frame is not supported. The memo can be used by loaders running in several threads at once, every access
+    goes through one lock.
+
+    Required:
+    import threading
+    from collections import OrderedDict
+
+    >>> memo = LoaderMemo(maxsize=2)
+    >>> memo.put('a', 1); memo.put('b', 2); memo.put('c', 3)
+    >>> len(memo), 'a' in memo
+    (2, False)
+    """
+    def __init__(self: object, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def __len__(self: object) -> int:
+        with self.lock:
+            return len(self.entries)
+
+    def __contains__(self: object, key) -> bool:
+        with self.lock:
+            return key in self.entries
+
+    def get(self: object, key):
+        """
+        The function to look up one memoized value and mark it as most recently used
+
+        :param key: the memo key
+        :return: a cheap copy of the stored value, or None when the key is missing
+        """
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            value = self.entries[key]
+        return self.share(value)
+
+    def put(self: object, key, value):
+        """
+        The function to store one value, evicting the least recently used entries above maxsize
+
+        :param key: the memo key
+        :param value: the value returned by the loader
+        """
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self: object):
+        """
+        The function to drop every memoized value
+        """
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def discard(self: object, loader: str):
+        """
+        The function to drop the memoized values of one loader, for example after its source file was rewritten
+
+        :param loader: name of the Data loader method
+        """
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == loader]:
+                del self.entries[key]
+
+    @staticmethod
+    def share(value):
+        """
+        The function to make the cheap copy handed out to callers
+
+        :param value: a stored value
+        :return: shallow copy of a data frame, new dict of shallow copies, or the value itself
+        """
+        if isinstance(value, pd.DataFrame):
+            return value.copy(deep=False)
+        if isinstance(value, dict):
+            return {k: LoaderMemo.share(v) for k, v in value.items()}
+        if isinstance(value, ZipMembers):
+            return ZipMembers(value.names, value.load)
+        return value
+
+
+class ZipMembers(Mapping):
+    """
+    Read-only mapping of the csv members of a zip file that parses each member the first time it is accessed.
+
+    :param names: member names of the zip file
+    :param load: function taking a member name and returning its parsed data frame
+    """
+    def __init__(self: object, names: list, load):
+        self.names = list(names)
+        self.load = load
+        self.frames = {}
+
+    def __getitem__(self: object, name: str) -> pd.DataFrame:
+        if name not in self.frames:
+            if name not in self.names:
+                raise KeyError(name)
+            self.frames[name] = self.load(name)
+        return self.frames[name]
+
+    def __iter__(self: object):
+        return iter(self.names)
+
+    def __len__(self: object) -> int:
+        return len(self.names)
+
+    def __repr__(self: object) -> str:
+        return 'ZipMembers(%s, loaded=%s)' % (self.names, sorted(self.frames))
+
+
+def memoized(loader):
+    """
+    Decorator memoizing a Data loader method in the process-wide Data.memo, keyed by loader, data folder and arguments
+
+    :param loader: the Data method to memoize
+    :return: the wrapped method
+    """
+    @functools.wraps(loader)
+    def wrapper(self, *args, **kwargs):
+        key = (loader.__name__, os.path.abspath(self.file_path), self.compact, args, tuple(sorted(kwargs.items())))
+        value = Data.memo.get(key)
+        if value is None:
+            value = loader(self, *args, **kwargs)
+            Data.memo.put(key, value)
+            value = Data.memo.share(value)
+        return value
+    return wrapper
 
 
 class Data(object):
-    def __init__(self: object, file_path: str = "590PR_final_datasets"):
+    """
+    Reader of the datasets kept in the data folder, every loader result is memoized in Data.memo and every parsed
+    csv goes through the on-disk Data.frame_cache unless use_cache is False.
+
+    In the compact load mode (compact=True) the loaders only read the columns listed in compact_columns, and the
+    parsed frames go through compact_frame: int16 years, float32 values and categorical country and region columns.
+    The analyses give the same results up to the float32 precision.
+
+    >>> full = Data().get_freedom()
+    >>> compact = Data(compact=True).get_freedom()
+    >>> factor = full.memory_usage(deep=True).sum() / compact.memory_usage(deep=True).sum()
+    >>> factor > 20, str(compact['year'].dtype), str(compact['hf_score'].dtype)
+    (True, 'int16', 'float32')
+    """
+    frame_cache = FrameCache()
+    memo = LoaderMemo()
+    gpi_url = 'https://en.wikipedia.org/wiki/Global_Peace_Index'
+    gpi_base_year = 2018
+    gpi_years = 9
+
+    # columns kept by the loaders in the compact load mode, the other loaders keep every column
+    compact_columns = {
+        'get_freedom': ['year', 'ISO_code', 'countries', 'region', 'hf_score'],
+        'get_suicide': ['country', 'year', 'sex', 'age', 'suicides_no', 'population', 'suicides/100k pop',
+                        'HDI for year', ' gdp_for_year ($) ', 'gdp_per_capita ($)', 'generation'],
+    }
+
+    def __init__(self: object, file_path: str = "590PR_final_datasets", use_cache: bool = True,
+                 compact: bool = False):
         self.file_path = file_path
+        self.use_cache = use_cache
+        self.compact = compact
         self.df_list = []
 
-    def get_peace(self: object) -> pd.DataFrame:
+    @classmethod
+    def clear(cls):
+        """
+        The function to drop every loader result memoized in this process (the on-disk frame cache is kept)
+
+        >>> Data.clear()
+        >>> len(Data.memo)
+        0
+        """
+        cls.memo.clear()
+
+    def read_csv(self: object, file_name: str, member: str = None, **kwargs) -> pd.DataFrame:
+        """
+        The function to read one csv file, or one csv member of a zip file, through the shared on-disk frame cache
+
+        :param file_name: name of the file inside the data folder
+        :param member: name of the csv inside the zip file, None to read the file itself
+        :param kwargs: options passed to pd.read_csv
+        :return: the parsed data frame
+
+        >>> print(type(Data().read_csv('Innovation.zip', 'Innovation-2013.csv')))
+        <class 'pandas.core.frame.DataFrame'>
+        """
+        source = self.file_path + '/' + file_name
+
+        def parse():
+            if member is None:
+                frame = pd.read_csv(source, **kwargs)
+            else:
+                with zipfile.ZipFile(source) as zf:
+                    frame = pd.read_csv(zf.open(member), **kwargs)
+            return compact_frame(frame) if self.compact else frame
+
+        if not self.use_cache:
+            return parse()
+        key = '%s|%s' % (member, sorted(kwargs.items()))
+        if self.compact:
+            key += '|compact'
+        return Data.frame_cache.load(source, key, parse)
+
+    def members(self: object, file_name: str) -> list:
+        """
+        The function to list the member names of a zip file in the data folder
+
+        :param file_name: name of the zip file inside the data folder
+        :return: list of member names
+        """
+        with zipfile.ZipFile(self.file_path + '/' + file_name) as zf:
+            return [name.filename for name in zf.infolist()]
+
+    def get_peace(self: object, refresh: bool = False, page: str = None) -> pd.DataFrame:
         """
         This is a function to pull the most updated peace data modified from https://www.kaggle.com/kretes/gpi2008-2016
         and return it in a data frame
@@ -30,46 +591,133 @@ class Data(object):
 
         The lower the number indicates more peace in the region.
 
+        By default the data is read from the gpi_2010-2018.csv file kept in the data folder, so no network access is
+        needed. With refresh=True the Wikipedia table is scraped again (see scrape_peace) and the csv is rewritten
+        before it is read.
+
         Source:
         http://visionofhumanity.org/indexes/global-peace-index/
 
+        :param refresh: scrape the Wikipedia page again and rewrite the csv file first
+        :param page: path of a saved copy of the Wikipedia page to scrape instead of downloading it
+        :return: a Data Frame contain peace index score, by country and year.
+
+        >>> print(type(Data().get_peace()))
+        <class 'pandas.core.frame.DataFrame'>
+        >>> import tempfile
+        >>> sample = Data(tempfile.mkdtemp()).get_peace(refresh=True, page='590PR_final_datasets/gpi_wikipedia_sample.html')
+        >>> sample[['Country', 'pi_2010', 'pi_2018']]
+               Country  pi_2010  pi_2018
+        0      Iceland    1.212    1.096
+        1  New Zealand    1.188    1.192
+        2       Kosovo      NaN    2.078
+        3        Syria    2.274    3.600
+        """
+        if refresh:
+            self.scrape_peace(page)
+        return self.read_peace()
+
+    @memoized
+    def read_peace(self: object) -> pd.DataFrame:
+        """
+        The function to read the peace index csv file kept in the data folder and rename its columns for the analysis
+
+        :return: a Data Frame contain peace index score, by country and year.
+        """
+        first_year = Data.gpi_base_year - Data.gpi_years + 1
+        gpi = self.read_csv('gpi_%s-%s.csv' % (first_year, Data.gpi_base_year))
+        gpi.columns = ['Country'] + ['pi_%s' % year for year in range(first_year, Data.gpi_base_year + 1)]
+        return gpi
+
+    def scrape_peace(self: object, page: str = None) -> pd.DataFrame:
+        """
+        The function to scrape the peace index table from Wikipedia and rewrite the csv file of the data folder
+
+        The page is downloaded through fetch_page, which only transfers it again when Wikipedia reports a change.
+        Every table row is parsed once: its cells and its first link are looked up a single time.
+
         Requires:
-        import requests
         import re
         from bs4 import BeautifulSoup
         import pandas as pd
 
-        :return: a Data Frame contain peace index score, by country and year.
-
-        >>> print(type(Data().get_peace()))
-        <class 'pandas.core.frame.DataFrame'>
+        :param page: path of a saved copy of the Wikipedia page to scrape instead of downloading it
+        :return: a Data Frame with the scraped country and score_<year> columns
         """
-        response = requests.get(url='https://en.wikipedia.org/wiki/Global_Peace_Index')
-        soup = BeautifulSoup(response.text, 'html.parser')
-        base_year = 2018  # latest year
-        years = 9  # number of years to get data
+        from bs4 import BeautifulSoup
+        if page is None:
+            html = self.fetch_page(Data.gpi_url)
+        else:
+            with open(page, encoding='utf-8') as f:
+                html = f.read()
+        soup = BeautifulSoup(html, 'html.parser')
+        base_year = Data.gpi_base_year  # latest year
+        years = Data.gpi_years  # number of years to get data
+        score_columns = ['score_%s' % year for year in range(base_year - years + 1, base_year + 1)]
 
         def get_countries_by_gpi():
-            i = 1
             for table in soup.find_all('table', re.compile('wikitable sortable')):
-                if table.find_all('th')[0].get_text() == 'Country\n':
-                    for tr in table.find_all('tr'):
-                        country_name = tr.find_all('a')[0].get_text()
-                        if not country_name.startswith('['):
-                            row = {'country': country_name}
-                            for year, index in zip(range(base_year - years + 1, base_year + 1),
-                                                   range(2 * (years), 0, -2)):
-                                score = tr.find_all('td')[index].get_text()
-                                if score != '' and score != '\n':
-                                    row['score_%s' % year] = float(score)
-                            yield row
-
-        gpi = pd.DataFrame.from_dict(list(get_countries_by_gpi()))
+                header = table.find('th')
+                if header is None or header.get_text() != 'Country\n':
+                    continue
+                for tr in table.find_all('tr'):
+                    cells = tr.find_all('td')
+                    link = tr.find('a')
+                    if not cells or link is None:
+                        continue
+                    country_name = link.get_text()
+                    if country_name.startswith('['):
+                        continue
+                    row = {'country': country_name}
+                    for column, index in zip(score_columns, range(2 * years, 0, -2)):
+                        score = cells[index].get_text().strip() if index < len(cells) else ''
+                        if score != '':
+                            row[column] = float(score)
+                    yield row
+
+        gpi = pd.DataFrame(list(get_countries_by_gpi()), columns=['country'] + score_columns)
         gpi.to_csv(self.file_path + '/gpi_%s-%s.csv' % (base_year - years + 1, base_year), index=False)
-        gpi.columns = ['Country', 'pi_2010', 'pi_2011', 'pi_2012', 'pi_2013', 'pi_2014', 'pi_2015', 'pi_2016',
-                       'pi_2017', 'pi_2018']
-        return (gpi)
+        Data.memo.discard('read_peace')
+        return gpi
 
+    def fetch_page(self: object, url: str) -> str:
+        """
+        The function to download a web page through a conditional GET cache kept in the '.cache' folder of the data
+        folder. The ETag and Last-Modified headers of the last download are sent back, and the saved copy is used when
+        the server answers 304 Not Modified.
+
+        Requires:
+        import requests
+
+        :param url: the address of the page
+        :return: the html text of the page
+        """
+        import requests
+        cache_dir = Data.frame_cache.directory(self.file_path + '/' + 'gpi')
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        html_path = os.path.join(cache_dir, 'page-%s.html' % name)
+        meta_path = os.path.join(cache_dir, 'page-%s.json' % name)
+        headers = {}
+        if os.path.exists(html_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = requests.get(url=url, headers=headers, timeout=60)
+        if response.status_code == 304:
+            with open(html_path, encoding='utf-8') as f:
+                return f.read()
+        response.raise_for_status()
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        FrameCache.write_schema(meta_path, {'url': url, 'etag': response.headers.get('ETag'),
+                                            'last_modified': response.headers.get('Last-Modified')})
+        return response.text
+
+    @memoized
     def get_trade(self: object) -> pd.DataFrame:
         """
         The function to read the world hunger data and return it in data frame
@@ -90,17 +738,90 @@ class Data(object):
         """
         logging.basicConfig(filename="test.log", level=logging.DEBUG)
         file_name = "wits_en_trade_summary_allcountries_allyears.zip"
-        zf = zipfile.ZipFile(self.file_path + '/' + file_name)
-        df = []
-        for name in zipfile.ZipFile.infolist(zf):
-            logging.debug(name.filename)
-            try:
-                df.append(pd.read_csv(zf.open(name.filename), header=0))
-            except:
-                pass
-        frame = pd.concat(df, axis=0, ignore_index=True)
-        return frame
+        source = self.file_path + '/' + file_name
+
+        def parse():
+            zf = zipfile.ZipFile(source)
+            df = []
+            for name in zipfile.ZipFile.infolist(zf):
+                logging.debug(name.filename)
+                try:
+                    df.append(pd.read_csv(zf.open(name.filename), header=0))
+                except:
+                    pass
+            frame = pd.concat(df, axis=0, ignore_index=True)
+            return compact_frame(frame) if self.compact else frame
+
+        if not self.use_cache:
+            return parse()
+        return Data.frame_cache.load(source, 'all members|compact' if self.compact else 'all members', parse)
+
+    def iter_trade(self: object, chunksize: int = 10000, usecols: list = None, reporters: list = None,
+                   years: list = None):
+        """
+        The function to stream the WITS trade data chunk by chunk instead of loading the whole archive like get_trade
+
+        Each csv of the archive holds one reporter, named by its ISO3 code in the file name (en_AFG_AllYears_...).
+        Reporters given as ISO3 codes skip the other files without opening them, reporters given as names are
+        filtered row by row. Years are the data columns of the files, so asking for some years only reads those
+        columns. Files that can not be parsed are skipped, the same way as get_trade does.
 
+        Required:
+        import zipfile
+        import logging
+
+        :param chunksize: maximum number of rows per yielded data frame
+        :param usecols: descriptive columns to keep (Reporter, Partner, Product categories, Indicator Type,
+                        Indicator), None to keep all of them
+        :param reporters: ISO3 codes and/or reporter names to keep, None to keep every reporter
+        :param years: years to keep as data columns, None to keep every year
+        :return: generator of (member name, Data Frame) pairs
+
+        >>> chunks = list(Data().iter_trade(chunksize=5, usecols=['Reporter', 'Indicator'], reporters=['AFG'],
+        ...                                 years=[2015]))
+        >>> chunks[0][0], list(chunks[0][1].columns), len(chunks[0][1])
+        ('en_AFG_AllYears_WITS_Trade_Summary.CSV', ['Reporter', 'Indicator', '2015'], 5)
+        """
+        file_name = "wits_en_trade_summary_allcountries_allyears.zip"
+        codes = set()
+        names = set()
+        for reporter in reporters or []:
+            if len(reporter) == 3 and reporter.isupper():
+                codes.add(reporter)
+            else:
+                names.add(reporter)
+        year_cols = None if years is None else set(str(year) for year in years)
+        id_cols = None if usecols is None else set(usecols)
+        filter_names = len(names) > 0
+
+        def wanted(column):
+            if filter_names and column == 'Reporter':
+                return True
+            if column.isdigit():
+                return year_cols is None or column in year_cols
+            return id_cols is None or column in id_cols
+
+        with zipfile.ZipFile(self.file_path + '/' + file_name) as zf:
+            for name in zf.infolist():
+                member = name.filename
+                match = re.match(r'en_([A-Z]{3})_', member)
+                by_code = match is not None and match.group(1) in codes
+                if reporters is not None and not by_code and not filter_names:
+                    continue
+                logging.debug(member)
+                try:
+                    for chunk in pd.read_csv(zf.open(member), header=0, chunksize=chunksize, usecols=wanted):
+                        if reporters is not None and not by_code:
+                            chunk = chunk[chunk['Reporter'].isin(names)]
+                            if chunk.empty:
+                                continue
+                        if filter_names and id_cols is not None and 'Reporter' not in id_cols:
+                            chunk = chunk.drop(columns='Reporter')
+                        yield member, chunk
+                except (UnicodeDecodeError, pd.errors.ParserError, ValueError) as e:
+                    logging.debug('skipping %s: %s' % (member, e))
+
+    @memoized
     def get_hunger(self: object) -> pd.DataFrame:
         """
         The function to read the world hunger data and return it in data frame
@@ -122,7 +843,7 @@ class Data(object):
         <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "Hunger.csv"
-        df_hunger = pd.read_csv(self.file_path + "/" + file_name, na_values='\t', sep='\t', header=0)
+        df_hunger = self.read_csv(file_name, na_values='\t', sep='\t', header=0)
         list = []
         list.append(df_hunger['Country Name'])
         list.append(df_hunger['Indicator Name'])
@@ -139,6 +860,7 @@ class Data(object):
                                  'undernourishment_rate_2019']
         return df_new_hunger
 
+    @memoized
     def get_unemployment(self: object) -> pd.DataFrame:
         """
         The function to read the United Nation world unemployment data and return it in data frame
@@ -149,9 +871,10 @@ class Data(object):
         <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "unemployment.zip"
-        df = pd.read_csv(self.file_path + '/' + file_name, compression='zip')
+        df = self.read_csv(file_name, compression='zip')
         return df
 
+    @memoized
     def get_suicide(self: object) -> pd.DataFrame:
         """
         The function to read the United Nation world suicide data and return it in data frame
@@ -168,9 +891,12 @@ class Data(object):
         <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "suicide-rates-overview-1985-to-2016.zip"
-        df = pd.read_csv(self.file_path + '/' + file_name, compression='zip')
+        if self.compact:
+            return self.read_csv(file_name, compression='zip', usecols=Data.compact_columns['get_suicide'])
+        df = self.read_csv(file_name, compression='zip')
         return df
 
+    @memoized
     def get_freedom(self: object) -> pd.DataFrame:
         """
         The function to read the world freedom index data and return it in data frame
@@ -191,9 +917,12 @@ class Data(object):
         <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "the-human-freedom-index.zip"
-        df = pd.read_csv(self.file_path + '/' + file_name, compression='zip')
+        if self.compact:
+            return self.read_csv(file_name, compression='zip', usecols=Data.compact_columns['get_freedom'])
+        df = self.read_csv(file_name, compression='zip')
         return df
 
+    @memoized
     def get_happiness(self: object) -> dict:
         """
         The function to read the world happiness data and return it in dict list of data frame per year
@@ -219,13 +948,13 @@ class Data(object):
         <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "world-happiness-report.zip"
-        zf = zipfile.ZipFile(self.file_path + '/' + file_name)
         happy = {}
-        for name in zipfile.ZipFile.infolist(zf):
-            happy[name.filename] = pd.read_csv(zf.open(name.filename))
+        for name in self.members(file_name):
+            happy[name] = self.read_csv(file_name, name)
         return happy
 
-    def get_poverty(self: object, sheet: str = None) -> dict:
+    @memoized
+    def get_poverty(self: object, sheet: str = None) -> Mapping:
         """
         The function to read the world porverty data and return it in dict list of data frame
 
@@ -241,22 +970,24 @@ class Data(object):
         Required:
         import zipfile
 
+        Only the requested sheet is read from the zip file. Without a sheet, a ZipMembers mapping is returned and each
+        sheet is parsed the first time it is accessed.
+
         :param sheet: parameter to select the sheet from excel file.
-        :return: pass back a dict that contains either specific excel sheet or all sheets in form of Data Frame(s).
+        :return: pass back either the specific sheet as a Data Frame or a lazy mapping of all sheets.
 
         >>> print(type(Data().get_poverty()))
-        <class 'dict'>
+        <class 'PR_Final_WinYaoPhil_functions.ZipMembers'>
+        >>> print(type(Data().get_poverty('PovStatsCountry.csv')))
+        <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "PovStats_csv.zip"
-        zf = zipfile.ZipFile(self.file_path + '/' + file_name)
-        pov = {}
-        for name in zipfile.ZipFile.infolist(zf):
-            pov[name.filename] = pd.read_csv(zf.open(name.filename))
         if not sheet == None:
-            return pov[sheet]
+            return self.read_csv(file_name, sheet)
         else:
-            return pov
+            return ZipMembers(self.members(file_name), self.get_poverty)
 
+    @memoized
     def get_marital(self: object) -> pd.DataFrame:
         """
         The function to read the United Nation marital data and return it in data frame
@@ -267,52 +998,54 @@ class Data(object):
         <class 'pandas.core.frame.DataFrame'>
         """
         file_name = "UNdata_MARITAL_STATUS_2010-2013.csv"
-        df = pd.read_csv(self.file_path + '/' + file_name)
+        df = self.read_csv(file_name)
         df.drop(df.tail(74).index, inplace=True)
         file_name = "UNdata_MARITAL_STATUS_2014-2017.csv"
-        df2 = pd.read_csv(self.file_path + '/' + file_name)
+        df2 = self.read_csv(file_name)
         df2.drop(df2.tail(54).index, inplace=True)
         df_all = pd.concat([df, df2], axis=0).reset_index(drop=True)
         return df_all
 
-    def get_innovation(self: object, sheet: str = None) -> list:
+    @memoized
+    def get_innovation(self: object, sheet: str = None) -> Mapping:
         """
         The function to read the world innovation data and return it in dict list of data frame per year
 
         Required:
-        read_excel fom pandas package (from pandas import read_excel)
-        OR
-        use pd.read_excel when calling (import pandas as pd)
+        import pandas as pd
+
+        Only the requested sheet is read from the zip file. Without a sheet, a ZipMembers mapping is returned and each
+        sheet is parsed the first time it is accessed.
 
         :param sheet: parameter to select the sheet from excel file.
-        :return: pass back a dict that contains either specific excel sheet or all sheets in form of Data Frame(s).
+        :return: pass back either the specific sheet as a Data Frame or a lazy mapping of all sheets.
 
         >>> print(type(Data().get_innovation()))
-        <class 'dict'>
+        <class 'PR_Final_WinYaoPhil_functions.ZipMembers'>
+        >>> sorted(Data().get_innovation())[0]
+        'Innovation-2013.csv'
         """
-        file_path = "590PR_final_datasets"
         file_name = "Innovation.zip"
-        zf = zipfile.ZipFile(file_path + '/' + file_name)
-        inv = {}
-        for name in zipfile.ZipFile.infolist(zf):
-            inv[name.filename] = pd.read_csv(zf.open(name.filename))
         if not sheet == None:
-            return inv[sheet]
+            return self.read_csv(file_name, sheet)
         else:
-            return inv
+            return ZipMembers(self.members(file_name), self.get_innovation)
 
 
-def prep_freedom() -> list:
+def prep_freedom(data: Data = None) -> list:
     """
     The function to prep the world freedom data into only freedom index, year, and country,
     and return it in form of list of data frames per year.
 
+    :param data: the Data object to load from, a new one on the default data folder if missing
     :return: pass back a list of Data Frames by year, each contains only freedom index and country
 
     >>> print(type(prep_freedom()))
     <class 'list'>
     """
-    freedom = Data().get_freedom()
+    if data is None:
+        data = Data()
+    freedom = data.get_freedom()
     free = freedom[['year', 'countries', 'hf_score']]
     free.dropna(inplace=True)
     free.sort_values('hf_score', ascending=True, inplace=True)
@@ -325,24 +1058,478 @@ def prep_freedom() -> list:
     return free_list
 
 
-def prep_innovation() -> list:
+def prep_innovation(data: Data = None) -> list:
     """
     The function to prep the world innovation data into only innovation score, year, and country,
     and return it in form of data frame
 
+    :param data: the Data object to load from, a new one on the default data folder if missing
     :return: pass back a list of Data Frames by year, each contains only innovation index and country
 
     >>> print(type(prep_freedom()))
     <class 'list'>
     """
+    if data is None:
+        data = Data()
     inno_list = []
     for i in range(6):
-        df = Data().get_innovation('Innovation-201%s.csv' %(i + 3))
+        df = data.get_innovation('Innovation-201%s.csv' %(i + 3))
         df.rename({'Economy': 'Country', 'Score': 'Score201%s' % (i + 3)}, axis='columns', inplace=True)
         inno_list.append(df[['Country', 'Score201%s' % (i + 3)]])
     return inno_list
 
 
+def sorted_pairs(df: pd.DataFrame, x_col: str, y_col: str) -> (np.ndarray, np.ndarray):
+    """
+    The function shared by every analysis function to get the lower and higher level data of one year. The rows where
+    either value is missing are masked out and the remaining pairs are sorted by the lower level value, all with
+    vectorized numpy operations instead of a Python loop over the rows.
+
+    :param df: Data Frame holding the lower and higher level columns
+    :param x_col: name of the lower level column
+    :param y_col: name of the higher level column
+    :return: contiguous float arrays of the lower level data (sorted) and the corresponding higher level data
+
+    >>> df = pd.DataFrame({'x': [3.0, np.nan, 1.0, 2.0], 'y': [30.0, 40.0, np.nan, 20.0]})
+    >>> sorted_pairs(df, 'x', 'y')
+    (array([2., 3.]), array([20., 30.]))
+    """
+    x = df[x_col].to_numpy(dtype=float)
+    y = df[y_col].to_numpy(dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x = x[keep]
+    y = y[keep]
+    order = np.argsort(x, kind='stable')
+    return np.ascontiguousarray(x[order]), np.ascontiguousarray(y[order])
+
+
+def bin_index(x: np.ndarray, edges: list) -> np.ndarray:
+    """
+    The function to find the range (bin) of every lower level value, bin i being [edges[i], edges[i+1]).
+    An open last range like '3.5+' is written with np.inf as its upper edge.
+
+    :param x: lower level data
+    :param edges: increasing bin edges
+    :return: int array with the bin of each value, -1 for missing values or values outside all the bins
+
+    >>> bin_index(np.array([0.5, 5.0, 12.0, np.nan]), [0, 5, 10])
+    array([ 0,  1, -1, -1])
+    """
+    x = np.asarray(x, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    bins = np.digitize(x, edges) - 1
+    bins[(bins >= edges.size - 1) | np.isnan(x)] = -1
+    return bins
+
+
+def bin_stats(x: np.ndarray, y: np.ndarray, edges: list, labels: list = None) -> pd.DataFrame:
+    """
+    The binning engine used by the categorical and box plots. The lower level data is put into the ranges given by
+    edges and the higher level data of every range is summarized in one vectorized pass: np.bincount gives the count
+    and mean, and one lexsort by (bin, value) gives the median, quartiles, minimum and maximum of all the bins at once.
+    Quantiles are linearly interpolated like np.percentile, empty bins give NaN.
+
+    :param x: lower level data
+    :param y: corresponding higher level data
+    :param edges: increasing bin edges, np.inf for an open last range
+    :param labels: optional names of the bins used as index of the result
+    :return: Data Frame with one row per bin and the columns count, mean, median, q1, q3, min, max
+
+    >>> bin_stats(np.array([1, 2, 6, 7, 8]), np.array([10., 20., 1., 3., 5.]), [0, 5, 10, np.inf], ['a', 'b', 'c'])
+       count  mean  median    q1    q3   min   max
+    a      2  15.0    15.0  12.5  17.5  10.0  20.0
+    b      3   3.0     3.0   2.0   4.0   1.0   5.0
+    c      0   NaN     NaN   NaN   NaN   NaN   NaN
+    """
+    y = np.asarray(y, dtype=float)
+    n_bins = len(edges) - 1
+    bins = bin_index(x, edges)
+    keep = (bins >= 0) & ~np.isnan(y)
+    bins = bins[keep]
+    y = y[keep]
+    count = np.bincount(bins, minlength=n_bins)
+    total = np.bincount(bins, weights=y, minlength=n_bins)
+    empty = count == 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+    ordered = y[np.lexsort((y, bins))]
+    start = np.cumsum(count) - count
+    last = np.maximum(count - 1, 0)
+
+    def quantile(q):
+        if ordered.size == 0:
+            return np.full(n_bins, np.nan)
+        position = start + q * last
+        low = np.floor(position).astype(int)
+        high = np.ceil(position).astype(int)
+        low = np.minimum(low, ordered.size - 1)
+        high = np.minimum(high, ordered.size - 1)
+        value = ordered[low] + (ordered[high] - ordered[low]) * (position - np.floor(position))
+        value[empty] = np.nan
+        return value
+
+    return pd.DataFrame({'count': count, 'mean': mean, 'median': quantile(0.5), 'q1': quantile(0.25),
+                         'q3': quantile(0.75), 'min': quantile(0.0), 'max': quantile(1.0)}, index=labels)
+
+
+def bin_bands(x_list: list, y_list: list, edges: list, n_boot: int = 2000, ci: float = 0.95) -> (list, list):
+    """
+    The function to get the bootstrap confidence interval of the mean of every bin of every year, drawn as a band
+    around the lines of the categorical plots (see bootstrap_bins of PR_Final_WinYaoPhil_stats, which resamples the
+    countries of every bin and year with one index matrix)
+
+    :param x_list: List of Lower Level Sorted data
+    :param y_list: List of corresponding higher level data
+    :param edges: increasing bin edges, np.inf for an open last range
+    :param n_boot: number of bootstrap replicates
+    :param ci: coverage of the confidence interval
+    :return: lists of the lower and upper bounds of the bins, one array per year
+
+    >>> low, high = bin_bands([np.array([1., 2., 3., 6.])], [np.array([1., 2., 3., 4.])], [0, 5, 10])
+    >>> bool(1 <= low[0][0] < 2 < high[0][0] <= 3), low[0][1], high[0][1]
+    (True, 4.0, 4.0)
+    """
+    from PR_Final_WinYaoPhil_stats import bootstrap_bins
+    mean, low, high = bootstrap_bins(x_list, y_list, edges, n_boot, ci)
+    return list(low), list(high)
+
+
+class Renderer(object):
+    """
+    Where the figures of the plot_* and box_plot_* functions go.
+
+    By default (interactive mode) the functions draw on new pyplot figures and call plt.show, like they always did.
+    After start, the renderer is headless: pyplot is switched to the Agg backend, every figure is written to the output
+    folder as png or svg under the name of the function that drew it, and no window is ever opened. In headless mode
+    the figures are templates reused between calls: there is one figure (with its axes) per kind of layout, keyed by
+    the grid and the size, which is cleared before the next function draws on it. At most maxsize templates are kept,
+    the least recently used one is closed when another one is needed, and stop closes them all, so regenerating the
+    whole report runs with bounded memory.
+
+    In headless mode the plot functions are also cached on their content (see cached_plot): the written images are
+    kept in a '.plot-cache' folder of the output folder under a hash of the plotted data, and a call with the same
+    data is answered with the saved image without drawing anything.
+
+    One instance is shared by every plot function (render).
+
+    >>> import tempfile
+    >>> renderer = Renderer()
+    >>> renderer.start(tempfile.mkdtemp(), fmt='svg')
+    >>> fig = renderer.figure(figsize=(3, 2))
+    >>> _ = plt.plot([1, 2], [3, 4])
+    >>> os.path.basename(renderer.finish('example'))
+    'example.svg'
+    >>> renderer.figure(figsize=(3, 2)) is fig, len(fig.axes[0].lines)
+    (True, 0)
+    >>> renderer.stop()
+    >>> plt.fignum_exists(fig.number)
+    False
+    """
+    def __init__(self: object, maxsize: int = 4):
+        self.maxsize = maxsize
+        self.out_dir = None
+        self.fmt = 'png'
+        self.dpi = None
+        self.prefix = ''
+        self.cache_dir = None
+        self.hits = 0
+        self.templates = OrderedDict()
+        self.files = []
+
+    @property
+    def headless(self: object) -> bool:
+        return self.out_dir is not None
+
+    def start(self: object, out_dir: str, fmt: str = 'png', dpi: float = None, prefix: str = '', cache: bool = True):
+        """
+        The function to switch to the headless mode
+
+        :param out_dir: folder the figures are written to, created if missing
+        :param fmt: 'png' or 'svg'
+        :param dpi: resolution of the written figures, the one of each figure if None
+        :param prefix: text put before the function name in the file names
+        :param cache: whether to reuse the images of earlier calls with the same data
+        """
+        if fmt not in ('png', 'svg'):
+            raise ValueError('unsupported figure format %r, use png or svg' % fmt)
+        plt.switch_backend('Agg')
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.dpi = dpi
+        self.prefix = prefix
+        self.cache_dir = os.path.join(out_dir, '.plot-cache') if cache else None
+
+    def stop(self: object):
+        """
+        The function to close every template figure and go back to the interactive mode (the backend stays Agg)
+        """
+        for fig, axes in self.templates.values():
+            plt.close(fig)
+        self.templates.clear()
+        self.out_dir = None
+        self.cache_dir = None
+        self.hits = 0
+
+    def template(self: object, key: tuple, make):
+        """
+        The function to get the template figure of a layout, clearing it when it is reused
+
+        :param key: the layout (kind, grid, size and resolution)
+        :param make: function creating the (figure, axes) of the layout
+        :return: the figure and its axes
+        """
+        if key in self.templates and plt.fignum_exists(self.templates[key][0].number):
+            self.templates.move_to_end(key)
+            fig, axes = self.templates[key]
+            for ax in fig.axes:
+                ax.clear()
+            plt.figure(fig.number)
+            return fig, axes
+        fig, axes = make()
+        self.templates[key] = (fig, axes)
+        while len(self.templates) > self.maxsize:
+            old, old_axes = self.templates.popitem(last=False)[1]
+            plt.close(old)
+        return fig, axes
+
+    def figure(self: object, figsize: tuple, dpi: float = None):
+        """
+        The function replacing plt.figure in the plot functions
+
+        :param figsize: size of the figure in inches
+        :param dpi: resolution of the figure
+        :return: the current figure, with one axes
+        """
+        if not self.headless:
+            return plt.figure(figsize=figsize, dpi=dpi)
+
+        def make():
+            fig = plt.figure(figsize=figsize, dpi=dpi)
+            return fig, fig.add_subplot(1, 1, 1)
+
+        return self.template(('figure', tuple(figsize), dpi), make)[0]
+
+    def subplots(self: object, nrows: int, ncols: int, figsize: tuple):
+        """
+        The function replacing plt.subplots in the box plot functions
+
+        :param nrows: number of rows of the grid
+        :param ncols: number of columns of the grid
+        :param figsize: size of the figure in inches
+        :return: the figure and its array of axes
+        """
+        if not self.headless:
+            return plt.subplots(nrows, ncols, figsize=figsize)
+        return self.template(('subplots', nrows, ncols, tuple(figsize)),
+                             lambda: plt.subplots(nrows, ncols, figsize=figsize))
+
+    def finish(self: object, name: str, fig=None, show: bool = True) -> str:
+        """
+        The function ending every plot function: in headless mode the figure is written to the output folder, else
+        plt.show is called (or nothing for the box plots, which leave their figure open)
+
+        :param name: name of the plot function, used as file name
+        :param fig: the figure, the current one if None
+        :param show: whether to call plt.show in interactive mode
+        :return: path of the written file, None in interactive mode
+        """
+        if not self.headless:
+            if show:
+                plt.show()
+            return None
+        if fig is None:
+            fig = plt.gcf()
+        path = self.path(name)
+        fig.savefig(path, format=self.fmt, dpi=self.dpi)
+        self.files.append(path)
+        return path
+
+    def path(self: object, name: str) -> str:
+        """
+        The function to get the file a plot function writes to in headless mode
+
+        :param name: name of the plot function
+        :return: path of the image file
+        """
+        return os.path.join(self.out_dir, '%s%s.%s' % (self.prefix, name, self.fmt))
+
+
+render = Renderer()
+
+
+def content_hash(value, sha=None):
+    """
+    The function to hash the data given to a plot function: arrays by dtype, shape and bytes, data frames by column
+    names and row hashes, lists, tuples and dicts item by item, anything else by its repr
+
+    :param value: the value to hash
+    :param sha: hashlib object to update, a new sha1 if None
+    :return: the hashlib object
+
+    >>> a = content_hash([np.arange(3.0), pd.DataFrame({'x': [1.0, np.nan]})]).hexdigest()
+    >>> a == content_hash([np.arange(3.0), pd.DataFrame({'x': [1.0, np.nan]})]).hexdigest()
+    True
+    >>> a == content_hash([np.arange(3.0), pd.DataFrame({'x': [1.0, 2.0]})]).hexdigest()
+    False
+    """
+    if sha is None:
+        sha = hashlib.sha1()
+    if isinstance(value, np.ndarray):
+        sha.update(('%s%s' % (value.dtype, value.shape)).encode('utf-8'))
+        sha.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (pd.DataFrame, pd.Series)):
+        sha.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode('utf-8'))
+        sha.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, (list, tuple)):
+        sha.update(('%s%d' % (type(value).__name__, len(value))).encode('utf-8'))
+        for item in value:
+            content_hash(item, sha)
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            sha.update(repr(key).encode('utf-8'))
+            content_hash(value[key], sha)
+    else:
+        sha.update(repr(value).encode('utf-8'))
+    return sha
+
+
+# raised when the cached images change for a reason that neither the hashed sources nor the library versions show
+PLOT_CACHE_VERSION = 1
+
+# helpers the plot functions draw with, their source is part of the key of the plot cache, with the one of the
+# bootstrap of the bands of the categorical plots
+PLOT_HELPERS = ['bin_index', 'bin_stats', 'box_plot_bins', 'bin_bands', 'Renderer']
+PLOT_LIBRARIES = ['numpy', 'pandas', 'matplotlib', 'seaborn']
+
+
+def library_version(name: str) -> str:
+    """
+    The function to read the version of an installed package without importing it
+
+    :param name: name of the distribution
+    :return: its version, None when it is not installed
+
+    >>> library_version('numpy') == np.__version__, library_version('no-such-package')
+    (True, None)
+    """
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python < 3.8
+        import pkg_resources
+        version, PackageNotFoundError = lambda name: pkg_resources.get_distribution(name).version, \
+            pkg_resources.DistributionNotFound
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def plot_cache_salt() -> str:
+    """
+    The function to hash what every cached image depends on besides the plot function and its data: PLOT_CACHE_VERSION,
+    the source of the PLOT_HELPERS and of the bootstrap of PR_Final_WinYaoPhil_stats, and the versions of the
+    PLOT_LIBRARIES; computed once per process
+
+    :return: hex digest
+    """
+    import PR_Final_WinYaoPhil_stats as stats
+    sources = [inspect.getsource(globals()[name]) for name in PLOT_HELPERS]
+    sources += [inspect.getsource(stats.bootstrap_bins), inspect.getsource(stats.bootstrap_means)]
+    return content_hash([PLOT_CACHE_VERSION, sources, [library_version(name) for name in PLOT_LIBRARIES]]).hexdigest()
+
+
+def cached_plot(plot):
+    """
+    Decorator of the plot functions for the headless mode of render: the key of a call is the hash of the plotted data,
+    the source of the plot function, the format and resolution of the image and plot_cache_salt (the helpers the plot
+    functions draw with and the library versions). When an image with that key was
+    saved before, it is copied to the output file and matplotlib is not used at all. Otherwise the function draws
+    the figure and the written image is saved in the cache. In interactive mode the function is called as it is.
+
+    :param plot: the plot function
+    :return: the wrapped function, returning the path of the image in headless mode and None in interactive mode
+
+    >>> import tempfile
+    >>> render.start(tempfile.mkdtemp(), dpi=5)
+    >>> x_list, y_list = [np.arange(3.0)], [np.array([2.0, 1.5, 1.2])]
+    >>> first = plot12(x_list, y_list)
+    >>> plot12(x_list, y_list) == first, render.hits
+    (True, 1)
+    >>> render.stop()
+    """
+    source = []
+
+    @functools.wraps(plot)
+    def wrapper(*args, **kwargs):
+        if not render.headless:
+            return plot(*args, **kwargs)
+        if render.cache_dir is None:
+            plot(*args, **kwargs)
+            return render.path(plot.__name__)
+        if not source:
+            source.append(inspect.getsource(plot))
+        sha = content_hash([plot_cache_salt(), plot.__name__, source[0], render.fmt, render.dpi, args, kwargs])
+        cached = os.path.join(render.cache_dir, '%s.%s' % (sha.hexdigest(), render.fmt))
+        path = render.path(plot.__name__)
+        if os.path.exists(cached):
+            shutil.copyfile(cached, path)
+            render.files.append(path)
+            render.hits += 1
+            return path
+        plot(*args, **kwargs)
+        os.makedirs(render.cache_dir, exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (cached, os.getpid())
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, cached)
+        return path
+    return wrapper
+
+
+def box_plot_bins(ax, x: np.ndarray, y: np.ndarray, edges: list, labels: list, xlabel: str, ylabel: str,
+                  title: str):
+    """
+    The function to draw one horizontal box plot of the higher level data per range of the lower level data.
+    The boxes are drawn from the statistics of bin_stats with whiskers at the minimum and maximum, which is what
+    the box plots of every analysis level show.
+
+    Requirement:
+    import seaborn as sns (only for the "vlag" palette)
+
+    :param ax: the matplotlib axes to draw on
+    :param x: lower level data
+    :param y: corresponding higher level data
+    :param edges: increasing bin edges, np.inf for an open last range
+    :param labels: names of the bins, drawn from top to bottom
+    :param xlabel: label of the higher level axis
+    :param ylabel: label of the lower level ranges axis
+    :param title: title of the plot
+    """
+    stats = bin_stats(x, y, edges, labels)
+    boxes = []
+    positions = []
+    for position, (label, row) in enumerate(stats.iterrows()):
+        if row['count'] == 0:
+            continue
+        boxes.append({'label': label, 'med': row['median'], 'q1': row['q1'], 'q3': row['q3'],
+                      'whislo': row['min'], 'whishi': row['max'], 'fliers': []})
+        positions.append(position)
+    colors = sns.color_palette("vlag", len(labels), desat=.75)
+    if boxes:
+        artists = ax.bxp(boxes, positions=positions, vert=False, patch_artist=True, widths=.8,
+                         medianprops={'color': '.25'})
+        for box, position in zip(artists['boxes'], positions):
+            box.set_facecolor(colors[position])
+    ax.set_yticks(range(len(labels)))
+    ax.set_yticklabels(labels)
+    ax.set_ylim(len(labels) - .5, -.5)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+
+
 ## Part 1: Analysis of level 1-2, Physiological-Safety by hunger+peace index dataset
 
 # need docstring
@@ -376,20 +1563,13 @@ def analysis_first_two_level(hunger: pd.DataFrame, peace: pd.DataFrame) -> tuple
               ['undernourishment_rate_2016', 'pi_2016']]
     for i in item:
         df = df_level1[i]
-        dd = df.sort_values(by=i[0], ascending=True)
-        x = np.asarray(dd[i[0]])
-        y = np.asarray(dd[i[1]])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x, index_list)
-        new_y = np.delete(y, index_list)
+        new_x, new_y = sorted_pairs(df, i[0], i[1])
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, df_level1
 
 # need docstring
+@cached_plot
 def plot12(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -405,7 +1585,7 @@ def plot12(x_list: list, y_list: list):
     >>> type(plot12(x_list, y_list))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30, 15),  dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     item = [['undernourishment_rate_2010', 'pi_2010'], ['undernourishment_rate_2011', 'pi_2011'],
             ['undernourishment_rate_2012', 'pi_2012'], ['undernourishment_rate_2013', 'pi_2013'],
             ['undernourishment_rate_2014', 'pi_2014'], ['undernourishment_rate_2015', 'pi_2015'],
@@ -423,9 +1603,10 @@ def plot12(x_list: list, y_list: list):
     plt.legend()
     plt.gca().invert_yaxis()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot12')
 
 # need docstring
+@cached_plot
 def plot_cat12(x_list: list, y_list: list):
     """
     From previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -443,7 +1624,7 @@ def plot_cat12(x_list: list, y_list: list):
     >>> type(plot_cat12(x_list, y_list))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     item = [['undernourishment_rate_2010','pi_2010'],['undernourishment_rate_2011','pi_2011'],
                   ['undernourishment_rate_2012','pi_2012'],['undernourishment_rate_2013','pi_2013'],
                   ['undernourishment_rate_2014','pi_2014'],['undernourishment_rate_2015','pi_2015'],
@@ -452,54 +1633,14 @@ def plot_cat12(x_list: list, y_list: list):
              '[45,50)']#,'[50+']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = np.arange(0, 55, 5)
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((10,2))
-        for b in range(len(cc)):
-            if cc[b] >= 0 and cc[b]<5:
-                y_item[0][0] += cy[b]
-                y_item[0][1] += 1
-            if cc[b] >= 5 and cc[b]<10:
-                y_item[1][0] += cy[b]
-                y_item[1][1] += 1
-            if cc[b] >= 10 and cc[b]<15:
-                y_item[2][0] += cy[b]
-                y_item[2][1] += 1
-            if cc[b] >= 15 and cc[b]<20:
-                y_item[3][0] += cy[b]
-                y_item[3][1] += 1
-            if cc[b] >= 20 and cc[b]<25:
-                y_item[4][0] += cy[b]
-                y_item[4][1] += 1
-            if cc[b] >= 25 and cc[b]<30:
-                y_item[5][0] += cy[b]
-                y_item[5][1] += 1
-            if cc[b] >= 30 and cc[b]<35:
-                y_item[6][0] += cy[b]
-                y_item[6][1] += 1
-            if cc[b] >= 35 and cc[b]<40:
-                y_item[7][0] += cy[b]
-                y_item[7][1] += 1
-            if cc[b] >= 40 and cc[b]<45:
-                y_item[8][0] += cy[b]
-                y_item[8][1] += 1
-            if cc[b] >= 45 and cc[b]<50:
-                y_item[9][0] += cy[b]
-                y_item[9][1] += 1
-#             if cc[b] >= 50:
-#                 y_item[10][0] += cy[b]
-#                 y_item[10][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+item[s][1][-4:], marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('undernourishment rate')
     plt.ylabel('Peacefulness Index')
     plt.ylim(1.6,2.8)
@@ -509,9 +1650,10 @@ def plot_cat12(x_list: list, y_list: list):
     plt.legend()
     plt.gca().invert_yaxis()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_cat12')
 
 # need docstring
+@cached_plot
 def box_plot_level12(df_level1: pd.DataFrame):
     """
     The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -531,54 +1673,58 @@ def box_plot_level12(df_level1: pd.DataFrame):
     >>> type(box_plot_level12(df_level1))
     <class 'NoneType'>
     """
-    fig, axes = plt.subplots(3, 3, figsize=(60,40))
+    fig, axes = render.subplots(3, 3, figsize=(60,40))
     item = [['undernourishment_rate_2010','pi_2010'],['undernourishment_rate_2011','pi_2011'],
                   ['undernourishment_rate_2012','pi_2012'],['undernourishment_rate_2013','pi_2013'],
                   ['undernourishment_rate_2014','pi_2014'],['undernourishment_rate_2015','pi_2015'],
                   ['undernourishment_rate_2016','pi_2016']]
     peace_item = ['Peace_Index_of 2010','Peace_Index_of 2011','Peace_Index_of 2012','Peace_Index_of 2013',
                   'Peace_Index_of 2014','Peace_Index_of 2015','Peace_Index_of 2016']
+    edges = np.arange(0, 50, 5)
+    order = ['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)']
     for s in range(7):
-        cat_list = []
         data = df_level1[item[s]]
-        cc = data[item[s][0]]
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 0 and cc[b]<5:
-                cat_list.append('[0,5)')
-            if cc[b] >= 5 and cc[b]<10:
-                cat_list.append('[5,10)')
-            if cc[b] >= 10 and cc[b]<15:
-                cat_list.append('[10,15)')
-            if cc[b] >= 15 and cc[b]<20:
-                cat_list.append('[15,20)')
-            if cc[b] >= 20 and cc[b]<25:
-                cat_list.append('[20,25)')
-            if cc[b] >= 25 and cc[b]<30:
-                cat_list.append('[25,30)')
-            if cc[b] >= 30 and cc[b]<35:
-                cat_list.append('[30,35)')
-            if cc[b] >= 35 and cc[b]<40:
-                cat_list.append('[35,40)')
-            if cc[b] >= 40 and cc[b]<45:
-                cat_list.append('[40,45)')
-            if cc[b] >= 45 and cc[b]<50:
-                cat_list.append('[45,50)')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = [item[s][0], peace_item[s], 'Catergory of Hunger']
-        box = sns.boxplot(x=peace_item[s], y='Catergory of Hunger', data=new_data, whis="range", palette="vlag",
-                          ax=axes[s // 3, s % 3],
-                          order=['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)'])
-        #rescale boxplot x-axis with log
-        axes[s // 3, s % 3].set_title('Box Plot for Data of year '+ item[s][0][-4:])
+        box_plot_bins(axes[s // 3, s % 3], data[item[s][0]], data[item[s][1]], edges, order,
+                      peace_item[s], 'Catergory of Hunger', 'Box Plot for Data of year '+ item[s][0][-4:])
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_level12', fig, show=False)
 
 
 ## Part 2: Analysis of level 2-3, Safety-Belonging by Peace Index and Marriage data
 
+def marriage_rate_table(married: pd.DataFrame) -> pd.DataFrame:
+    """
+    The function to calculate the marriage rate of every country in every year with one pivot table pass: the 'Total'
+    and 'Single (never married)' populations (all ages) become two columns, summed over the other dimensions, and the
+    rate is the share of the total population that is not single
+    :param married: The original marriage dataset
+    :return: long format Data Frame with the columns Year, Country, Total_pop and Marriage_Rate
+
+    >>> married = pd.DataFrame({'Country or Area': ['A', 'A', 'A', 'B', 'B'],
+    ...                         'Year': [2010, 2010, 2010, 2011, 2011],
+    ...                         'Age': ['Total', 'Total', '15-19', 'Total', 'Total'],
+    ...                         'Marital status': ['Total', 'Single (never married)', 'Total', 'Total', 'Widowed'],
+    ...                         'Value': [100., 40., 7., 50., 5.]})
+    >>> marriage_rate_table(married)
+       Year Country  Total_pop  Marriage_Rate
+    0  2010       A      100.0            0.6
+    1  2011       B       50.0            NaN
+    """
+    status = married['Marital status']
+    rows = married.loc[(married['Age'] == 'Total') & status.isin(['Total', 'Single (never married)'])]
+    table = rows.pivot_table(index=['Year', 'Country or Area'], columns='Marital status', values='Value',
+                             aggfunc='sum')
+    table = table.reindex(columns=['Total', 'Single (never married)'])
+    table = table[table['Total'].notna()]
+    total_pop = table['Total']
+    rate = (total_pop - table['Single (never married)']) / total_pop
+    return pd.DataFrame({'Year': table.index.get_level_values(0),
+                         'Country': table.index.get_level_values(1),
+                         'Total_pop': total_pop.to_numpy(),
+                         'Marriage_Rate': rate.to_numpy()})
+
+
 def get_marriage_rate(married: pd.DataFrame) -> list:
     """
     Because the marriage data only has marriage population, we need to manually calculate the marriage rate for every country
@@ -591,16 +1737,10 @@ def get_marriage_rate(married: pd.DataFrame) -> list:
     >>> type(get_marriage_rate(married))
     <class 'list'>
     """
+    rates = marriage_rate_table(married)
     percent_married = []
     for i in range(8):
-        total = married.loc[(married['Marital status']=='Total') & (married['Age']=='Total')].groupby(['Year', 'Country or Area'], as_index=False).sum()
-        single = married.loc[(married['Marital status']=='Single (never married)') & (married['Age']=='Total')].groupby(['Year', 'Country or Area'], as_index=False).sum()
-        single_pop = single[single['Year'] == 2010+i].groupby(['Year', 'Country or Area']).sum()['Value']
-        total_pop = total[total['Year'] == 2010+i].groupby(['Year', 'Country or Area']).sum()['Value']
-        df1 = (total_pop-single_pop)/total_pop
-        df = pd.concat([total_pop.to_frame().reset_index(), df1.to_frame().reset_index()['Value']],axis=1)
-        df.columns = ['Year','Country','Total_pop','Marriage_Rate']
-        percent_married.append(df)
+        percent_married.append(rates[rates['Year'] == 2010+i].reset_index(drop=True))
     return percent_married
 
 
@@ -642,20 +1782,13 @@ def analysis_two_third_level(peace: pd.DataFrame, percent_married: pd.DataFrame)
     pi_list = ['pi_2010','pi_2011','pi_2012','pi_2013','pi_2014','pi_2015','pi_2016','pi_2017','pi_2018']
     for s in range(8):
         df = level2_list[s]
-        dd = df.sort_values(by=[pi_list[s]], ascending=True)
-        x = np.asarray(dd[pi_list[s]])
-        y = np.asarray(dd['Marriage_Rate'])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x, index_list)
-        new_y = np.delete(y, index_list)
+        new_x, new_y = sorted_pairs(df, pi_list[s], 'Marriage_Rate')
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, df_level2
 
 
+@cached_plot
 def plot_level_23(x_list: list, y_list: list):
     """
      This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -674,7 +1807,7 @@ def plot_level_23(x_list: list, y_list: list):
     >>> type(plot_level_23(x_list_level2, y_list_level2))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     marker = ['.','*','>','<','1','2','s','3','4']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF','#3351FF','#D433FF']
     pi_list = ['pi_2010','pi_2011','pi_2012','pi_2013','pi_2014','pi_2015','pi_2016','pi_2017','pi_2018']
@@ -688,7 +1821,7 @@ def plot_level_23(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_level_23')
 
 
 ## Part 2-2: Analysis of level 2-3, Safety-Belonging by Peace Index and Happiness data
@@ -733,20 +1866,13 @@ def analysis_peace_happiness_level(peace: pd.DataFrame, happiness: pd.DataFrame)
     pi_list = ['pi_2015','pi_2016','pi_2017']
     for s in range(3):
         df = p_h_list[s]
-        dd = df.sort_values(by=[pi_list[s]], ascending=True)
-        x = np.asarray(dd[pi_list[s]])
-        y = np.asarray(dd['Happiness Score'])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x, index_list)
-        new_y = np.delete(y, index_list)
+        new_x, new_y = sorted_pairs(df, pi_list[s], 'Happiness Score')
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, p_h_list
 
 
+@cached_plot
 def plot_level_p_h(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -764,7 +1890,7 @@ def plot_level_p_h(x_list: list, y_list: list):
     >>> print(type(plot_level_p_h(x_list_p_h, y_list_p_h)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     marker = ['.','*','>','<','1','2','s','3','4']
     color = ['#E11B00', '#1E90FF','#FFE333','#7EFF33','#33F4FF','#D433FF','#3351FF','#D433FF']
     pi_list = ['pi_2015','pi_2016','pi_2017']
@@ -777,9 +1903,10 @@ def plot_level_p_h(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_level_p_h')
 
 
+@cached_plot
 def plot_cat_ph(x_list: list, y_list: list):
     """
     from previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -799,57 +1926,20 @@ def plot_cat_ph(x_list: list, y_list: list):
     >>> print(type(plot_cat_ph(x_list_p_h, y_list_p_h)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     pi_list = ['pi_2015','pi_2016','pi_2017']
     x_item = ['[1,1.25)','[1.25,1.5)','[1.5,1.75)','[1.75,2)','[2,2.25)','[2.25,2.5)',
               '[2.5,2.75)','[2.75,3)','[3,3,5)','3.5+']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = [1, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 2.75, 3, 3.5, np.inf]
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((10,2))
-        for b in range(len(cc)):
-            if cc[b] >= 1 and cc[b]<1.25:
-                y_item[0][0] += cy[b]
-                y_item[0][1] += 1
-            if cc[b] >= 1.25 and cc[b]<1.5:
-                y_item[1][0] += cy[b]
-                y_item[1][1] += 1
-            if cc[b] >= 1.5 and cc[b]<1.75:
-                y_item[2][0] += cy[b]
-                y_item[2][1] += 1
-            if cc[b] >= 1.75 and cc[b]<2:
-                y_item[3][0] += cy[b]
-                y_item[3][1] += 1
-            if cc[b] >= 2 and cc[b]<2.25:
-                y_item[4][0] += cy[b]
-                y_item[4][1] += 1
-            if cc[b] >= 2.25 and cc[b]<2.5:
-                y_item[5][0] += cy[b]
-                y_item[5][1] += 1
-            if cc[b] >= 2.5 and cc[b]<2.75:
-                y_item[6][0] += cy[b]
-                y_item[6][1] += 1
-            if cc[b] >= 2.75 and cc[b]<3:
-                y_item[7][0] += cy[b]
-                y_item[7][1] += 1
-            if cc[b] >= 3 and cc[b]<3.5:
-                y_item[8][0] += cy[b]
-                y_item[8][1] += 1
-            if cc[b] >= 3.5:
-                y_item[9][0] += cy[b]
-                y_item[9][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+pi_list[s][1][-4:], marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('Peacefulness Index')
     plt.ylabel('Happiness Score')
     #plt.ylim(1.6,2.8)
@@ -858,9 +1948,10 @@ def plot_cat_ph(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_cat_ph')
 
 
+@cached_plot
 def box_plot_level_ph(p_h_list: list):
     """
     The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -882,47 +1973,19 @@ def box_plot_level_ph(p_h_list: list):
     >>> print(type(box_plot_level_ph(p_h_list)))
     <class 'NoneType'>
     """
-    fig, axes = plt.subplots(2,2, figsize=(50,40))
+    fig, axes = render.subplots(2,2, figsize=(50,40))
     item = [['pi_2015','Happiness Score'],['pi_2016','Happiness Score'],['pi_2017','Happiness Score']]
    # ax_list = [[0,0],[1,0],[2,0]]
+    edges = [1, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 2.75, 3, 3.5, np.inf]
+    order = ['[1,1.25)', '[1.25,1.5)','[1.5,1.75)','[1.75,2)',
+             '[2,2.25)','[2.25,2.5)','[2.5,2.75)','[2.75,3)','[3,3.5)','3.5+']
     for s in range(3):
-        cat_list = []
         data = p_h_list[s]
-        cc = data[item[s][0]]
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 1 and cc[b]<1.25:
-                cat_list.append('[1,1.25)')
-            if cc[b] >= 1.25 and cc[b]<1.5:
-                cat_list.append('[1.25,1.5)')
-            if cc[b] >= 1.5 and cc[b]<1.75:
-                cat_list.append('[1.5,1.75)')
-            if cc[b] >= 1.75 and cc[b]<2:
-                cat_list.append('[1.75,2)')
-            if cc[b] >= 2 and cc[b]<2.25:
-                cat_list.append('[2,2.25)')
-            if cc[b] >= 2.25 and cc[b]<2.5:
-                cat_list.append('[2.25,2.5)')
-            if cc[b] >= 2.5 and cc[b]<2.75:
-                cat_list.append('[2.5,2.75)')
-            if cc[b] >= 2.75 and cc[b]<3:
-                cat_list.append('[2.75,3)')
-            if cc[b] >= 3 and cc[b]<3.5:
-                cat_list.append('[3,3.5)')
-            if cc[b] >= 3.5:
-                cat_list.append('3.5+')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = ['Country', item[s][1], item[s][0], 'Catergory of Peace Index']
-        box = sns.boxplot(x=item[s][1], y='Catergory of Peace Index', data=new_data, whis="range", palette="vlag",
-                          ax=axes[s // 2, s % 2],
-                          order=['[1,1.25)', '[1.25,1.5)','[1.5,1.75)','[1.75,2)',
-                                 '[2,2.25)','[2.25,2.5)','[2.5,2.75)','[2.75,3)','[3,3.5)','3.5+'])
-        #rescale boxplot x-axis with log
-        axes[s // 2, s % 2].set_title('Box Plot for Data of year '+ item[s][1][-4:])
+        box_plot_bins(axes[s // 2, s % 2], data[item[s][0]], data[item[s][1]], edges, order,
+                      item[s][1], 'Catergory of Peace Index', 'Box Plot for Data of year '+ item[s][1][-4:])
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_level_ph', fig, show=False)
 
 
 ## Part 3: Analysis of level 3-4, Belonging-Esteem by World Happiness and freedom dataset
@@ -965,20 +2028,13 @@ def analysis_happiness_Freedom_level(happiness: pd.DataFrame, df_free: pd.DataFr
     y_list = []
     for s in range(2):
         df = h_f_list[s]
-        dd = df.sort_values(by=['Happiness Score'], ascending=True)
-        x = np.asarray(dd['Happiness Score'])
-        y = np.asarray(dd['Human_Freedom_Score'])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x, index_list)
-        new_y = np.delete(y, index_list)
+        new_x, new_y = sorted_pairs(df, 'Happiness Score', 'Human_Freedom_Score')
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, h_f_list
 
 
+@cached_plot
 def plot_level_h_f(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -999,7 +2055,7 @@ def plot_level_h_f(x_list: list, y_list: list):
     >>> print(type(plot_level_h_f(x_list_h_f, y_list_h_f)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     marker = ['.','*','>','<','1','2','s','3','4']
     color = ['#E11B00', '#1E90FF','#7EFF33','#33F4FF','#D433FF','#3351FF','#D433FF']
     for f in range(2):
@@ -1010,9 +2066,10 @@ def plot_level_h_f(x_list: list, y_list: list):
     plt.yticks(fontsize = 12, alpha = .7)
     plt.grid(axis='both',alpha = .3)
     plt.legend()
-    plt.show()
+    render.finish('plot_level_h_f')
 
 
+@cached_plot
 def plot_cat_hf(x_list: list, y_list: list):
     """
     From previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -1033,56 +2090,19 @@ def plot_cat_hf(x_list: list, y_list: list):
     >>> print(type(plot_cat_hf(x_list_h_f, y_list_h_f)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     x_item = ['[2.5,3)','[3,3.5)','[3.5,4)','[4,4.5)','[4.5,5)','[5,5.5)',
               '[5.5,6)','[6,6.5)','[6.5,7)','7+']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = [2.5, 3, 3.5, 4, 4.5, 5, 5.5, 6, 6.5, 7, np.inf]
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((10,2))
-        for b in range(len(cc)):
-            if cc[b] >= 2.5 and cc[b]<3:
-                y_item[0][0] += cy[b]
-                y_item[0][1] += 1
-            if cc[b] >= 3 and cc[b]<3.5:
-                y_item[1][0] += cy[b]
-                y_item[1][1] += 1
-            if cc[b] >= 3.5 and cc[b]<4:
-                y_item[2][0] += cy[b]
-                y_item[2][1] += 1
-            if cc[b] >= 4 and cc[b]<4.5:
-                y_item[3][0] += cy[b]
-                y_item[3][1] += 1
-            if cc[b] >= 4.5 and cc[b]<5:
-                y_item[4][0] += cy[b]
-                y_item[4][1] += 1
-            if cc[b] >= 5 and cc[b]<5.5:
-                y_item[5][0] += cy[b]
-                y_item[5][1] += 1
-            if cc[b] >= 5.5 and cc[b]<6:
-                y_item[6][0] += cy[b]
-                y_item[6][1] += 1
-            if cc[b] >= 6 and cc[b]<6.5:
-                y_item[7][0] += cy[b]
-                y_item[7][1] += 1
-            if cc[b] >= 6.5 and cc[b]<7:
-                y_item[8][0] += cy[b]
-                y_item[8][1] += 1
-            if cc[b] >= 7:
-                y_item[9][0] += cy[b]
-                y_item[9][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+str(2015+s), marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('Peacefulness Index')
     plt.ylabel('Happiness Score')
     #plt.ylim(1.6,2.8)
@@ -1090,9 +2110,10 @@ def plot_cat_hf(x_list: list, y_list: list):
     plt.yticks(fontsize = 12, alpha = .7)
     plt.grid(axis='both',alpha = .3)
     plt.legend()
-    plt.show()
+    render.finish('plot_cat_hf')
 
 
+@cached_plot
 def box_plot_level_hf(h_f_list: list):
     """
     The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -1117,44 +2138,17 @@ def box_plot_level_hf(h_f_list: list):
     <class 'NoneType'>
     
     """
-    fig, axes = plt.subplots(2,1, figsize=(50,40))
+    fig, axes = render.subplots(2,1, figsize=(50,40))
     #ax_list = [[0,0],[1,0]]
+    edges = [2.5, 3, 3.5, 4, 4.5, 5, 5.5, 6, 6.5, 7, np.inf]
+    order = ['[2.5,3)','[3,3.5)','[3.5,4)','[4,4.5)','[4.5,5)','[5,5.5)','[5.5,6)','[6,6.5)','[6.5,7)','7+']
     for s in range(2):
-        cat_list = []
         data = h_f_list[s]
-        cc = data['Happiness Score']
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 2.5 and cc[b]<3:
-                cat_list.append('[2.5,3)')
-            if cc[b] >= 3 and cc[b]<3.5:
-                cat_list.append('[3,3.5)')
-            if cc[b] >= 3.5 and cc[b]<4:
-                cat_list.append('[3.5,4)')
-            if cc[b] >= 4 and cc[b]<4.5:
-                cat_list.append('[4,4.5)')
-            if cc[b] >= 4.5 and cc[b]<5:
-                cat_list.append('[4.5,5)')
-            if cc[b] >= 5 and cc[b]<5.5:
-                cat_list.append('[5,5.5)')
-            if cc[b] >= 5.5 and cc[b]<6:
-                cat_list.append('[5.5,6)')
-            if cc[b] >= 6 and cc[b]<6.5:
-                cat_list.append('[6,6.5)')
-            if cc[b] >= 6.5 and cc[b]<7:
-                cat_list.append('[6.5,7)')
-            if cc[b] >= 7:
-                cat_list.append('7+')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = ['Country', 'Happiness Score', 'year', 'Human_Freedom_Score', 'Range of Happiness Score']
-        box = sns.boxplot(x='Human_Freedom_Score', y='Range of Happiness Score', data=new_data, whis="range", palette="vlag",
-                          ax=axes[s % 2], 
-                          order=['[2.5,3)','[3,3.5)','[3.5,4)','[4,4.5)','[4.5,5)','[5,5.5)','[5.5,6)','[6,6.5)','[6.5,7)','7+'])
-        axes[s % 2].set_title('Box Plot for Data of year '+ str(2015+s))
+        box_plot_bins(axes[s % 2], data['Happiness Score'], data['Human_Freedom_Score'], edges, order,
+                      'Human_Freedom_Score', 'Range of Happiness Score', 'Box Plot for Data of year '+ str(2015+s))
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_level_hf', fig, show=False)
 
 
 ## Part 4: Analysis of level 2-4, Safety-Esteem by peace and freedom dataset
@@ -1198,20 +2192,13 @@ def analysis_two_fourth_level(peace: pd.DataFrame, df_free: pd.DataFrame):
     pi_list = ['pi_2010','pi_2011','pi_2012','pi_2013','pi_2014','pi_2015','pi_2016']
     for s in range(6):
         df = level24_list[s]
-        dd = df.sort_values(by=[pi_list[s]], ascending=True)
-        x = np.asarray(dd[pi_list[s]])
-        y = np.asarray(dd['Human_Freedom_Score'])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x,index_list)
-        new_y = np.delete(y,index_list)
+        new_x, new_y = sorted_pairs(df, pi_list[s], 'Human_Freedom_Score')
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, level24_list
 
 
+@cached_plot
 def plot_level_24(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -1229,7 +2216,7 @@ def plot_level_24(x_list: list, y_list: list):
     >>> print(type(plot_level_24(x_list_level24, y_list_level24)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
     pi_list = ['pi_2010','pi_2011','pi_2012','pi_2013','pi_2014','pi_2015','pi_2016']
@@ -1244,9 +2231,10 @@ def plot_level_24(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_level_24')
 
 
+@cached_plot
 def plot_cat24(x_list: list, y_list: list):
     """
     From previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -1266,54 +2254,20 @@ def plot_cat24(x_list: list, y_list: list):
     >>> print(type(plot_cat24(x_list_level24, y_list_level24)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     pi_list = ['pi_2010','pi_2011','pi_2012','pi_2013','pi_2014','pi_2015','pi_2016']
     x_item = ['[1,1.25)','[1.25,1.5)','[1.5,1.75)','[1.75,2)','[2,2.25)','[2.25,2.5)',
               '[2.5,2.75)','[2.75,3)','3+']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = [1, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 2.75, 3, np.inf]
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((9,2))
-        for b in range(len(cc)):
-            if cc[b] >= 1 and cc[b]<1.25:
-                y_item[0][0] += cy[b]
-                y_item[0][1] += 1
-            if cc[b] >= 1.25 and cc[b]<1.5:
-                y_item[1][0] += cy[b]
-                y_item[1][1] += 1
-            if cc[b] >= 1.5 and cc[b]<1.75:
-                y_item[2][0] += cy[b]
-                y_item[2][1] += 1
-            if cc[b] >= 1.75 and cc[b]<2:
-                y_item[3][0] += cy[b]
-                y_item[3][1] += 1
-            if cc[b] >= 2 and cc[b]<2.25:
-                y_item[4][0] += cy[b]
-                y_item[4][1] += 1
-            if cc[b] >= 2.25 and cc[b]<2.5:
-                y_item[5][0] += cy[b]
-                y_item[5][1] += 1
-            if cc[b] >= 2.5 and cc[b]<2.75:
-                y_item[6][0] += cy[b]
-                y_item[6][1] += 1
-            if cc[b] >= 2.75 and cc[b]<3:
-                y_item[7][0] += cy[b]
-                y_item[7][1] += 1
-            if cc[b] >= 3:
-                y_item[8][0] += cy[b]
-                y_item[8][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+pi_list[s][1][-4:], marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('Peacefulness Index')
     plt.ylabel('Human Freedom Score')
     #plt.ylim(1.6,2.8)
@@ -1322,9 +2276,10 @@ def plot_cat24(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_cat24')
 
 
+@cached_plot
 def box_plot_level24(level_list24: list):
     """
     The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -1346,47 +2301,21 @@ def box_plot_level24(level_list24: list):
     >>> print(type(box_plot_level24(level24_list)))
     <class 'NoneType'>
     """
-    fig, axes = plt.subplots(3, 2, figsize=(50,40))
+    fig, axes = render.subplots(3, 2, figsize=(50,40))
     item = [['Human_Freedom_Score','pi_2010'],['Human_Freedom_Score','pi_2011'],
                   ['Human_Freedom_Score','pi_2012'],['Human_Freedom_Score','pi_2013'],
                   ['Human_Freedom_Score','pi_2014'],['Human_Freedom_Score','pi_2015'],]
     ax_list = [[0,0],[0,1],[1,0],[1,1],[2,0],[2,1]]
+    edges = [1, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 2.75, 3, np.inf]
+    order = ['[1,1.25)', '[1.25,1.5)','[1.5,1.75)','[1.75,2)',
+             '[2,2.25)','[2.25,2.5)','[2.5,2.75)','[2.75,3)','3+']
     for s in range(6):
-        cat_list = []
         data = level_list24[s]
-        cc = data[item[s][1]]
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 1 and cc[b]<1.25:
-                cat_list.append('[1,1.25)')
-            if cc[b] >= 1.25 and cc[b]<1.5:
-                cat_list.append('[1.25,1.5)')
-            if cc[b] >= 1.5 and cc[b]<1.75:
-                cat_list.append('[1.5,1.75)')
-            if cc[b] >= 1.75 and cc[b]<2:
-                cat_list.append('[1.75,2)')
-            if cc[b] >= 2 and cc[b]<2.25:
-                cat_list.append('[2,2.25)')
-            if cc[b] >= 2.25 and cc[b]<2.5:
-                cat_list.append('[2.25,2.5)')
-            if cc[b] >= 2.5 and cc[b]<2.75:
-                cat_list.append('[2.5,2.75)')
-            if cc[b] >= 2.75 and cc[b]<3:
-                cat_list.append('[2.75,3)')
-            if cc[b] >= 3 :
-                cat_list.append('3+')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = ['Year', 'Country', item[s][0], item[s][1], 'Catergory of Peace Index']
-        box = sns.boxplot(x=item[s][0], y='Catergory of Peace Index', data=new_data, whis="range", palette="vlag",
-                          ax=axes[ax_list[s][0], ax_list[s][1]], 
-                          order=['[1,1.25)', '[1.25,1.5)','[1.5,1.75)','[1.75,2)',
-                                 '[2,2.25)','[2.25,2.5)','[2.5,2.75)','[2.75,3)','3+'])
-        #rescale boxplot x-axis with log
-        axes[ax_list[s][0], ax_list[s][1]].set_title('Box Plot for Data of year '+ item[s][1][-4:])
+        box_plot_bins(axes[ax_list[s][0], ax_list[s][1]], data[item[s][1]], data[item[s][0]], edges, order,
+                      item[s][0], 'Catergory of Peace Index', 'Box Plot for Data of year '+ item[s][1][-4:])
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_level24', fig, show=False)
 
 
 ## Part 5: Analysis of level 4-5, Esteem-Self Actualization by freedom and innovation dataset
@@ -1422,20 +2351,13 @@ def analysis_level45(inno_list: list, free_list: list):
     item = ['Score2013', 'Score2014', 'Score2015', 'Score2016']
     for s in range(4):
         df = level_45_list[s]
-        dd = df.sort_values(by='hf_score', ascending=True)
-        x = np.asarray(dd['hf_score'])
-        y = np.asarray(dd[item[s]])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x,index_list)
-        new_y = np.delete(y,index_list)
+        new_x, new_y = sorted_pairs(df, 'hf_score', item[s])
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, level_45_list
 
 
+@cached_plot
 def plot45(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -1451,7 +2373,7 @@ def plot45(x_list: list, y_list: list):
     >>> print(type(plot45(x_list_45, y_list_45)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     item = ['Score2013', 'Score2014', 'Score2015', 'Score2016']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
@@ -1463,9 +2385,10 @@ def plot45(x_list: list, y_list: list):
     plt.yticks(fontsize = 12, alpha = .7)
     plt.grid(axis='both',alpha = .3)
     plt.legend()#prop={'size': 30})
-    plt.show()
+    render.finish('plot45')
 
 
+@cached_plot
 def plot45_cat(x_list: list, y_list: list):
     """
     From previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -1483,7 +2406,7 @@ def plot45_cat(x_list: list, y_list: list):
     >>> print(type(plot45_cat(x_list_45, y_list_45)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     item = ['Score2013', 'Score2014', 'Score2015', 'Score2016']
     start = 4.5
     end = 9
@@ -1494,34 +2417,24 @@ def plot45_cat(x_list: list, y_list: list):
         x_item.append('[%s,%s)' %(start+(interval*j), start+(interval*(j+1))))
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = start + interval * np.arange(range_interval + 1)
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((range_interval,2))
-        for b in range(len(cc)):
-            for k in range(10):
-                if cc[b] >= (start+(interval*k)) and cc[b] < (start+(interval*(k+1))):
-                    y_item[k][0] += cy[b]
-                    y_item[k][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+item[s][-4:], marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('Freedom Index')
     plt.ylabel('Innovation Index')
     plt.xticks(fontsize = 8, horizontalalignment = 'center', alpha = .7)
     plt.yticks(fontsize = 12, alpha = .7)
     plt.grid(axis='both',alpha = .3)
     plt.legend()#prop={'size': 30})
-    plt.show()
+    render.finish('plot45_cat')
 
 
+@cached_plot
 def box_plot_45(level_45_list: list):
     """
     The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -1540,46 +2453,20 @@ def box_plot_45(level_45_list: list):
     >>> print(type(box_plot_45(level_45_list)))
     <class 'NoneType'>
     """
-    fig, axes = plt.subplots(2, 2, figsize=(50,40))
+    fig, axes = render.subplots(2, 2, figsize=(50,40))
     item = [['hf_score','Score2013'], ['hf_score','Score2014'], ['hf_score','Score2015'], ['hf_score','Score2016']]
     free_item = 'Human_Freedom_Score'
     ax_list = [[0,0],[0,1],[1,0],[1,1]]
+    edges = np.arange(4.5, 9.5, 0.5)
+    order = ['[4.5,5.0)','[5.0,5.5)','[5.5,6.0)','[6.0,6.5)',
+             '[6.5,7.0)','[7.0,7.5)','[7.5,8.0)','[8.0,8.5)','[8.5,9.0)']
     for s in range(4):
-        cat_list = []
         data = level_45_list[s]
-        cc = data[item[s][0]]
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 4.5 and cc[b]<5.0:
-                cat_list.append('[4.5,5.0)')
-            if cc[b] >= 5.0 and cc[b]<5.5:
-                cat_list.append('[5.0,5.5)')
-            if cc[b] >= 5.5 and cc[b]<6.0:
-                cat_list.append('[5.5,6.0)')
-            if cc[b] >= 6.0 and cc[b]<6.5:
-                cat_list.append('[6.0,6.5)')
-            if cc[b] >= 6.5 and cc[b]<7.0:
-                cat_list.append('[6.5,7.0)')
-            if cc[b] >= 7.0 and cc[b]<7.5:
-                cat_list.append('[7.0,7.5)')
-            if cc[b] >= 7.5 and cc[b]<8.0:
-                cat_list.append('[7.5,8.0)')
-            if cc[b] >= 8.0 and cc[b]<8.5:
-                cat_list.append('[8.0,8.5)')
-            if cc[b] >= 8.5 and cc[b]<9:
-                cat_list.append('[8.5,9.0)')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = ['Country', item[s][1], 'year', free_item, 'Catergory of Human Freedom Index']
-        box = sns.boxplot(x=free_item, y='Catergory of Human Freedom Index', data=new_data, whis="range", palette="vlag",
-                          ax=axes[ax_list[s][0], ax_list[s][1]], 
-                          order=['[4.5,5.0)','[5.0,5.5)','[5.5,6.0)','[6.0,6.5)',
-                                 '[6.5,7.0)','[7.0,7.5)','[7.5,8.0)','[8.0,8.5)','[8.5,9.0)'])
-        #rescale boxplot x-axis with log
-        axes[ax_list[s][0], ax_list[s][1]].set_title('Box Plot for Data of year '+ item[s][1][-4:])
+        box_plot_bins(axes[ax_list[s][0], ax_list[s][1]], data[item[s][0]], data[item[s][0]], edges, order,
+                      free_item, 'Catergory of Human Freedom Index', 'Box Plot for Data of year '+ item[s][1][-4:])
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_45', fig, show=False)
 
 
 ## Part 6: Analysis of level 1-4, Belonging-Esteem by hunger + freedom index dataset
@@ -1624,20 +2511,13 @@ def analysis_first_fourth_level(hunger: pd.DataFrame, df_free: pd.DataFrame):
                    'undernourishment_rate_2016']
     for s in range(7):
         df = level14_list[s]
-        dd = df.sort_values(by=[hunger_list[s]], ascending=True)
-        x = np.asarray(dd[hunger_list[s]])
-        y = np.asarray(dd['Human_Freedom_Score'])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x,index_list)
-        new_y = np.delete(y,index_list)
+        new_x, new_y = sorted_pairs(df, hunger_list[s], 'Human_Freedom_Score')
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, level14_list
 
 
+@cached_plot
 def plot_14(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -1655,7 +2535,7 @@ def plot_14(x_list: list, y_list: list):
     >>> print(type(plot_14(x_list_14, y_list_14)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     item = [['undernourishment_rate_2010','Human_Freedom_Score'],['undernourishment_rate_2011','Human_Freedom_Score'],
             ['undernourishment_rate_2012','Human_Freedom_Score'],['undernourishment_rate_2013','Human_Freedom_Score'],
             ['undernourishment_rate_2014','Human_Freedom_Score'],['undernourishment_rate_2015','Human_Freedom_Score'],
@@ -1672,9 +2552,10 @@ def plot_14(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_14')
 
 
+@cached_plot
 def plot_cat_level14(x_list: list, y_list: list):
     """
     From previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -1694,7 +2575,7 @@ def plot_cat_level14(x_list: list, y_list: list):
     >>> print(type(plot_cat_level14(x_list_14, y_list_14)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     item = [['undernourishment_rate_2010','Human_Freedom_Score'],['undernourishment_rate_2011','Human_Freedom_Score'],
             ['undernourishment_rate_2012','Human_Freedom_Score'],['undernourishment_rate_2013','Human_Freedom_Score'],
             ['undernourishment_rate_2014','Human_Freedom_Score'],['undernourishment_rate_2015','Human_Freedom_Score'],
@@ -1703,54 +2584,14 @@ def plot_cat_level14(x_list: list, y_list: list):
              '[45,50)']#,'[50+']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = np.arange(0, 55, 5)
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((10,2))
-        for b in range(len(cc)):
-            if cc[b] >= 0 and cc[b]<5:
-                y_item[0][0] += cy[b]
-                y_item[0][1] += 1
-            if cc[b] >= 5 and cc[b]<10:
-                y_item[1][0] += cy[b]
-                y_item[1][1] += 1
-            if cc[b] >= 10 and cc[b]<15:
-                y_item[2][0] += cy[b]
-                y_item[2][1] += 1
-            if cc[b] >= 15 and cc[b]<20:
-                y_item[3][0] += cy[b]
-                y_item[3][1] += 1
-            if cc[b] >= 20 and cc[b]<25:
-                y_item[4][0] += cy[b]
-                y_item[4][1] += 1
-            if cc[b] >= 25 and cc[b]<30:
-                y_item[5][0] += cy[b]
-                y_item[5][1] += 1
-            if cc[b] >= 30 and cc[b]<35:
-                y_item[6][0] += cy[b]
-                y_item[6][1] += 1
-            if cc[b] >= 35 and cc[b]<40:
-                y_item[7][0] += cy[b]
-                y_item[7][1] += 1
-            if cc[b] >= 40 and cc[b]<45:
-                y_item[8][0] += cy[b]
-                y_item[8][1] += 1
-            if cc[b] >= 45 and cc[b]<50:
-                y_item[9][0] += cy[b]
-                y_item[9][1] += 1
-#             if cc[b] >= 50:
-#                 y_item[10][0] += cy[b]
-#                 y_item[10][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+item[s][0][-4:], marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('undernourishment rate')
     plt.ylabel('Freedom Score')
     #plt.ylim(1.6,2.8)
@@ -1759,9 +2600,10 @@ def plot_cat_level14(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_cat_level14')
 
 
+@cached_plot
 def box_plot_level14(level14_list: list):
     """
    The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -1783,48 +2625,20 @@ def box_plot_level14(level14_list: list):
     >>> print(type(box_plot_level14(level14_list)))
     <class 'NoneType'>
     """
-    fig, axes = plt.subplots(3, 3, figsize=(60,40))
+    fig, axes = render.subplots(3, 3, figsize=(60,40))
     item = [['undernourishment_rate_2010','Human_Freedom_Score'],['undernourishment_rate_2011','Human_Freedom_Score'],
             ['undernourishment_rate_2012','Human_Freedom_Score'],['undernourishment_rate_2013','Human_Freedom_Score'],
             ['undernourishment_rate_2014','Human_Freedom_Score'],['undernourishment_rate_2015','Human_Freedom_Score'],
             ['undernourishment_rate_2016','Human_Freedom_Score']]
+    edges = np.arange(0, 50, 5)
+    order = ['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)']
     for s in range(7):
-        cat_list = []
         data = level14_list[s]
-        cc = data[item[s][0]]
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 0 and cc[b]<5:
-                cat_list.append('[0,5)')
-            if cc[b] >= 5 and cc[b]<10:
-                cat_list.append('[5,10)')
-            if cc[b] >= 10 and cc[b]<15:
-                cat_list.append('[10,15)')
-            if cc[b] >= 15 and cc[b]<20:
-                cat_list.append('[15,20)')
-            if cc[b] >= 20 and cc[b]<25:
-                cat_list.append('[20,25)')
-            if cc[b] >= 25 and cc[b]<30:
-                cat_list.append('[25,30)')
-            if cc[b] >= 30 and cc[b]<35:
-                cat_list.append('[30,35)')
-            if cc[b] >= 35 and cc[b]<40:
-                cat_list.append('[35,40)')
-            if cc[b] >= 40 and cc[b]<45:
-                cat_list.append('[40,45)')
-            if cc[b] >= 45 and cc[b]<50:
-                cat_list.append('[45,50)')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = ['Year', 'Country', item[s][1], item[s][0], 'Catergory of Hunger']
-        box = sns.boxplot(x=item[s][1], y='Catergory of Hunger', data=new_data, whis="range", palette="vlag",
-                          ax=axes[s // 3, s % 3], 
-                          order=['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)'])
-        #rescale boxplot x-axis with log
-        axes[s // 3, s % 3].set_title('Box Plot for Data of year '+ item[s][0][-4:])
+        box_plot_bins(axes[s // 3, s % 3], data[item[s][0]], data[item[s][1]], edges, order,
+                      item[s][1], 'Catergory of Hunger', 'Box Plot for Data of year '+ item[s][0][-4:])
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_level14', fig, show=False)
 
 
 ## Part 7: Analysis of level 1-5, Physiological-Esteem by hunger + Innovation index dataset
@@ -1865,20 +2679,13 @@ def analysis_level15(hunger: list, inno_list: list):
             ['undernourishment_rate_2015','Score2015'], ['undernourishment_rate_2016','Score2016']]
     for s in range(4):
         df = level_15_list[s]
-        dd = df.sort_values(by=[item[s][0]], ascending=True)
-        x = np.asarray(dd[item[s][0]])
-        y = np.asarray(dd[item[s][1]])
-        index_list = []
-        for j in range(x.shape[0]):
-            if math.isnan(x[j]) == True or math.isnan(y[j]) == True:
-                index_list.append(j)
-        new_x = np.delete(x,index_list)
-        new_y = np.delete(y,index_list)
+        new_x, new_y = sorted_pairs(df, item[s][0], item[s][1])
         x_list.append(new_x)
         y_list.append(new_y)
     return x_list, y_list, level_15_list
 
 
+@cached_plot
 def plot_15(x_list: list, y_list: list):
     """
     This function is to use the two lists of lower and higher level data we get before and plot a figure about their relationship
@@ -1894,7 +2701,7 @@ def plot_15(x_list: list, y_list: list):
     >>> print(type(plot_15(x_list_15, y_list_15)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,15), dpi=100)
+    render.figure(figsize=(30, 15), dpi=100)
     item = [['undernourishment_rate_2013','Score2013'], ['undernourishment_rate_2014','Score2014'],
             ['undernourishment_rate_2015','Score2015'], ['undernourishment_rate_2016','Score2016']]
     marker = ['.','*','>','<','1','2','s']
@@ -1909,9 +2716,10 @@ def plot_15(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_15')
 
 
+@cached_plot
 def plot_cat_level15(x_list: list, y_list: list):
     """
     From previous plot, we can not see the trend and check if all kinds of countries satisfy this relationship.
@@ -1929,61 +2737,21 @@ def plot_cat_level15(x_list: list, y_list: list):
     >>> print(type(plot_cat_level15(x_list_15, y_list_15)))
     <class 'NoneType'>
     """
-    plt.figure(figsize = (30,20), dpi=100)
+    render.figure(figsize=(30, 20), dpi=100)
     item = [['undernourishment_rate_2013','Score2013'], ['undernourishment_rate_2014','Score2014'],
             ['undernourishment_rate_2015','Score2015'], ['undernourishment_rate_2016','Score2016']]
     x_item = ['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)',
              '[45,50)']#,'[50+']
     marker = ['.','*','>','<','1','2','s']
     color = ['#E11B00', '#1E90FF','#FF4233','#FFE333','#7EFF33','#33F4FF','#D433FF']
+    edges = np.arange(0, 55, 5)
     y_new_list = []
-    for a in range(len(x_list)):
-        cc = x_list[a]
-        cy = y_list[a]
-        y_item = np.zeros((10,2))
-        for b in range(len(cc)):
-            if cc[b] >= 0 and cc[b]<5:
-                y_item[0][0] += cy[b]
-                y_item[0][1] += 1
-            if cc[b] >= 5 and cc[b]<10:
-                y_item[1][0] += cy[b]
-                y_item[1][1] += 1
-            if cc[b] >= 10 and cc[b]<15:
-                y_item[2][0] += cy[b]
-                y_item[2][1] += 1
-            if cc[b] >= 15 and cc[b]<20:
-                y_item[3][0] += cy[b]
-                y_item[3][1] += 1
-            if cc[b] >= 20 and cc[b]<25:
-                y_item[4][0] += cy[b]
-                y_item[4][1] += 1
-            if cc[b] >= 25 and cc[b]<30:
-                y_item[5][0] += cy[b]
-                y_item[5][1] += 1
-            if cc[b] >= 30 and cc[b]<35:
-                y_item[6][0] += cy[b]
-                y_item[6][1] += 1
-            if cc[b] >= 35 and cc[b]<40:
-                y_item[7][0] += cy[b]
-                y_item[7][1] += 1
-            if cc[b] >= 40 and cc[b]<45:
-                y_item[8][0] += cy[b]
-                y_item[8][1] += 1
-            if cc[b] >= 45 and cc[b]<50:
-                y_item[9][0] += cy[b]
-                y_item[9][1] += 1
-#             if cc[b] >= 50:
-#                 y_item[10][0] += cy[b]
-#                 y_item[10][1] += 1
-        y_new = np.zeros(y_item.shape[0])
-        for c in range(y_item.shape[0]):
-            if y_item[c][1] == 0:
-                y_new[c] = math.nan
-            else:
-                y_new[c] = y_item[c][0]/y_item[c][1]
-        y_new_list.append(y_new)
+    for x, y in zip(x_list, y_list):
+        y_new_list.append(bin_stats(x, y, edges)['mean'].to_numpy())
+    low, high = bin_bands(x_list, y_list, edges)
     for s in range(len(y_new_list)):
         plt.plot(x_item,y_new_list[s],label = 'data of year '+item[s][0][-4:], marker = marker[s],color = color[s])
+        plt.fill_between(x_item, low[s], high[s], color = color[s], alpha = .15)
     plt.xlabel('undernourishment rate')
     plt.ylabel('Innovation Index Score')
     #plt.ylim(1.6,2.8)
@@ -1992,9 +2760,10 @@ def plot_cat_level15(x_list: list, y_list: list):
     plt.grid(axis='both',alpha = .3)
     plt.legend()
     plt.gca().invert_xaxis()
-    plt.show()
+    render.finish('plot_cat_level15')
 
 
+@cached_plot
 def box_plot_level15(level_15_list: list):
     """
     The last step of analysis in each step is to check if the results we got suits for all the kinds of countries, like
@@ -2014,47 +2783,19 @@ def box_plot_level15(level_15_list: list):
     >>> print(type(box_plot_level15(level_15_list)))
     <class 'NoneType'>
     """
-    fig, axes = plt.subplots(2, 2, figsize=(60,40))
+    fig, axes = render.subplots(2, 2, figsize=(60,40))
     item = [['undernourishment_rate_2013','Score2013'], ['undernourishment_rate_2014','Score2014'],
             ['undernourishment_rate_2015','Score2015'], ['undernourishment_rate_2016','Score2016']]
     inno_item = ['Innovation index score of year 2013','Innovation index score of year 2014',
                  'Innovation index score of year 2015','Innovation index score of year 2016']
+    edges = np.arange(0, 50, 5)
+    order = ['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)']
     for s in range(4):
-        cat_list = []
         data = level_15_list[s]
-        cc = data[item[s][0]]
-        for b in range(data.iloc[:,0].size):
-            if math.isnan(cc[b]) == True:
-                cat_list.append(math.nan)
-            if cc[b] >= 0 and cc[b]<5:
-                cat_list.append('[0,5)')
-            if cc[b] >= 5 and cc[b]<10:
-                cat_list.append('[5,10)')
-            if cc[b] >= 10 and cc[b]<15:
-                cat_list.append('[10,15)')
-            if cc[b] >= 15 and cc[b]<20:
-                cat_list.append('[15,20)')
-            if cc[b] >= 20 and cc[b]<25:
-                cat_list.append('[20,25)')
-            if cc[b] >= 25 and cc[b]<30:
-                cat_list.append('[25,30)')
-            if cc[b] >= 30 and cc[b]<35:
-                cat_list.append('[30,35)')
-            if cc[b] >= 35 and cc[b]<40:
-                cat_list.append('[35,40)')
-            if cc[b] >= 40 and cc[b]<45:
-                cat_list.append('[40,45)')
-            if cc[b] >= 45 and cc[b]<50:
-                cat_list.append('[45,50)')
-        cat_col = pd.DataFrame(cat_list)
-        new_data = pd.concat([data,cat_col],axis=1)
-        new_data.columns = ['Country', item[s][0], inno_item[s], 'Percentage Range of Hunger']
-        box = sns.boxplot(x=inno_item[s], y='Percentage Range of Hunger', data=new_data, whis="range", palette="vlag",
-                          ax=axes[s // 2, s % 2], 
-                          order=['[0,5)','[5,10)','[10,15)','[15,20)','[20,25)','[25,30)','[30,35)','[35,40)','[40,45)'])
-        #rescale boxplot x-axis with log
-        axes[s // 2, s % 2].set_title('Box Plot for Data of year '+ item[s][0][-4:])
+        box_plot_bins(axes[s // 2, s % 2], data[item[s][0]], data[item[s][1]], edges, order,
+                      inno_item[s], 'Percentage Range of Hunger', 'Box Plot for Data of year '+ item[s][0][-4:])
 
         fig.subplots_adjust(wspace=.4)
+    render.finish('box_plot_level15', fig, show=False)
 
 
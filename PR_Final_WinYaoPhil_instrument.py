@@ -0,0 +1,269 @@
+# Opt-in timing and memory instrumentation of the loaders, transforms and plots of PR_Final_WinYaoPhil_functions.
+# MASLOW_INSTRUMENT=<folder> python 590PR_Final_WinYaoPhil.py writes the records of every call to <folder>, and
+# MASLOW_PROFILE=1 adds a cProfile dump of the whole run to the same folder.
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import functools
+import pandas as pd
+import PR_Final_WinYaoPhil_functions as functions
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, the peak memory is then left empty
+    resource = None
+
+INSTRUMENT_VARIABLE = 'MASLOW_INSTRUMENT'
+PROFILE_VARIABLE = 'MASLOW_PROFILE'
+
+# the Data methods recorded as the load stage
+LOAD_METHODS = ['read_csv', 'read_peace', 'get_peace', 'get_trade', 'get_hunger', 'get_unemployment', 'get_suicide',
+                'get_freedom', 'get_happiness', 'get_poverty', 'get_marital', 'get_innovation']
+
+# the plot functions recorded as the plot stage, the helpers they draw with (box_plot_bins, plot_cache_salt...) are
+# left out
+PLOT_FUNCTIONS = ['plot12', 'plot_cat12', 'box_plot_level12', 'plot_level_23', 'plot_level_p_h', 'plot_cat_ph',
+                  'box_plot_level_ph', 'plot_level_h_f', 'plot_cat_hf', 'box_plot_level_hf', 'plot_level_24',
+                  'plot_cat24', 'box_plot_level24', 'plot45', 'plot45_cat', 'box_plot_45', 'plot_14',
+                  'plot_cat_level14', 'box_plot_level14', 'plot_15', 'plot_cat_level15', 'box_plot_level15']
+
+
+def peak_rss() -> float:
+    """
+    The function to read the peak resident memory of this process
+
+    :return: peak resident set size in MB, None where the resource module is missing
+
+    >>> peak_rss() > 0
+    True
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux and the BSDs
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def count_rows(value) -> int:
+    """
+    The function to count the data rows of a value returned by a loader, transform or plot: the rows of a frame, the
+    length of an array, summed over the items of lists, tuples and dicts
+
+    :param value: the returned value
+    :return: number of rows, None when the value holds no data
+
+    >>> count_rows(pd.DataFrame({'a': [1, 2]})), count_rows(([pd.Series([1])], {'b': pd.Series([1, 2, 3])}))
+    (2, 4)
+    >>> count_rows('no data') is None
+    True
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)) or hasattr(value, 'shape'):
+        return len(value)
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (list, tuple)):
+        counts = [count_rows(item) for item in value]
+        counts = [count for count in counts if count is not None]
+        return sum(counts) if counts else None
+    return None
+
+
+class Recorder(object):
+    """
+    Collects one record per instrumented call: its stage, its name, the wall and CPU time, the peak resident memory of
+    the process after the call and how much the call raised it, the rows of the returned data (of the plotted data for
+    the plot functions) and the depth of the call (loaders called by other loaders or by prep_* functions are nested).
+
+    Required:
+    import cProfile
+    import resource
+
+    >>> recorder = Recorder()
+    >>> double = recorder.wrap(lambda df: pd.concat([df, df]), 'transform', 'double')
+    >>> len(double(pd.DataFrame({'a': [1, 2]})))
+    4
+    >>> recorder.records[0]['name'], recorder.records[0]['rows']
+    ('double', 4)
+    >>> draw = recorder.wrap(lambda x_list, y_list: None, 'plot', 'draw')
+    >>> draw([pd.Series([1., 2., 3.]), pd.Series([1., 2.])], [pd.Series([4., 5., 6.]), pd.Series([4., 5.])])
+    >>> recorder.records[1]['rows']
+    5
+    """
+    def __init__(self: object, profile: bool = False):
+        self.records = []
+        self.depth = 0
+        self.start = time.time()
+        self.start_perf = time.perf_counter()
+        self.profiler = cProfile.Profile() if profile else None
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def wrap(self: object, function, stage: str, name: str):
+        """
+        The function to wrap a function so that every call is recorded
+
+        :param function: the function to wrap
+        :param stage: 'load', 'transform' or 'plot'
+        :param name: the name recorded for the calls
+        :return: the wrapped function
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            rss = peak_rss()
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            self.depth += 1
+            error = None
+            try:
+                result = function(*args, **kwargs)
+                return result
+            except Exception as e:
+                result = None
+                error = type(e).__name__
+                raise
+            finally:
+                self.depth -= 1
+                peak = peak_rss()
+                # the plot functions return nothing or an image path, so their rows are the ones of the plotted data:
+                # the first argument, the x_list of the scatter and category plots or the frames of the box plots
+                rows = count_rows(args[0] if args else None) if stage == 'plot' else count_rows(result)
+                self.records.append({'stage': stage, 'name': name, 'depth': self.depth,
+                                     'start': wall - self.start_perf, 'wall': time.perf_counter() - wall,
+                                     'cpu': time.process_time() - cpu, 'peak_rss_mb': peak,
+                                     'rss_growth_mb': None if peak is None else peak - rss,
+                                     'rows': rows, 'error': error})
+        wrapper.instrumented = function
+        return wrapper
+
+    def frame(self: object) -> pd.DataFrame:
+        """
+        The function to get the records as a frame, in the order the calls ended
+
+        :return: Data Frame with one row per call
+        """
+        return pd.DataFrame(self.records, columns=['stage', 'name', 'depth', 'start', 'wall', 'cpu', 'peak_rss_mb',
+                                                   'rss_growth_mb', 'rows', 'error'])
+
+    def summary(self: object) -> pd.DataFrame:
+        """
+        The function to sum up the records per function: the number of calls, the total wall and CPU time, the largest
+        growth of the peak memory and the rows of the last call
+
+        :return: Data Frame indexed by stage and name, the slowest functions first
+        """
+        grouped = self.frame().groupby(['stage', 'name'], sort=False)
+        table = pd.DataFrame({'calls': grouped.size(), 'wall': grouped['wall'].sum(), 'cpu': grouped['cpu'].sum(),
+                              'rss_growth_mb': grouped['rss_growth_mb'].max(), 'rows': grouped['rows'].last()})
+        return table.sort_values('wall', ascending=False)
+
+    def write(self: object, directory: str) -> list:
+        """
+        The function to write the records as instrument.json and instrument.csv, and the profile as profile.pstats
+
+        :param directory: folder to write to, created if missing
+        :return: paths of the written files
+        """
+        os.makedirs(directory, exist_ok=True)
+        records = self.frame()
+        paths = [os.path.join(directory, 'instrument.json'), os.path.join(directory, 'instrument.csv')]
+        with open(paths[0], 'w') as f:
+            json.dump({'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.start)),
+                       'records': json.loads(records.to_json(orient='records'))}, f, indent=1)
+        records.to_csv(paths[1], index=False)
+        if self.profiler is not None:
+            self.profiler.disable()
+            paths.append(os.path.join(directory, 'profile.pstats'))
+            self.profiler.dump_stats(paths[-1])
+        return paths
+
+
+# the recorder set up by install, None while the functions are not instrumented
+recorder = None
+_originals = {}
+
+
+def install(profile: bool = False) -> Recorder:
+    """
+    The function to instrument the loaders of Data, the prep_*, marriage rate and analysis_* transforms and the
+    PLOT_FUNCTIONS of PR_Final_WinYaoPhil_functions. The module attributes are replaced, so the script must call install
+    before importing the functions by name (from PR_Final_WinYaoPhil_functions import *).
+
+    :param profile: whether to run cProfile until report
+    :return: the Recorder
+
+    >>> recorder = install()
+    >>> rows = len(functions.prep_freedom())
+    >>> recorder.summary().loc['transform'].index.tolist()
+    ['prep_freedom']
+    >>> uninstall()
+    """
+    global recorder
+    if recorder is not None:
+        return recorder
+    recorder = Recorder(profile)
+    for name in LOAD_METHODS:
+        _originals[(functions.Data, name)] = functions.Data.__dict__[name]
+        setattr(functions.Data, name, recorder.wrap(functions.Data.__dict__[name], 'load', name))
+    for name, value in list(vars(functions).items()):
+        if not callable(value) or isinstance(value, type) or getattr(value, '__module__', None) != functions.__name__:
+            continue
+        if name.startswith(('prep_', 'analysis_')) or name in ('get_marriage_rate', 'marriage_rate_table'):
+            stage = 'transform'
+        elif name in PLOT_FUNCTIONS:
+            stage = 'plot'
+        else:
+            continue
+        _originals[(functions, name)] = value
+        setattr(functions, name, recorder.wrap(value, stage, name))
+    return recorder
+
+
+def uninstall():
+    """
+    The function to put the original functions back and drop the recorder
+    """
+    global recorder
+    for (owner, name), value in _originals.items():
+        setattr(owner, name, value)
+    _originals.clear()
+    recorder = None
+
+
+def install_from_env() -> Recorder:
+    """
+    The function to instrument the functions when MASLOW_INSTRUMENT is set, with the profiler when MASLOW_PROFILE is
+    set to anything but 0
+
+    :return: the Recorder, None when the instrumentation is off
+    """
+    if not os.environ.get(INSTRUMENT_VARIABLE):
+        return None
+    return install(os.environ.get(PROFILE_VARIABLE, '0') not in ('', '0'))
+
+
+def report(directory: str = None, top: int = 20) -> pd.DataFrame:
+    """
+    The function to print the summary table of the instrumented calls and write the records, and the profile with its
+    slowest functions when it is on
+
+    :param directory: folder to write to, the one of MASLOW_INSTRUMENT if None
+    :param top: number of functions of the profile printed
+    :return: the summary table, None when the instrumentation is off
+    """
+    if recorder is None:
+        return None
+    if directory is None:
+        directory = os.environ.get(INSTRUMENT_VARIABLE)
+    summary = recorder.summary()
+    print(summary.round(3).to_string())
+    if directory:
+        paths = recorder.write(directory)
+        print('instrumentation written to %s' % ', '.join(paths))
+        if recorder.profiler is not None:
+            pstats.Stats(paths[-1]).sort_stats('cumulative').print_stats(top)
+    return summary
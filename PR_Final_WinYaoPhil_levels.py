@@ -0,0 +1,431 @@
+# Declarative level pairs of the hierarchy of needs and the batched engine aligning their data on the Panel
+
+import itertools
+import numpy as np
+import pandas as pd
+from PR_Final_WinYaoPhil_panel import Panel
+
+# level of the hierarchy of needs measured by every indicator of the panel
+LEVELS = {
+    'undernourishment': 1,
+    'peace': 2,
+    'marriage': 3,
+    'happiness': 3,
+    'freedom': 4,
+    'innovation': 5,
+}
+
+# indicator used for a level when a pair is asked by level numbers
+LEVEL_INDICATORS = {1: 'undernourishment', 2: 'peace', 3: 'happiness', 4: 'freedom', 5: 'innovation'}
+
+LEVEL_NAMES = {1: 'Physiological', 2: 'Safety', 3: 'Belonging', 4: 'Esteem', 5: 'Self Actualization'}
+
+
+class LevelPair(object):
+    """
+    Spec of one analysis: the indicator of the lower level, the indicator of the higher level and the years to look at.
+
+    Without years, the engine uses every year where both indicators have data, so a new year in the datasets needs no
+    code change.
+
+    >>> pair = LevelPair('peace', 'happiness', range(2015, 2018))
+    >>> pair
+    LevelPair('peace', 'happiness', [2015, 2016, 2017])
+    >>> pair.levels, pair.title
+    ((2, 3), 'Safety-Belonging')
+    """
+    def __init__(self: object, lower: str, higher: str, years=None):
+        self.lower = lower
+        self.higher = higher
+        self.years = None if years is None else [int(year) for year in years]
+
+    def __repr__(self: object) -> str:
+        return 'LevelPair(%r, %r, %r)' % (self.lower, self.higher, self.years)
+
+    @property
+    def levels(self: object) -> tuple:
+        return LEVELS[self.lower], LEVELS[self.higher]
+
+    @property
+    def title(self: object) -> str:
+        return '%s-%s' % tuple(LEVEL_NAMES[level] for level in self.levels)
+
+    @classmethod
+    def of_levels(cls, lower: int, higher: int, years=None):
+        """
+        The function to make the spec of any pair of levels with the default indicator of each level
+
+        :param lower: number of the lower level, 1 to 5
+        :param higher: number of the higher level, 1 to 5
+        :param years: years to look at, None for every year with data
+        :return: the LevelPair
+
+        >>> LevelPair.of_levels(1, 5)
+        LevelPair('undernourishment', 'innovation', None)
+        """
+        return cls(LEVEL_INDICATORS[lower], LEVEL_INDICATORS[higher], years)
+
+
+# the analyses of the driver script, with the years of the original analysis_* functions
+LEVEL_PAIRS = {
+    '12': LevelPair('undernourishment', 'peace', range(2010, 2017)),
+    '23': LevelPair('peace', 'marriage', range(2010, 2018)),
+    'ph': LevelPair('peace', 'happiness', range(2015, 2018)),
+    'hf': LevelPair('happiness', 'freedom', range(2015, 2017)),
+    '24': LevelPair('peace', 'freedom', range(2010, 2016)),
+    '45': LevelPair('freedom', 'innovation', range(2013, 2017)),
+    '14': LevelPair('undernourishment', 'freedom', range(2010, 2017)),
+    '15': LevelPair('undernourishment', 'innovation', range(2013, 2017)),
+}
+
+
+def pair_years(panel: Panel, pair: LevelPair) -> list:
+    """
+    The function to get the years of a pair: its own years, or every year of the panel where at least one country has
+    both indicators
+
+    :param panel: the Panel
+    :param pair: the LevelPair
+    :return: list of years
+    """
+    if pair.years is not None:
+        return pair.years
+    both = ~(np.isnan(panel.cube[panel.code(pair.lower)]) | np.isnan(panel.cube[panel.code(pair.higher)]))
+    return [year for year, has in zip(panel.years, both.any(axis=0)) if has]
+
+
+def pair_arrays(panel: Panel, pair: LevelPair) -> (list, list, list):
+    """
+    The engine of every analysis: the lower and higher level data of all the years of a pair are taken from the panel
+    cube as two (year, country) matrices, the countries missing either value are masked out, and one lexsort on
+    (year, lower value) orders all the years at once. The result is split back into one array per year, sorted by the
+    lower level value like sorted_pairs does.
+
+    :param panel: the Panel
+    :param pair: the LevelPair
+    :return: list of years, list of lower level arrays and list of higher level arrays, one per year
+
+    >>> frames = {'peace': pd.DataFrame({'Country': ['A', 'B', 'C', 'A'], 'Year': [2015, 2015, 2015, 2016],
+    ...                                  'Value': [2.0, 1.0, 3.0, 1.5]}),
+    ...           'happiness': pd.DataFrame({'Country': ['A', 'B', 'A', 'B'], 'Year': [2015, 2015, 2016, 2016],
+    ...                                      'Value': [5.0, 6.0, 5.5, 7.0]})}
+    >>> years, x_list, y_list = pair_arrays(Panel.from_frames(frames), LevelPair('peace', 'happiness'))
+    >>> years, x_list, y_list
+    ([2015, 2016], [array([1., 2.]), array([1.5])], [array([6., 5.]), array([5.5])])
+    """
+    years = pair_years(panel, pair)
+    n_countries = len(panel.countries)
+    x = np.full((len(years), n_countries), np.nan)
+    y = np.full((len(years), n_countries), np.nan)
+    columns = np.array(years, dtype=int) - panel.year0
+    inside = (columns >= 0) & (columns < panel.cube.shape[2])
+    x[inside] = panel.cube[panel.code(pair.lower)][:, columns[inside]].T
+    y[inside] = panel.cube[panel.code(pair.higher)][:, columns[inside]].T
+    keep = ~(np.isnan(x) | np.isnan(y))
+    row, col = np.nonzero(keep)
+    x_values = x[row, col]
+    y_values = y[row, col]
+    order = np.lexsort((x_values, row))
+    splits = np.cumsum(keep.sum(axis=1))[:-1]
+    x_list = np.split(x_values[order], splits)
+    y_list = np.split(y_values[order], splits)
+    return years, x_list, y_list
+
+
+def analyze(panel: Panel, name: str) -> (list, list, list):
+    """
+    The function to run one of the registered analyses
+
+    :param panel: the Panel
+    :param name: key of LEVEL_PAIRS, or two level numbers like '13' for a pair with no registered analysis
+    :return: list of years, list of lower level arrays and list of higher level arrays, one per year
+
+    >>> panel = Panel.from_data()
+    >>> years, x_list, y_list = analyze(panel, 'ph')
+    >>> years, [len(x) for x in x_list] == [len(y) for y in y_list]
+    ([2015, 2016, 2017], True)
+    >>> analyze(panel, '35')[0]
+    [2015, 2016, 2017]
+    """
+    if name in LEVEL_PAIRS:
+        pair = LEVEL_PAIRS[name]
+    else:
+        pair = LevelPair.of_levels(int(name[0]), int(name[1]))
+    return pair_arrays(panel, pair)
+
+
+def masked_pearson(x: np.ndarray, y: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    """
+    The function to compute the Pearson correlation of every row of two matrices, using only the kept cells
+
+    :param x: matrix of the lower level data, one row per sample
+    :param y: matrix of the higher level data, same shape
+    :param keep: boolean matrix of the cells to use
+    :return: correlation of each row, NaN for rows with less than 3 kept cells or no variance
+
+    >>> x = np.array([[1., 2., 3., 4.], [1., 2., 3., np.nan]])
+    >>> y = np.array([[2., 4., 6., 8.], [3., 2., 1., 0.]])
+    >>> masked_pearson(x, y, ~(np.isnan(x) | np.isnan(y)))
+    array([ 1., -1.])
+    """
+    n = keep.sum(axis=1)
+    x = np.where(keep, x, 0.0)
+    y = np.where(keep, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx = np.where(keep, x - (x.sum(axis=1) / n)[:, None], 0.0)
+        dy = np.where(keep, y - (y.sum(axis=1) / n)[:, None], 0.0)
+        r = (dx * dy).sum(axis=1) / np.sqrt((dx * dx).sum(axis=1) * (dy * dy).sum(axis=1))
+    return np.where(n >= 3, r, np.nan)
+
+
+def masked_ranks(values: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    """
+    The function to rank the kept cells of every row of a matrix from 1 to n, ties getting their average rank. The
+    rows are ranked all at once: one argsort along the rows, then the tied runs of the sorted rows are numbered across
+    the whole matrix and averaged with one bincount.
+
+    :param values: matrix of the data, one row per sample
+    :param keep: boolean matrix of the cells to rank, the other cells get ranks after n
+    :return: matrix of the ranks
+
+    >>> values = np.array([[10., 30., 20., 20.], [5., 1., 7., 3.]])
+    >>> masked_ranks(values, np.array([[True] * 4, [True, True, False, True]]))
+    array([[1. , 4. , 2.5, 2.5],
+           [3. , 1. , 4. , 2. ]])
+    """
+    v = np.where(keep, values, np.inf)
+    order = np.argsort(v, axis=1, kind='stable')
+    s = np.take_along_axis(v, order, axis=1)
+    n_rows, n_cols = s.shape
+    new = np.ones(s.shape, dtype=bool)
+    new[:, 1:] = s[:, 1:] != s[:, :-1]
+    group = np.cumsum(new.ravel()) - 1
+    position = np.tile(np.arange(1, n_cols + 1, dtype=float), n_rows)
+    average = np.bincount(group, weights=position) / np.bincount(group)
+    ranks = np.empty(s.shape)
+    np.put_along_axis(ranks, order, average[group].reshape(s.shape), axis=1)
+    return ranks
+
+
+def rank_bins(x_ranks: np.ndarray, keep: np.ndarray, n_bins: int = 5) -> np.ndarray:
+    """
+    The function to cut the kept cells of every row into n_bins bins of equal count by the rank of the lower level value
+
+    :param x_ranks: matrix of the ranks of the lower level data from masked_ranks
+    :param keep: boolean matrix of the cells to use
+    :param n_bins: number of bins per row
+    :return: int matrix of the bin of every cell, from 0 to n_bins - 1 (the cells that are not kept get 0)
+
+    >>> x = np.array([[4., 1., 3., 2., 6., 5.]])
+    >>> keep = np.ones(x.shape, dtype=bool)
+    >>> rank_bins(masked_ranks(x, keep), keep, n_bins=3)
+    array([[1, 0, 1, 0, 2, 2]])
+    """
+    n = keep.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bins = np.floor((x_ranks - 1) * n_bins / n[:, None])
+    return np.clip(np.nan_to_num(bins, nan=0, posinf=0, neginf=0), 0, n_bins - 1).astype(int)
+
+
+def binned_monotonicity(y: np.ndarray, x_ranks: np.ndarray, keep: np.ndarray, n_bins: int = 5) -> np.ndarray:
+    """
+    The function to measure how monotonic the higher level is along the lower level: the kept cells of every row are
+    cut into n_bins bins of equal count by the rank of the lower level value, and the result is the mean sign of the
+    differences between the mean higher level values of neighbouring bins, from -1 (always decreasing) to 1 (always
+    increasing)
+
+    :param y: matrix of the higher level data, one row per sample
+    :param x_ranks: matrix of the ranks of the lower level data from masked_ranks
+    :param keep: boolean matrix of the cells to use
+    :param n_bins: number of bins per row
+    :return: monotonicity of each row, NaN for rows with less than n_bins kept cells
+
+    >>> x = np.array([[1., 2., 3., 4., 5., 6.]])
+    >>> keep = np.ones(x.shape, dtype=bool)
+    >>> binned_monotonicity(np.array([[1., 2., 3., 2., 5., 6.]]), masked_ranks(x, keep), keep, n_bins=3)
+    array([1.])
+    >>> binned_monotonicity(np.array([[6., 5., 1., 3., 2., 1.]]), masked_ranks(x, keep), keep, n_bins=3)
+    array([-1.])
+    """
+    n = keep.sum(axis=1)
+    n_rows = y.shape[0]
+    bins = rank_bins(x_ranks, keep, n_bins)
+    flat = (np.arange(n_rows)[:, None] * n_bins + bins)[keep]
+    sums = np.bincount(flat, weights=y[keep], minlength=n_rows * n_bins).reshape(n_rows, n_bins)
+    counts = np.bincount(flat, minlength=n_rows * n_bins).reshape(n_rows, n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    steps = np.sign(np.diff(means, axis=1))
+    return np.where(n >= n_bins, steps.mean(axis=1), np.nan)
+
+
+def pyramid_arrays(panel: Panel, years: list, pairs: list = None) -> (dict, np.ndarray, np.ndarray, np.ndarray):
+    """
+    The function to take the data of every pair of levels in every year from the panel cube as two matrices with one
+    row per (pair, year) and the countries as columns
+
+    :param panel: the Panel
+    :param years: years to look at
+    :param pairs: list of (lower level, higher level) tuples to take, every pair of levels if None; only the levels of
+    these pairs are read from the cube
+    :return: dict of the lower level, higher level and year of every row, the matrix of the lower level data, the one
+    of the higher level data and the boolean matrix of the cells where both are known
+
+    >>> keys, x, y, keep = pyramid_arrays(Panel.from_data(), [2015, 2016])
+    >>> x.shape[0], keys['lower'][:3].tolist(), keys['year'][:3].tolist()
+    (20, [1, 1, 1], [2015, 2016, 2015])
+    >>> keys, x, y, keep = pyramid_arrays(Panel.from_data(), [2015, 2016], [(4, 5)])
+    >>> x.shape[0], keys['lower'].tolist(), keys['higher'].tolist()
+    (2, [4, 4], [5, 5])
+    """
+    if pairs is None:
+        pairs = list(itertools.combinations(sorted(LEVEL_INDICATORS), 2))
+    columns = np.array(years, dtype=int) - panel.year0
+    inside = (columns >= 0) & (columns < panel.cube.shape[2])
+    levels = np.full((len(LEVEL_INDICATORS), len(years), len(panel.countries)), np.nan)
+    used = set(level for pair in pairs for level in pair)
+    for i, level in enumerate(sorted(LEVEL_INDICATORS)):
+        if level in used and LEVEL_INDICATORS[level] in panel.indicators:
+            levels[i][inside] = panel.cube[panel.code(LEVEL_INDICATORS[level])][:, columns[inside]].T
+    lower = np.array([a - 1 for a, b in pairs], dtype=int)
+    higher = np.array([b - 1 for a, b in pairs], dtype=int)
+    x = levels[lower].reshape(-1, len(panel.countries))
+    y = levels[higher].reshape(-1, len(panel.countries))
+    keys = {'lower': np.repeat(lower + 1, len(years)), 'higher': np.repeat(higher + 1, len(years)),
+            'year': np.tile(np.array(years, dtype=int), len(pairs))}
+    return keys, x, y, ~(np.isnan(x) | np.isnan(y))
+
+
+def pyramid_matrix(panel: Panel, years: list = None, n_bins: int = 5, pairs: list = None) -> pd.DataFrame:
+    """
+    The function to compute the trend statistics of every pair of levels of the pyramid in every year in one batched
+    run. The data of the five levels is taken once from the panel cube, every (pair, year) becomes one row of two
+    matrices with the countries as columns, and the Pearson correlation, the Spearman correlation and the binned
+    monotonicity of all rows are computed together.
+
+    :param panel: the Panel
+    :param years: years to look at, every year of the panel by default
+    :param n_bins: number of bins of the binned monotonicity
+    :param pairs: list of (lower level, higher level) tuples to compute, every pair of levels if None
+    :return: long Data Frame with one row per pair of levels and year: lower, higher (level numbers), year, n,
+    pearson, spearman and monotonicity
+
+    >>> matrix = pyramid_matrix(Panel.from_data())
+    >>> sorted(set(zip(matrix['lower'], matrix['higher']))) == list(itertools.combinations(range(1, 6), 2))
+    True
+    >>> list(matrix.columns)
+    ['lower', 'higher', 'year', 'n', 'pearson', 'spearman', 'monotonicity']
+    >>> sorted(set(pyramid_matrix(Panel.from_data(), pairs=[(1, 2), (4, 5)])['higher']))
+    [2, 5]
+    """
+    if years is None:
+        years = panel.years
+    keys, x, y, keep = pyramid_arrays(panel, years, pairs)
+    x_ranks = masked_ranks(x, keep)
+    y_ranks = masked_ranks(y, keep)
+    return pd.DataFrame({
+        'lower': keys['lower'],
+        'higher': keys['higher'],
+        'year': keys['year'],
+        'n': keep.sum(axis=1),
+        'pearson': masked_pearson(x, y, keep),
+        'spearman': masked_pearson(x_ranks, y_ranks, keep),
+        'monotonicity': binned_monotonicity(y, x_ranks, keep, n_bins),
+    })
+
+
+def pyramid_square(matrix: pd.DataFrame, statistic: str = 'spearman') -> pd.DataFrame:
+    """
+    The function to fold the output of pyramid_matrix into the 5 x 5 matrix of the levels, averaging one statistic
+    over the years where it is defined
+
+    :param matrix: Data Frame returned by pyramid_matrix
+    :param statistic: 'pearson', 'spearman' or 'monotonicity'
+    :return: Data Frame with the lower levels as rows and the higher levels as columns
+
+    >>> square = pyramid_square(pyramid_matrix(Panel.from_data()))
+    >>> square.shape, bool(square.loc[4, 5] > 0.5)
+    ((5, 5), True)
+    """
+    mean = matrix.groupby(['lower', 'higher'])[statistic].mean()
+    levels = sorted(LEVEL_INDICATORS)
+    return mean.unstack().reindex(index=levels, columns=levels)
+
+
+def lag_matrix(panel: Panel, max_lag: int = 3, years: list = None, differences: bool = False) -> pd.DataFrame:
+    """
+    The function to correlate the lower level of every pair of levels in year t with the higher level in year t + k,
+    for k from -max_lag to max_lag, over all the countries in one batched run: a positive k has the lower level
+    leading, a negative one the higher level. The year axis of the five levels taken from the panel cube is padded
+    with max_lag empty years on both sides, so that the window of 2 * max_lag + 1 years around year t starts at the
+    padded column t and one fancy index lines up the higher level of every lag with the lower level without merging
+    anything per lag; every (pair, year, lag) is then one row of the matrices of masked_pearson and masked_ranks.
+
+    :param panel: the Panel
+    :param max_lag: largest lag in years
+    :param years: years t of the lower level, every year of the panel by default
+    :param differences: correlate the changes from the year before instead of the values, so that the countries
+    improving first are compared rather than the ones doing well
+    :return: long Data Frame with one row per pair of levels, year and lag: lower, higher (level numbers), year, lag,
+    n, pearson and spearman
+
+    >>> panel = Panel.from_data()
+    >>> lags = lag_matrix(panel, 2)
+    >>> sorted(lags['lag'].unique())
+    [-2, -1, 0, 1, 2]
+    >>> same = lags[lags['lag'] == 0].dropna().reset_index(drop=True)
+    >>> matrix = pyramid_matrix(panel).dropna(subset=['spearman']).reset_index(drop=True)
+    >>> bool(np.allclose(same['spearman'], matrix['spearman']))
+    True
+    """
+    if years is None:
+        years = panel.years
+    n_years = panel.cube.shape[2]
+    levels = np.full((len(LEVEL_INDICATORS), len(panel.countries), n_years), np.nan)
+    for i, level in enumerate(sorted(LEVEL_INDICATORS)):
+        if LEVEL_INDICATORS[level] in panel.indicators:
+            levels[i] = panel.cube[panel.code(LEVEL_INDICATORS[level])]
+    if differences:
+        levels[:, :, 1:] = np.diff(levels, axis=2)
+        levels[:, :, 0] = np.nan
+    padded = np.pad(levels, ((0, 0), (0, 0), (max_lag, max_lag)), 'constant', constant_values=np.nan)
+    columns = np.array(years, dtype=int) - panel.year0
+    columns = columns[(columns >= 0) & (columns < n_years)]
+    pairs = list(itertools.combinations(sorted(LEVEL_INDICATORS), 2))
+    lower = np.array([a - 1 for a, b in pairs])
+    higher = np.array([b - 1 for a, b in pairs])
+    n_lags = 2 * max_lag + 1
+    # (pair, country, year, lag) -> one row per (pair, year, lag) with the countries as columns
+    x = np.broadcast_to(levels[lower][:, :, columns, None], (len(pairs), len(panel.countries), len(columns), n_lags))
+    # the original year t is the padded column t + max_lag, so its window of lags starts at the padded column t
+    y = padded[higher][:, :, columns[:, None] + np.arange(n_lags)]
+    x = x.transpose(0, 2, 3, 1).reshape(-1, len(panel.countries))
+    y = y.transpose(0, 2, 3, 1).reshape(-1, len(panel.countries))
+    keep = ~(np.isnan(x) | np.isnan(y))
+    rows = len(columns) * n_lags
+    return pd.DataFrame({
+        'lower': np.repeat(lower + 1, rows),
+        'higher': np.repeat(higher + 1, rows),
+        'year': np.tile(np.repeat(columns + panel.year0, n_lags), len(pairs)),
+        'lag': np.tile(np.arange(-max_lag, max_lag + 1), len(pairs) * len(columns)),
+        'n': keep.sum(axis=1),
+        'pearson': masked_pearson(x, y, keep),
+        'spearman': masked_pearson(masked_ranks(x, keep), masked_ranks(y, keep), keep),
+    })
+
+
+def lag_square(lags: pd.DataFrame, statistic: str = 'spearman') -> pd.DataFrame:
+    """
+    The function to fold the output of lag_matrix into one row per pair of levels and one column per lag, averaging
+    one statistic over the years where it is defined: a lower level whose improvements come first shows larger values
+    on the positive lags than on the negative ones
+
+    :param lags: Data Frame returned by lag_matrix
+    :param statistic: 'pearson' or 'spearman'
+    :return: Data Frame indexed by the lower and higher levels with the lags as columns
+
+    >>> square = lag_square(lag_matrix(Panel.from_data(), 1))
+    >>> square.shape, list(square.columns)
+    ((10, 3), [-1, 0, 1])
+    """
+    return lags.groupby(['lower', 'higher', 'lag'])[statistic].mean().unstack()
@@ -0,0 +1,321 @@
+# Tidy country x year x indicator store built once from every Data loader
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from PR_Final_WinYaoPhil_functions import Data, marriage_rate_table
+from PR_Final_WinYaoPhil_countries import CountryIndex
+
+
+def long_hunger(data: Data) -> pd.DataFrame:
+    """
+    The function to melt the undernourishment_rate_<year> columns of the hunger data into Country, Year and Value
+
+    :param data: the Data object to load from
+    :return: long format Data Frame of the undernourishment rate
+    """
+    wide = data.get_hunger()
+    value_cols = [c for c in wide.columns if c.startswith('undernourishment_rate_')]
+    df = wide.melt(id_vars='Country', value_vars=value_cols, var_name='Year', value_name='Value')
+    df['Year'] = df['Year'].str[len('undernourishment_rate_'):].astype(int)
+    return df
+
+
+def long_peace(data: Data) -> pd.DataFrame:
+    """
+    The function to melt the pi_<year> columns of the peace index into Country, Year and Value
+
+    :param data: the Data object to load from
+    :return: long format Data Frame of the global peace index
+    """
+    wide = data.get_peace()
+    value_cols = [c for c in wide.columns if c.startswith('pi_')]
+    df = wide.melt(id_vars='Country', value_vars=value_cols, var_name='Year', value_name='Value')
+    df['Year'] = df['Year'].str[len('pi_'):].astype(int)
+    return df
+
+
+def long_happiness(data: Data) -> pd.DataFrame:
+    """
+    The function to stack the yearly happiness reports into Country, Year and Value. The 2017 report names the score
+    column 'Happiness.Score' instead of 'Happiness Score'.
+
+    :param data: the Data object to load from
+    :return: long format Data Frame of the happiness score
+    """
+    frames = []
+    for name, df in sorted(data.get_happiness().items()):
+        score = 'Happiness Score' if 'Happiness Score' in df.columns else 'Happiness.Score'
+        frames.append(pd.DataFrame({'Country': df['Country'], 'Year': int(name[:4]), 'Value': df[score]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def long_freedom(data: Data) -> pd.DataFrame:
+    """
+    The function to keep the year, countries and hf_score columns of the human freedom index as Country, Year and Value
+
+    :param data: the Data object to load from
+    :return: long format Data Frame of the human freedom score
+    """
+    df = data.get_freedom()
+    return pd.DataFrame({'Country': df['countries'], 'Year': df['year'], 'Value': df['hf_score']})
+
+
+def long_innovation(data: Data) -> pd.DataFrame:
+    """
+    The function to stack the yearly innovation files into Country, Year and Value
+
+    :param data: the Data object to load from
+    :return: long format Data Frame of the innovation score
+    """
+    frames = []
+    for name, df in sorted(data.get_innovation().items()):
+        year = int(name[len('Innovation-'):len('Innovation-') + 4])
+        frames.append(pd.DataFrame({'Country': df['Economy'], 'Year': year, 'Value': df['Score']}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def long_marriage(data: Data) -> pd.DataFrame:
+    """
+    The function to turn the UN marital status data into the marriage rate as Country, Year and Value
+
+    :param data: the Data object to load from
+    :return: long format Data Frame of the marriage rate
+    """
+    married = data.get_marital().astype({"Year": int}, copy=False)
+    rates = marriage_rate_table(married)
+    return pd.DataFrame({'Country': rates['Country'], 'Year': rates['Year'], 'Value': rates['Marriage_Rate']})
+
+
+# indicator name -> function making its long format frame, in the order of the hierarchy of needs
+SOURCES = {
+    'undernourishment': long_hunger,
+    'peace': long_peace,
+    'marriage': long_marriage,
+    'happiness': long_happiness,
+    'freedom': long_freedom,
+    'innovation': long_innovation,
+}
+
+# the marital status files are not shipped with the datasets, so the marriage rate is only loaded on request
+DEFAULT_INDICATORS = ['undernourishment', 'peace', 'happiness', 'freedom', 'innovation']
+
+
+class Panel(object):
+    """
+    Long format store of every indicator keyed by (country, year, indicator), backed by compact numpy arrays.
+
+    Countries and indicators are kept as integer codes into the countries and indicators lists, years as int16.
+    When the panel is built with a CountryIndex, the countries are the ISO3 codes of the names (names keeps one
+    display name per country), so the different spellings of the datasets end up on the same row.
+    Next to the long arrays, the panel keeps a dense cube of shape (indicator, country, year) filled with NaN where a
+    value is missing, so two indicators of one year are aligned by slicing the cube on the shared country axis
+    instead of merging two frames on the country names.
+
+    >>> frames = {'peace': pd.DataFrame({'Country': ['A', 'B'], 'Year': [2015, 2015], 'Value': [1.5, 2.5]}),
+    ...           'freedom': pd.DataFrame({'Country': ['B', 'C', 'A'], 'Year': [2015, 2015, 2016],
+    ...                                    'Value': [6.0, 7.0, 8.0]})}
+    >>> panel = Panel.from_frames(frames)
+    >>> panel.countries, panel.years
+    (['A', 'B', 'C'], [2015, 2016])
+    >>> panel.cube.shape
+    (2, 3, 2)
+    >>> panel.pair('peace', 'freedom', 2015)
+    (array([2.5]), array([6.]))
+    """
+    def __init__(self: object, countries: list, indicators: list, country: np.ndarray, year: np.ndarray,
+                 indicator: np.ndarray, value: np.ndarray, names: list = None, cube: np.ndarray = None,
+                 year0: int = None):
+        self.countries = list(countries)
+        self.names = list(names) if names is not None else list(self.countries)
+        self.indicators = list(indicators)
+        self.country = country
+        self.year = year
+        self.indicator = indicator
+        self.value = value
+        if cube is not None:
+            self.year0 = year0
+            self.cube = cube
+            return
+        if len(year):
+            self.year0 = int(year.min())
+            n_years = int(year.max()) - self.year0 + 1
+        else:
+            self.year0 = 0
+            n_years = 0
+        self.cube = np.full((len(self.indicators), len(self.countries), n_years), np.nan)
+        self.cube[indicator, country, year - self.year0] = value
+
+    @property
+    def years(self: object) -> list:
+        return list(range(self.year0, self.year0 + self.cube.shape[2]))
+
+    @classmethod
+    def from_frames(cls, frames: dict, index: CountryIndex = None):
+        """
+        The function to build the panel from long format frames
+
+        Rows without a country, a year or a value are dropped. When a (country, year, indicator) key appears more than
+        once, the first value is kept.
+
+        :param frames: dict of indicator name -> Data Frame with the columns Country, Year and Value
+        :param index: CountryIndex used to replace the country names by ISO3 codes, None to keep the names
+        :return: the Panel
+        """
+        indicators = list(frames)
+        parts = []
+        for code, name in enumerate(indicators):
+            df = frames[name][['Country', 'Year', 'Value']]
+            df = df.assign(Value=pd.to_numeric(df['Value'], errors='coerce')).dropna()
+            parts.append(df.assign(Indicator=code))
+        long = pd.concat(parts, ignore_index=True)
+        if index is None:
+            keys = long['Country'].astype(str)
+        else:
+            keys = pd.Series(index.canonical(long['Country']))
+        country_codes, countries = pd.factorize(keys, sort=True)
+        country = country_codes.astype(np.int32)
+        year = long['Year'].to_numpy().astype(np.int16)
+        indicator = long['Indicator'].to_numpy().astype(np.int8)
+        value = long['Value'].to_numpy(dtype=float)
+        key = (indicator.astype(np.int64) * len(countries) + country) * 65536 + (year.astype(np.int64) - year.min())
+        _, first = np.unique(key, return_index=True)
+        names = None if index is None else [index.name(code) for code in countries]
+        return cls(countries, indicators, country[first], year[first], indicator[first], value[first], names)
+
+    @classmethod
+    def from_data(cls, data: Data = None, indicators: list = None, index: CountryIndex = None):
+        """
+        The function to normalize the output of the Data loaders into one panel, with the countries matched on their
+        ISO3 codes
+
+        :param data: the Data object to load from, a new one on the default data folder if missing
+        :param indicators: names of the indicators to load, taken from SOURCES (default DEFAULT_INDICATORS)
+        :param index: CountryIndex of the country names, built from the datasets of the indicators if missing
+        :return: the Panel
+
+        >>> panel = Panel.from_data()
+        >>> panel.indicators
+        ['undernourishment', 'peace', 'happiness', 'freedom', 'innovation']
+        >>> x, y = panel.pair('peace', 'happiness', 2016)
+        >>> len(x) == len(y) > 100
+        True
+        >>> panel.names[panel.countries.index('CIV')]
+        "Cote d'Ivoire"
+        """
+        if data is None:
+            data = Data()
+        if indicators is None:
+            indicators = DEFAULT_INDICATORS
+        if index is None:
+            index = CountryIndex.from_data(data, indicators)
+        return cls.from_frames({name: SOURCES[name](data) for name in indicators}, index)
+
+    def code(self: object, indicator: str) -> int:
+        """
+        The function to look up the integer code of an indicator
+
+        :param indicator: indicator name
+        :return: position of the indicator in the cube
+        """
+        if indicator not in self.indicators:
+            raise KeyError('indicator %r is not in the panel %s' % (indicator, self.indicators))
+        return self.indicators.index(indicator)
+
+    def series(self: object, indicator: str, year: int) -> np.ndarray:
+        """
+        The function to get the values of one indicator in one year for every country of the panel, NaN where missing
+
+        :param indicator: indicator name
+        :param year: year
+        :return: view into the cube, indexed by country code
+        """
+        j = year - self.year0
+        if not 0 <= j < self.cube.shape[2]:
+            return np.full(len(self.countries), np.nan)
+        return self.cube[self.code(indicator), :, j]
+
+    def pair(self: object, lower: str, higher: str, year: int) -> (np.ndarray, np.ndarray):
+        """
+        The function to get the lower and higher level data of one year, like sorted_pairs: the countries missing either
+        value are masked out and the remaining pairs are sorted by the lower level value
+
+        :param lower: name of the lower level indicator
+        :param higher: name of the higher level indicator
+        :param year: year
+        :return: contiguous float arrays of the lower level data (sorted) and the corresponding higher level data
+        """
+        x = self.series(lower, year)
+        y = self.series(higher, year)
+        keep = ~(np.isnan(x) | np.isnan(y))
+        x = x[keep]
+        y = y[keep]
+        order = np.argsort(x, kind='stable')
+        return np.ascontiguousarray(x[order]), np.ascontiguousarray(y[order])
+
+    def frame(self: object, indicators: list, year: int) -> pd.DataFrame:
+        """
+        The function to get the wide Data Frame of some indicators in one year, one row per country having all of them
+
+        :param indicators: indicator names, used as the column names
+        :param year: year
+        :return: Data Frame with a Country column and one column per indicator
+        """
+        values = np.column_stack([self.series(name, year) for name in indicators])
+        keep = ~np.isnan(values).any(axis=1)
+        df = pd.DataFrame(values[keep], columns=indicators)
+        df.insert(0, 'Country', np.asarray(self.names, dtype=object)[keep])
+        return df
+
+    def to_frame(self: object) -> pd.DataFrame:
+        """
+        The function to get the long format Data Frame of the panel, with categorical country and indicator columns
+
+        :return: Data Frame with the columns Country (display names), Year, Indicator and Value
+        """
+        return pd.DataFrame({
+            'Country': pd.Categorical.from_codes(self.country, self.names),
+            'Year': self.year,
+            'Indicator': pd.Categorical.from_codes(self.indicator, self.indicators),
+            'Value': self.value,
+        })
+
+    def save(self: object, directory: str):
+        """
+        The function to write the panel to a folder as one .npy file per array and a json file with the labels, so
+        other processes can map the arrays into memory with load instead of receiving pickled copies
+
+        :param directory: folder to write to, created if missing
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in ['cube', 'country', 'year', 'indicator', 'value']:
+            np.save(os.path.join(directory, name + '.npy'), getattr(self, name))
+        labels = {'countries': self.countries, 'names': self.names, 'indicators': self.indicators,
+                  'year0': self.year0}
+        with open(os.path.join(directory, 'panel.json'), 'w') as f:
+            json.dump(labels, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = 'r'):
+        """
+        The function to open a panel written by save, with its arrays memory-mapped read-only by default
+
+        :param directory: folder written by save
+        :param mmap_mode: mode passed to np.load, None to read the arrays into memory
+        :return: the Panel
+
+        >>> import tempfile
+        >>> frames = {'peace': pd.DataFrame({'Country': ['A', 'B'], 'Year': [2015, 2016], 'Value': [1.5, 2.5]})}
+        >>> directory = tempfile.mkdtemp()
+        >>> Panel.from_frames(frames).save(directory)
+        >>> panel = Panel.load(directory)
+        >>> type(panel.cube).__name__, panel.series('peace', 2016)
+        ('memmap', memmap([nan, 2.5]))
+        """
+        with open(os.path.join(directory, 'panel.json')) as f:
+            labels = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+                  for name in ['cube', 'country', 'year', 'indicator', 'value']}
+        return cls(labels['countries'], labels['indicators'], arrays['country'], arrays['year'], arrays['indicator'],
+                   arrays['value'], labels['names'], arrays['cube'], labels['year0'])
@@ -0,0 +1,230 @@
+# Process pool runner of the analysis parts of the driver script, run with: python PR_Final_WinYaoPhil_parallel.py
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import PR_Final_WinYaoPhil_functions as functions
+from PR_Final_WinYaoPhil_functions import Data, render
+from PR_Final_WinYaoPhil_panel import Panel
+from PR_Final_WinYaoPhil_levels import LEVEL_PAIRS, pair_arrays, pair_years
+
+# the parts of the driver script: the level pair of LEVEL_PAIRS, the plot functions taking (x_list, y_list), the box
+# plot function with the column names of the merged frames it reads (%d is the year), and whether it reads one wide
+# frame or a list of frames, one per year
+PARTS = {
+    '12': {'plots': ['plot12', 'plot_cat12'], 'box_plot': 'box_plot_level12',
+           'columns': ('undernourishment_rate_%d', 'pi_%d'), 'wide': True},
+    '23': {'plots': ['plot_level_23'], 'box_plot': None, 'columns': None, 'wide': False},
+    'ph': {'plots': ['plot_level_p_h', 'plot_cat_ph'], 'box_plot': 'box_plot_level_ph',
+           'columns': ('pi_%d', 'Happiness Score'), 'wide': False},
+    'hf': {'plots': ['plot_level_h_f', 'plot_cat_hf'], 'box_plot': 'box_plot_level_hf',
+           'columns': ('Happiness Score', 'Human_Freedom_Score'), 'wide': False},
+    '24': {'plots': ['plot_level_24', 'plot_cat24'], 'box_plot': 'box_plot_level24',
+           'columns': ('pi_%d', 'Human_Freedom_Score'), 'wide': False},
+    '45': {'plots': ['plot45', 'plot45_cat'], 'box_plot': 'box_plot_45',
+           'columns': ('hf_score', 'Score%d'), 'wide': False},
+    '14': {'plots': ['plot_14', 'plot_cat_level14'], 'box_plot': 'box_plot_level14',
+           'columns': ('undernourishment_rate_%d', 'Human_Freedom_Score'), 'wide': False},
+    '15': {'plots': ['plot_15', 'plot_cat_level15'], 'box_plot': 'box_plot_level15',
+           'columns': ('undernourishment_rate_%d', 'Score%d'), 'wide': False},
+}
+
+# part 2 needs the marital status files, which are not shipped with the datasets
+DEFAULT_PARTS = ['12', 'ph', 'hf', '24', '45', '14', '15']
+
+
+def column(template: str, year: int) -> str:
+    """
+    The function to fill the year into a column name of PARTS
+
+    :param template: column name, with %d where the year goes
+    :param year: year
+    :return: the column name
+
+    >>> column('pi_%d', 2015), column('Happiness Score', 2015)
+    ('pi_2015', 'Happiness Score')
+    """
+    return template % year if '%d' in template else template
+
+
+def part_frames(panel: Panel, name: str, years: list = None):
+    """
+    The function to make, from the panel, the merged frames read by the box plot function of a part, with the column
+    names of the original analysis_* functions
+
+    :param panel: the Panel
+    :param name: key of PARTS
+    :param years: years to draw, the others of the part are left empty; every year if None
+    :return: one wide Data Frame, or a list of Data Frames with one per year
+
+    >>> panel = Panel.from_data()
+    >>> frames = part_frames(panel, 'ph')
+    >>> len(frames), list(frames[0].columns)
+    (3, ['Country', 'pi_2015', 'Happiness Score'])
+    """
+    pair = LEVEL_PAIRS[name]
+    lower, higher = PARTS[name]['columns']
+    frames = []
+    for year in pair_years(panel, pair):
+        df = pd.DataFrame({'Country': panel.names,
+                           column(lower, year): panel.series(pair.lower, year),
+                           column(higher, year): panel.series(pair.higher, year)})
+        if years is not None and year not in years:
+            df.iloc[:, 1:] = float('nan')
+        frames.append(df)
+    if not PARTS[name]['wide']:
+        return [df.dropna().reset_index(drop=True) for df in frames]
+    wide = frames[0]
+    for df in frames[1:]:
+        wide = pd.concat([wide, df.drop(columns='Country')], axis=1)
+    return wide.dropna(how='all', subset=wide.columns[1:]).reset_index(drop=True)
+
+
+def part_tasks(parts: list) -> list:
+    """
+    The function to split the parts into independent tasks, one per figure, so the pool can use more processes than
+    there are parts
+
+    :param parts: keys of PARTS
+    :return: list of (part, plot function name) tuples
+
+    >>> part_tasks(['hf'])
+    [('hf', 'plot_level_h_f'), ('hf', 'plot_cat_hf'), ('hf', 'box_plot_level_hf')]
+    """
+    tasks = []
+    for name in parts:
+        for plot in PARTS[name]['plots']:
+            tasks.append((name, plot))
+        if PARTS[name]['box_plot'] is not None:
+            tasks.append((name, PARTS[name]['box_plot']))
+    return tasks
+
+
+def start_worker():
+    """
+    The function run once in every worker process: the warnings of the plot functions are silenced
+    """
+    warnings.filterwarnings('ignore')
+
+
+def run_task(name: str, plot: str, panel_dir: str, out_dir: str, fmt: str = 'png', dpi: float = None,
+             years: list = None) -> dict:
+    """
+    The function run by the worker processes: the panel arrays are memory-mapped from panel_dir, the data of the part
+    is aligned by the level pair engine, and the figure drawn by the plot function is written to out_dir by the
+    headless renderer, which keeps its template figures for the next tasks of the same worker
+
+    :param name: key of PARTS
+    :param plot: name of the plot function in PR_Final_WinYaoPhil_functions
+    :param panel_dir: folder written by Panel.save
+    :param out_dir: folder of the figures
+    :param fmt: 'png' or 'svg'
+    :param dpi: resolution of the written figures, the one of the figure if None
+    :param years: years to draw, the others of the part are left empty so the plots keep their year labels; every
+    year if None
+    :return: dict with the part, the plot, the start and end time, the files written, whether the image came from
+    the plot cache and the error if any
+    """
+    start = time.time()
+    error = None
+    render.start(out_dir, fmt, dpi, prefix=name + '_')
+    written = len(render.files)
+    hits = render.hits
+    try:
+        panel = Panel.load(panel_dir)
+        if plot == PARTS[name]['box_plot']:
+            getattr(functions, plot)(part_frames(panel, name, years))
+        else:
+            part_years, x_list, y_list = pair_arrays(panel, LEVEL_PAIRS[name])
+            if years is not None:
+                x_list = [x if year in years else x[:0] for year, x in zip(part_years, x_list)]
+                y_list = [y if year in years else y[:0] for year, y in zip(part_years, y_list)]
+            getattr(functions, plot)(x_list, y_list)
+    except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+        render.stop()
+    files = render.files[written:]
+    return {'part': name, 'plot': plot, 'start': start, 'end': time.time(), 'files': files,
+            'cached': render.hits > hits, 'error': error}
+
+
+def run_parallel(parts: list = None, out_dir: str = 'figures', fmt: str = 'png', jobs: int = None,
+                 dpi: float = None, data: Data = None) -> pd.DataFrame:
+    """
+    The function to run analysis parts and render their figures in a pool of processes. The panel of the indicators
+    is built once in this process and written to a temporary folder as .npy files, which every worker maps into memory
+    instead of receiving a pickled copy of the data.
+
+    :param parts: keys of PARTS, DEFAULT_PARTS if None
+    :param out_dir: folder of the figures, created if missing
+    :param fmt: 'png' or 'svg'
+    :param jobs: number of worker processes, the number of cores if None
+    :param dpi: resolution of the written figures, the one of each figure if None
+    :param data: the Data object to load from, a new one on the default data folder if missing
+    :return: Data Frame of the tasks with their part, plot, wall time in seconds, files, cache hit and error
+
+    >>> import tempfile
+    >>> timings = run_parallel(['hf'], out_dir=tempfile.mkdtemp(), jobs=2, dpi=5)
+    >>> list(timings['plot']), timings['error'].isna().all()
+    (['plot_level_h_f', 'plot_cat_hf', 'box_plot_level_hf'], True)
+    """
+    if parts is None:
+        parts = DEFAULT_PARTS
+    if data is None:
+        data = Data()
+    indicators = []
+    for name in parts:
+        for indicator in [LEVEL_PAIRS[name].lower, LEVEL_PAIRS[name].higher]:
+            if indicator not in indicators:
+                indicators.append(indicator)
+    panel = Panel.from_data(data, indicators)
+    os.makedirs(out_dir, exist_ok=True)
+    panel_dir = tempfile.mkdtemp(prefix='panel-')
+    try:
+        panel.save(panel_dir)
+        del panel
+        tasks = part_tasks(parts)
+        # the box plots take several times longer than the other figures, so they are started first
+        first = sorted(tasks, key=lambda task: task[1] != PARTS[task[0]]['box_plot'])
+        with ProcessPoolExecutor(max_workers=jobs, initializer=start_worker) as pool:
+            futures = {task: pool.submit(run_task, task[0], task[1], panel_dir, out_dir, fmt, dpi) for task in first}
+            results = [futures[task].result() for task in tasks]
+    finally:
+        shutil.rmtree(panel_dir, ignore_errors=True)
+    timings = pd.DataFrame(results)
+    timings['seconds'] = timings['end'] - timings['start']
+    return timings[['part', 'plot', 'start', 'end', 'seconds', 'files', 'cached', 'error']]
+
+
+def part_times(timings: pd.DataFrame) -> pd.DataFrame:
+    """
+    The function to sum up the task timings of run_parallel per part: the wall time of a part goes from the start of
+    its first task to the end of its last task
+
+    :param timings: Data Frame returned by run_parallel
+    :return: Data Frame with the wall time, the busy time (sum of the task times) and the number of failed tasks per part
+
+    >>> timings = pd.DataFrame({'part': ['12', '12', 'hf'], 'start': [0., 1., 0.], 'end': [2., 4., 1.],
+    ...                         'seconds': [2., 3., 1.], 'error': [None, None, 'KeyError']})
+    >>> part_times(timings).to_dict('index')
+    {'12': {'wall': 4.0, 'busy': 5.0, 'errors': 0}, 'hf': {'wall': 1.0, 'busy': 1.0, 'errors': 1}}
+    """
+    grouped = timings.groupby('part', sort=False)
+    return pd.DataFrame({'wall': grouped['end'].max() - grouped['start'].min(),
+                         'busy': grouped['seconds'].sum(),
+                         'errors': grouped['error'].count()})
+
+
+if __name__ == '__main__':
+    parts = sys.argv[1:] or None
+    start = time.time()
+    timings = run_parallel(parts)
+    print(part_times(timings).round(2).to_string())
+    for row in timings.dropna(subset=['error']).itertuples():
+        print('%s %s failed: %s' % (row.part, row.plot, row.error))
+    print('total wall time %.2fs on %d cores' % (time.time() - start, os.cpu_count()))
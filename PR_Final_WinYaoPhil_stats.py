@@ -0,0 +1,750 @@
+# Resampling and model fitting statistics of the level trends: bootstrap confidence intervals of the binned means,
+# batched fits of the hierarchy model curves, rank correlation and monotonicity tests and the search of the
+# satisfaction thresholds
+
+import numpy as np
+import pandas as pd
+from PR_Final_WinYaoPhil_functions import bin_index
+from PR_Final_WinYaoPhil_panel import Panel
+from PR_Final_WinYaoPhil_levels import LEVEL_INDICATORS, LEVEL_PAIRS, masked_ranks, pyramid_arrays, rank_bins
+
+# largest number of cells of one block of the bootstrap index matrix (replicates x values), about 64 MB of indices
+MAX_CELLS = 1 << 23
+
+# direction of satisfaction of every indicator: a lower undernourishment rate and a lower peace index are better
+SATISFACTION = {'undernourishment': -1, 'peace': -1, 'marriage': 1, 'happiness': 1, 'freedom': 1, 'innovation': 1}
+
+
+def bootstrap_means(values: np.ndarray, groups: np.ndarray, n_groups: int, n_boot: int = 2000, ci: float = 0.95,
+                    seed: int = 0) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    The bootstrap engine: the values of every group are resampled with replacement, within their group, n_boot times,
+    and the percentile confidence interval of the mean of every group is taken from the replicates.
+
+    The values are sorted by group so every group is one contiguous run. One matrix of uniform numbers with a row per
+    replicate and a column per value is turned into the index matrix of the resampled values (start of the group of
+    the value + a random offset below the size of the group), and np.add.reduceat sums the runs of every row. All the
+    groups and replicates are drawn at once; the replicates are only cut into blocks when the index matrix would hold
+    more than MAX_CELLS cells.
+
+    :param values: the values to resample
+    :param groups: the group of every value, from 0 to n_groups - 1
+    :param n_groups: number of groups
+    :param n_boot: number of bootstrap replicates
+    :param ci: coverage of the confidence interval
+    :param seed: seed of the random generator
+    :return: arrays of the mean, lower bound and upper bound of every group, NaN for empty groups
+
+    >>> mean, low, high = bootstrap_means(np.array([1., 2., 3., 10., 10.]), np.array([0, 0, 0, 2, 2]), 3, 1000)
+    >>> mean
+    array([ 2., nan, 10.])
+    >>> bool(1 <= low[0] < 2 < high[0] <= 3), low[2], high[2]
+    (True, 10.0, 10.0)
+    """
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups)
+    order = np.argsort(groups, kind='stable')
+    values = values[order]
+    groups = groups[order]
+    count = np.bincount(groups, minlength=n_groups)
+    start = np.cumsum(count) - count
+    mean = np.full(n_groups, np.nan)
+    low = np.full(n_groups, np.nan)
+    high = np.full(n_groups, np.nan)
+    filled = np.flatnonzero(count)
+    if filled.size == 0:
+        return mean, low, high
+    mean[filled] = np.add.reduceat(values, start[filled]) / count[filled]
+    value_start = start[groups]
+    value_count = count[groups]
+    rng = np.random.default_rng(seed)
+    means = np.empty((n_boot, filled.size))
+    block = max(1, MAX_CELLS // values.size)
+    for first in range(0, n_boot, block):
+        rows = min(block, n_boot - first)
+        index = value_start + (rng.random((rows, values.size)) * value_count).astype(np.int64)
+        means[first:first + rows] = np.add.reduceat(values[index], start[filled], axis=1) / count[filled]
+    low[filled], high[filled] = np.percentile(means, [50 * (1 - ci), 50 * (1 + ci)], axis=0)
+    return mean, low, high
+
+
+def bootstrap_bins(x_list: list, y_list: list, edges: list, n_boot: int = 2000, ci: float = 0.95,
+                   seed: int = 0) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    The function to get the bootstrap confidence intervals of the mean higher level value of every bin of the lower
+    level, for every year of a level pair at once: the countries are resampled within their bin and year
+
+    :param x_list: list of the lower level data, one array per year
+    :param y_list: list of the corresponding higher level data
+    :param edges: increasing bin edges, np.inf for an open last range (see bin_index)
+    :param n_boot: number of bootstrap replicates
+    :param ci: coverage of the confidence interval
+    :param seed: seed of the random generator
+    :return: matrices of the mean, lower bound and upper bound with one row per year and one column per bin
+
+    >>> mean, low, high = bootstrap_bins([np.array([1., 2., 6., 7.])], [np.array([10., 20., 1., 3.])], [0, 5, 10])
+    >>> mean, low.shape
+    (array([[15.,  2.]]), (1, 2))
+    """
+    n_bins = len(edges) - 1
+    values = []
+    groups = []
+    for year, (x, y) in enumerate(zip(x_list, y_list)):
+        bins = bin_index(x, edges)
+        y = np.asarray(y, dtype=float)
+        keep = (bins >= 0) & ~np.isnan(y)
+        values.append(y[keep])
+        groups.append(year * n_bins + bins[keep])
+    shape = (len(x_list), n_bins)
+    mean, low, high = bootstrap_means(np.concatenate(values) if values else np.empty(0),
+                                      np.concatenate(groups) if groups else np.empty(0, dtype=int),
+                                      shape[0] * n_bins, n_boot, ci, seed)
+    return mean.reshape(shape), low.reshape(shape), high.reshape(shape)
+
+
+def bootstrap_pyramid(panel: Panel, years: list = None, n_bins: int = 5, n_boot: int = 2000, ci: float = 0.95,
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    The function to get the bootstrap confidence intervals of the binned trends of every pair of levels in every year
+    in one run: the countries of every (pair, year) are cut into n_bins bins of equal count by the rank of the lower
+    level value, like the binned monotonicity of pyramid_matrix, and all the bins are resampled together
+
+    :param panel: the Panel
+    :param years: years to look at, every year of the panel by default
+    :param n_bins: number of bins per pair and year
+    :param n_boot: number of bootstrap replicates
+    :param ci: coverage of the confidence interval
+    :param seed: seed of the random generator
+    :return: long Data Frame with one row per pair of levels, year and bin: lower, higher, year, bin, count, mean, low
+    and high, for the pairs and years with at least n_bins countries
+
+    >>> bands = bootstrap_pyramid(Panel.from_data(), n_boot=200)
+    >>> list(bands.columns)
+    ['lower', 'higher', 'year', 'bin', 'count', 'mean', 'low', 'high']
+    >>> bool(((bands['low'] <= bands['mean']) & (bands['mean'] <= bands['high'])).all())
+    True
+    """
+    if years is None:
+        years = panel.years
+    keys, x, y, keep = pyramid_arrays(panel, years)
+    bins = rank_bins(masked_ranks(x, keep), keep, n_bins)
+    n_rows = x.shape[0]
+    groups = (np.arange(n_rows)[:, None] * n_bins + bins)[keep]
+    mean, low, high = bootstrap_means(y[keep], groups, n_rows * n_bins, n_boot, ci, seed)
+    count = np.bincount(groups, minlength=n_rows * n_bins)
+    bands = pd.DataFrame({'lower': np.repeat(keys['lower'], n_bins), 'higher': np.repeat(keys['higher'], n_bins),
+                          'year': np.repeat(keys['year'], n_bins), 'bin': np.tile(np.arange(n_bins), n_rows),
+                          'count': count, 'mean': mean, 'low': low, 'high': high})
+    enough = np.repeat(keep.sum(axis=1) >= n_bins, n_bins)
+    return bands[enough].reset_index(drop=True)
+
+
+def curve_bases(z: np.ndarray) -> list:
+    """
+    The function to compute the shape of every candidate curve of the hierarchy model on the lower level values scaled
+    to [0, 1]. Every model is y = a + b * shape(z), the shape having one or two nonlinear parameters that are searched
+    on a grid while a and b are solved by least squares:
+    linear: z;
+    hinge: max(z - c, 0), flat until the threshold c (the MinDemand of the model) and rising after it;
+    saturating: 1 - exp(-k z), rising quickly then leveling off;
+    logistic: 1 / (1 + exp(-k (z - c))), flat, rising around c, then flat again.
+
+    :param z: matrix of the scaled lower level values, one row per series
+    :return: list of (model, number of parameters, k of every shape, c of every shape, array of the shapes with the
+    grid on the first axis)
+
+    >>> [(model, n_params, shapes.shape) for model, n_params, k, c, shapes in curve_bases(np.zeros((2, 3)))]
+    [('linear', 2, (1, 2, 3)), ('hinge', 3, (40, 2, 3)), ('saturating', 3, (40, 2, 3)), ('logistic', 4, (336, 2, 3))]
+    """
+    c_hinge = np.linspace(0, 0.975, 40)
+    k_saturating = np.geomspace(0.1, 50, 40)
+    k_logistic, c_logistic = [grid.ravel() for grid in np.meshgrid(np.geomspace(2, 60, 16), np.linspace(0, 1, 21))]
+    with np.errstate(over='ignore'):
+        return [
+            ('linear', 2, np.array([np.nan]), np.array([np.nan]), z[None]),
+            ('hinge', 3, np.full(c_hinge.size, np.nan), c_hinge, np.maximum(z[None] - c_hinge[:, None, None], 0)),
+            ('saturating', 3, k_saturating, np.full(k_saturating.size, np.nan),
+             1 - np.exp(-k_saturating[:, None, None] * z[None])),
+            ('logistic', 4, k_logistic, c_logistic,
+             1 / (1 + np.exp(-k_logistic[:, None, None] * (z[None] - c_logistic[:, None, None])))),
+        ]
+
+
+def fit_curves(x: np.ndarray, y: np.ndarray, keep: np.ndarray, direction: np.ndarray = None) -> pd.DataFrame:
+    """
+    The function to fit every curve of curve_bases to every row of two matrices as one batched least squares problem.
+    The lower level values are turned in the direction of satisfaction and scaled to [0, 1] row by row. For every
+    model, the masked sums of every (grid point, row) give the closed form least squares a and b of y = a + b * shape
+    and the residual sum of squares all at once, and the grid point with the smallest one is kept for every row.
+
+    :param x: matrix of the lower level data, one row per series
+    :param y: matrix of the higher level data, same shape
+    :param keep: boolean matrix of the cells to use
+    :param direction: direction of satisfaction of the lower level of every row (1 or -1), 1 if None
+    :return: long Data Frame with one row per series and model: series, model, n, a, b, k, c, threshold (the c of
+    the hinge and logistic curves in the units of x), sse, rmse, r2, aic and the residuals of the kept cells
+    """
+    n_rows = x.shape[0]
+    direction = np.ones(n_rows) if direction is None else np.asarray(direction, dtype=float)
+    w = keep.astype(float)
+    n = w.sum(axis=1)
+    xs = np.where(keep, x * direction[:, None], np.nan)
+    low = np.nanmin(np.where(keep.any(axis=1)[:, None], xs, 0), axis=1)
+    span = np.nanmax(np.where(keep.any(axis=1)[:, None], xs, 0), axis=1) - low
+    span[span == 0] = 1
+    z = np.where(keep, (xs - low[:, None]) / span[:, None], 0)
+    y0 = np.where(keep, y, 0)
+    sum_y = y0.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sst = (y0 ** 2).sum(axis=1) - sum_y ** 2 / n
+    rows = []
+    for model, n_params, k, c, shapes in curve_bases(z):
+        sum_s = np.einsum('gsn,sn->gs', shapes, w)
+        sum_ss = np.einsum('gsn,gsn,sn->gs', shapes, shapes, w)
+        sum_sy = np.einsum('gsn,sn->gs', shapes, y0 * w)
+        den = n * sum_ss - sum_s ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            b = np.where(den > 1e-12 * n ** 2, (n * sum_sy - sum_s * sum_y) / den, 0.0)
+            a = (sum_y - b * sum_s) / n
+            sse = np.maximum(sst - b * (sum_sy - sum_s * sum_y / n), 0)
+        best = np.argmin(np.where(np.isnan(sse), np.inf, sse), axis=0)
+        pick = (best, np.arange(n_rows))
+        fitted = a[pick][:, None] + b[pick][:, None] * shapes[best, np.arange(n_rows)]
+        residuals = np.where(keep, y - fitted, np.nan)
+        for s in range(n_rows):
+            rows.append({'series': s, 'model': model, 'n': int(n[s]), 'a': a[pick][s], 'b': b[pick][s],
+                         'k': k[best[s]], 'c': c[best[s]],
+                         'threshold': direction[s] * (low[s] + c[best[s]] * span[s]), 'sse': sse[pick][s],
+                         'n_params': n_params, 'sst': sst[s], 'residuals': residuals[s][keep[s]]})
+    table = pd.DataFrame(rows)
+    table['rmse'] = np.sqrt(table['sse'] / table['n'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table['r2'] = 1 - table['sse'] / table['sst']
+        table['aic'] = table['n'] * np.log(table['sse'] / table['n']) + 2 * table['n_params']
+    table.loc[table['n'] <= table['n_params'], ['a', 'b', 'k', 'c', 'threshold', 'sse', 'rmse', 'r2', 'aic']] = np.nan
+    return table[['series', 'model', 'n', 'a', 'b', 'k', 'c', 'threshold', 'sse', 'rmse', 'r2', 'aic',
+                  'residuals']].sort_values(['series', 'model'], kind='stable').reset_index(drop=True)
+
+
+def fit_hierarchy(x_list: list, y_list: list, direction: int = 1) -> pd.DataFrame:
+    """
+    The function to fit the hierarchy model curves to the x_list and y_list of one analysis_* function, one series per
+    year
+
+    :param x_list: List of Lower Level Sorted data
+    :param y_list: List of corresponding higher level data
+    :param direction: 1 when a larger lower level value is more satisfied, -1 when a smaller one is
+    :return: Data Frame of fit_curves, the series being the positions in the lists
+
+    >>> x = np.linspace(0, 10, 50)
+    >>> fits = fit_hierarchy([x], [2 + 0.5 * np.maximum(x - 4, 0)]).set_index('model')
+    >>> round(fits.loc['hinge', 'threshold'], 1), round(fits.loc['hinge', 'b'] / 10, 2), fits['r2'].idxmax()
+    (4.0, 0.5, 'hinge')
+    """
+    x, y, keep = pad_lists(x_list, y_list)
+    return fit_curves(x, y, keep, np.full(len(x_list), direction))
+
+
+def fit_pyramid(panel: Panel, years: list = None) -> pd.DataFrame:
+    """
+    The function to fit the hierarchy model curves to every pair of levels in every year in one batched run, the lower
+    level being turned in its direction of satisfaction (see SATISFACTION)
+
+    :param panel: the Panel
+    :param years: years to look at, every year of the panel by default
+    :return: Data Frame of fit_curves with the lower level, higher level and year of every series, for the series with
+    more countries than the parameters of the model; rising tells if the higher level gets more satisfied past the
+    threshold
+
+    >>> fits = fit_pyramid(Panel.from_data())
+    >>> sorted(fits['model'].unique())
+    ['hinge', 'linear', 'logistic', 'saturating']
+    >>> bool((fits.groupby(['lower', 'higher', 'year'])['r2'].max() >= 0).all())
+    True
+    """
+    if years is None:
+        years = panel.years
+    keys, x, y, keep = pyramid_arrays(panel, years)
+    lower = np.array([SATISFACTION[LEVEL_INDICATORS[level]] for level in keys['lower']])
+    higher = np.array([SATISFACTION[LEVEL_INDICATORS[level]] for level in keys['higher']])
+    fits = fit_curves(x, y, keep, lower)
+    series = fits['series'].to_numpy()
+    fits.insert(0, 'lower', keys['lower'][series])
+    fits.insert(1, 'higher', keys['higher'][series])
+    fits.insert(2, 'year', keys['year'][series])
+    fits['rising'] = fits['b'] * higher[series] > 0
+    return fits[fits['sse'].notna()].drop(columns='series').reset_index(drop=True)
+
+
+def count_inversions(rows: np.ndarray) -> np.ndarray:
+    """
+    The function to count, for every row of a matrix, the pairs of positions i < j with row[i] > row[j], with the
+    bottom-up merge sort of Knight's algorithm run on all the rows at once. The values are replaced by their dense
+    ranks and the rows are padded to a power of two with a rank larger than all the others, then the sorted runs of
+    width 1, 2, 4... are merged pairwise by a stable argsort of every pair of runs (numpy's timsort merges the two
+    sorted runs of a pair in linear time, so every level costs O(n) and the whole count O(n log n)). A value of the
+    right run that lands at position p of the merged run and was at position j of its run has p - j values of the left
+    run before it, the other values of the left run are greater and form inversions with it. Equal values keep the
+    left run first, so they are not counted.
+
+    :param rows: matrix of the sequences, one per row (a single sequence is taken as one row)
+    :return: int array with the number of inversions of every row
+
+    >>> count_inversions(np.array([[3, 1, 2, 2], [1, 2, 3, 4], [4, 3, 2, 1]]))
+    array([3, 0, 6])
+    """
+    rows = np.atleast_2d(rows)
+    n_rows, n = rows.shape
+    size = 1
+    while size < n:
+        size *= 2
+    uniques, ranks = np.unique(rows, return_inverse=True)
+    runs = np.full((n_rows, size), uniques.size, dtype=np.int64)
+    runs[:, :n] = ranks.reshape(n_rows, n)
+    inversions = np.zeros(n_rows, dtype=np.int64)
+    width = 1
+    while width < size:
+        pairs = runs.reshape(-1, 2 * width)
+        order = np.argsort(pairs, axis=1, kind='stable')
+        position = np.empty_like(order)
+        np.put_along_axis(position, order, np.arange(2 * width), axis=1)
+        left_before = position[:, width:] - np.arange(width)
+        inversions += (width - left_before).reshape(n_rows, -1).sum(axis=1)
+        runs = np.take_along_axis(pairs, order, axis=1).reshape(n_rows, size)
+        width *= 2
+    return inversions
+
+
+def tied_pairs(rows: np.ndarray) -> np.ndarray:
+    """
+    The function to count the pairs of equal values of every row of a matrix of sorted rows
+
+    :param rows: matrix with every row sorted
+    :return: int array with the number of tied pairs of every row
+
+    >>> tied_pairs(np.array([[1, 1, 1, 2], [1, 2, 3, 3]]))
+    array([3, 1])
+    """
+    rows = np.atleast_2d(rows)
+    n_rows, n = rows.shape
+    new = np.ones(rows.shape, dtype=bool)
+    new[:, 1:] = rows[:, 1:] != rows[:, :-1]
+    run = np.cumsum(new.ravel()) - 1
+    lengths = np.bincount(run)
+    row_of_run = np.repeat(np.arange(n_rows), new.sum(axis=1))
+    return np.bincount(row_of_run, weights=lengths * (lengths - 1) // 2, minlength=n_rows).astype(np.int64)
+
+
+def kendall_rows(x_ranks: np.ndarray, y_rows: np.ndarray) -> np.ndarray:
+    """
+    The function to compute Kendall's tau-b of one x against every row of a matrix of y with Knight's O(n log n)
+    algorithm: the pairs are sorted by x then y, the discordant pairs are the inversions left in y (count_inversions,
+    a merge sort with linear merges), and the ties of x, of y and of both correct the count of the concordant pairs
+
+    :param x_ranks: dense ranks of x (0, 1, 2...), sorted
+    :param y_rows: matrix of the dense ranks of y, one row per variable, in the order of x_ranks
+    :return: array with Kendall's tau-b of every row, NaN for a constant variable
+
+    >>> kendall_rows(np.array([0, 1, 2, 3]), np.array([[0, 2, 1, 3], [3, 2, 1, 0]]))
+    array([ 0.66666667, -1.        ])
+    """
+    y_rows = np.atleast_2d(y_rows)
+    n = x_ranks.size
+    step = n + 1
+    keys = np.sort(x_ranks * step + y_rows, axis=1)
+    pairs = n * (n - 1) // 2
+    ties_x = tied_pairs(x_ranks)[0]
+    ties_y = tied_pairs(np.sort(y_rows, axis=1))
+    ties_xy = tied_pairs(keys)
+    swaps = count_inversions(keys % step)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (pairs - ties_x - ties_y + ties_xy - 2 * swaps) / np.sqrt((pairs - ties_x) * (pairs - ties_y))
+
+
+def kendall_tau(x: np.ndarray, y: np.ndarray) -> float:
+    """
+    The function to compute Kendall's tau-b of two variables in O(n log n) (kendall_rows)
+
+    :param x: lower level data
+    :param y: corresponding higher level data
+    :return: Kendall's tau-b, NaN for a constant variable
+
+    >>> kendall_tau([1., 2., 3., 4.], [1., 3., 2., 4.])
+    0.6666666666666666
+    >>> round(kendall_tau([1., 1., 2., 3.], [2., 1., 3., 3.]), 6)
+    0.8
+    """
+    x_ranks = np.unique(np.asarray(x, dtype=float), return_inverse=True)[1]
+    y_ranks = np.unique(np.asarray(y, dtype=float), return_inverse=True)[1]
+    order = np.argsort(x_ranks, kind='stable')
+    return float(kendall_rows(x_ranks[order], y_ranks[order])[0])
+
+
+def isotonic_fit(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    The function to fit the non-decreasing function of x closest to y in least squares with the pool-adjacent-violators
+    algorithm: the values are sorted by x, the values of tied x are pooled first, then every block lower than the one
+    before it is merged with it into their weighted mean, in one pass over the blocks
+
+    :param x: lower level data
+    :param y: corresponding higher level data
+    :return: array with the fitted value of every pair, in the order of x and y
+
+    >>> isotonic_fit([1., 2., 3., 4., 5.], [1., 3., 2., 4., 3.5])
+    array([1.  , 2.5 , 2.5 , 3.75, 3.75])
+    >>> isotonic_fit([2., 1., 1.], [5., 4., 2.])
+    array([5., 3., 3.])
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    uniques, x_ranks = np.unique(x, return_inverse=True)
+    sums = np.bincount(x_ranks, weights=y, minlength=uniques.size)
+    weights = np.bincount(x_ranks, minlength=uniques.size).astype(float)
+    block_sums = []
+    block_weights = []
+    block_ends = []
+    for i in range(uniques.size):
+        total, weight = sums[i], weights[i]
+        while block_sums and block_sums[-1] * weight >= total * block_weights[-1]:
+            total += block_sums.pop()
+            weight += block_weights.pop()
+            block_ends.pop()
+        block_sums.append(total)
+        block_weights.append(weight)
+        block_ends.append(i + 1)
+    means = np.array(block_sums) / np.array(block_weights)
+    fitted = np.repeat(means, np.diff(np.concatenate([[0], block_ends])))
+    return fitted[x_ranks]
+
+
+def monotonic_tests(x: np.ndarray, y: np.ndarray, direction: int = 1, n_perm: int = 2000, seed: int = 0) -> dict:
+    """
+    The function to test whether the higher level rises with the satisfaction of the lower level: Kendall's tau-b,
+    Spearman's rho and the share of the variance of y explained by the isotonic fit, with the one-sided permutation
+    p-values of tau and rho. The permutations of y are drawn in batches of rows of one matrix (at most MAX_CELLS cells),
+    and the tau of every row of a batch comes from one vectorized run of Knight's algorithm (kendall_rows) and the rho
+    from one matrix product.
+
+    :param x: lower level data
+    :param y: corresponding higher level data, a higher y being better, pairs with a NaN are dropped
+    :param direction: 1 when a higher x is better, -1 when a lower x is better, so that the statistics are positive
+    when the satisfaction of both levels rises together
+    :param n_perm: number of permutations
+    :param seed: seed of the random generator
+    :return: dict with n, tau, tau_p, rho, rho_p and isotonic_r2
+
+    >>> x = np.arange(50.)
+    >>> tests = monotonic_tests(x, np.sqrt(x) + np.random.default_rng(1).normal(0, .5, 50), n_perm=500)
+    >>> tests['tau'] > .5, tests['tau_p'], tests['rho_p'], tests['isotonic_r2'] > .8
+    (True, 0.001996007984031936, 0.001996007984031936, True)
+    >>> monotonic_tests(x, -x, n_perm=500)['tau_p']
+    1.0
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x = x[keep] * direction
+    y = y[keep]
+    n = x.size
+    if n < 3:
+        return {'n': n, 'tau': np.nan, 'tau_p': np.nan, 'rho': np.nan, 'rho_p': np.nan, 'isotonic_r2': np.nan}
+    x_ranks = np.unique(x, return_inverse=True)[1]
+    order = np.argsort(x_ranks, kind='stable')
+    x_ranks = x_ranks[order]
+    x = x[order]
+    y = y[order]
+    y_ranks = np.unique(y, return_inverse=True)[1]
+    average = masked_ranks(np.vstack([x, y]), np.ones((2, n), dtype=bool))
+    x_centered = average[0] - average[0].mean()
+    y_centered = average[1] - average[1].mean()
+    scale = np.sqrt((x_centered ** 2).sum() * (y_centered ** 2).sum())
+    tau = kendall_rows(x_ranks, y_ranks)[0]
+    rho = x_centered.dot(y_centered) / scale
+    fitted = isotonic_fit(x, y)
+    total = ((y - y.mean()) ** 2).sum()
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(n_perm, MAX_CELLS // n))
+    tau_hits = rho_hits = 0
+    for start in range(0, n_perm, batch):
+        # argsort of uniform numbers draws one permutation per row (Generator.permuted needs numpy 1.20)
+        permutations = np.argsort(rng.random((min(batch, n_perm - start), n)), axis=1)
+        # a small tolerance so that permutations tied with the data count as at least as extreme
+        tau_hits += (kendall_rows(x_ranks, y_ranks[permutations]) >= tau - 1e-12).sum()
+        rho_hits += (y_centered[permutations].dot(x_centered) / scale >= rho - 1e-12).sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r2 = 1 - ((y - fitted) ** 2).sum() / total
+    return {'n': n, 'tau': tau, 'tau_p': (1 + tau_hits) / (1 + n_perm), 'rho': rho,
+            'rho_p': (1 + rho_hits) / (1 + n_perm), 'isotonic_r2': r2}
+
+
+def trend_table(analyses: dict, n_perm: int = 2000, seed: int = 0) -> pd.DataFrame:
+    """
+    The function to test the monotonic trend of every year of the x/y pair lists returned by the analysis_* functions
+    (monotonic_tests), in the direction of satisfaction of their levels
+
+    :param analyses: dict from the keys of LEVEL_PAIRS to the (x_list, y_list) of their analysis_* function, one array
+    per year of the pair
+    :param n_perm: number of permutations of every test
+    :param seed: seed of the random generator
+    :return: Data Frame with the pair, the lower and higher indicators, the year, the number of countries and the
+    statistics and p-values of monotonic_tests, one row per pair and year
+
+    >>> x = np.arange(30.)
+    >>> table = trend_table({'12': ([x, x], [x, -x]), 'hf': ([x], [x])}, n_perm=200)
+    >>> table[['pair', 'year', 'n', 'tau', 'tau_p']]
+      pair  year   n  tau     tau_p
+    0   12  2010  30  1.0  0.004975
+    1   12  2011  30 -1.0  1.000000
+    2   hf  2015  30  1.0  0.004975
+    """
+    rows = []
+    for name, (x_list, y_list) in analyses.items():
+        pair = LEVEL_PAIRS[name]
+        for year, x, y in zip(pair.years, x_list, y_list):
+            tests = monotonic_tests(x, np.asarray(y, dtype=float) * SATISFACTION[pair.higher], SATISFACTION[pair.lower],
+                                    n_perm, seed)
+            rows.append(dict(pair=name, lower=pair.lower, higher=pair.higher, year=year, **tests))
+    return pd.DataFrame(rows, columns=['pair', 'lower', 'higher', 'year', 'n', 'tau', 'tau_p', 'rho', 'rho_p',
+                                       'isotonic_r2'])
+
+
+def trend_verdict(table: pd.DataFrame, alpha: float = 0.05) -> str:
+    """
+    The function to sum up the table of trend_table in one sentence
+
+    :param table: Data Frame returned by trend_table
+    :param alpha: significance level of the permutation tests
+    :return: the sentence
+
+    >>> table = pd.DataFrame({'pair': ['12', '12', 'hf'], 'tau': [.3, -.1, .5], 'tau_p': [.001, .8, .01],
+    ...                       'isotonic_r2': [.2, .1, .4]})
+    >>> trend_verdict(table)
+    'The higher level rises significantly with the lower one (Kendall tau, permutation p < 0.05) in 2 of 3 pair years, 1 of 2 pairs in every year; median tau 0.30, median isotonic R2 0.20'
+    """
+    significant = table['tau_p'] < alpha
+    pairs = significant.groupby(table['pair']).all()
+    return 'The higher level rises significantly with the lower one (Kendall tau, permutation p < %g) in %d of %d ' \
+           'pair years, %d of %d pairs in every year; median tau %.2f, median isotonic R2 %.2f' \
+           % (alpha, significant.sum(), len(table), pairs.sum(), len(pairs), table['tau'].median(),
+              table['isotonic_r2'].median())
+
+
+def trend_conclusion(table: pd.DataFrame, alpha: float = 0.05, majority: float = 0.5) -> str:
+    """
+    The function to draw the conclusion of the project from the table of trend_table, against its hypotheses: Maslow's
+    theory is right in all when every pair of levels rises significantly in every year, right to some extent when more
+    than the majority share of the pair years do, and not supported otherwise
+
+    :param table: Data Frame returned by trend_table
+    :param alpha: significance level of the permutation tests
+    :param majority: share of significant pair years above which the theory is right to some extent
+    :return: the conclusion, naming the pairs without a significant trend and the strongest pair
+
+    >>> table = pd.DataFrame({'pair': ['12', '12', 'hf', '23'], 'lower': ['undernourishment'] * 2 + ['happiness', 'peace'],
+    ...                       'higher': ['peace'] * 2 + ['freedom', 'marriage'], 'tau': [.3, .2, .5, .01],
+    ...                       'tau_p': [.001, .01, .01, .4]})
+    >>> trend_conclusion(table)
+    "Maslow's theory is right to some extent: the higher level rises significantly with the lower one in 3 of 4 pair years (Kendall tau, permutation p < 0.05), but not in every year for peace -> marriage. The strongest trend is happiness -> freedom (median tau 0.50)."
+    >>> trend_conclusion(table[table['pair'] != '23']).split(':')[0]
+    "Maslow's theory is right in all"
+    """
+    significant = table['tau_p'] < alpha
+    pairs = significant.groupby(table['pair'], sort=False).all()
+    names = table.groupby('pair', sort=False)[['lower', 'higher']].first()
+    names = names['lower'] + ' -> ' + names['higher']
+    tau = table.groupby('pair', sort=False)['tau'].median()
+    count = 'the higher level rises significantly with the lower one in %d of %d pair years (Kendall tau, ' \
+            'permutation p < %g)' % (significant.sum(), len(table), alpha)
+    if pairs.all():
+        text = "Maslow's theory is right in all: %s." % count
+    elif significant.mean() > majority:
+        text = "Maslow's theory is right to some extent: %s, but not in every year for %s." \
+               % (count, ', '.join(names[~pairs]))
+    else:
+        text = "Maslow's theory is not supported by the data: only %s." % count
+    return text + ' The strongest trend is %s (median tau %.2f).' % (names[tau.idxmax()], tau.max())
+
+
+def pad_lists(x_list: list, y_list: list) -> (np.ndarray, np.ndarray, np.ndarray):
+    """
+    The function to put the x_list and y_list of an analysis_* function into two matrices with one row per year,
+    padded with NaN
+
+    :param x_list: List of Lower Level Sorted data
+    :param y_list: List of corresponding higher level data
+    :return: the matrix of the lower level data, the one of the higher level data and the boolean matrix of the cells
+    where both are known
+
+    >>> x, y, keep = pad_lists([[1., 2.], [3.]], [[4., 5.], [6.]])
+    >>> keep
+    array([[ True,  True],
+           [ True, False]])
+    """
+    width = max([len(x) for x in x_list] + [0])
+    x = np.full((len(x_list), width), np.nan)
+    y = np.full((len(x_list), width), np.nan)
+    for i, (xi, yi) in enumerate(zip(x_list, y_list)):
+        x[i, :len(xi)] = xi
+        y[i, :len(yi)] = yi
+    return x, y, ~(np.isnan(x) | np.isnan(y))
+
+
+def split_fits(x: np.ndarray, y: np.ndarray, w: np.ndarray) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    """
+    The function to fit one least squares line to the cells before every split of sorted rows and one to the cells
+    after it, from the prefix sums of w, x, y, x * x, x * y and y * y along the rows: the sums of both sides of every
+    split are read from the prefix sums in O(1), so all the splits of a row of n cells cost O(n)
+
+    :param x: array of the lower level data, sorted along the last axis, 0 in the cells left out
+    :param y: array of the higher level data, same shape, 0 in the cells left out
+    :param w: array with 1 in the kept cells and 0 in the others, same shape
+    :return: arrays of the residual sum of squares of both lines, the slope of the left line and the one of the right
+    line at every split, the split after position i of the last axis being at i
+
+    >>> x = np.arange(6.)
+    >>> sse, left, right = split_fits(x, np.minimum(x, 2.5), np.ones(6))[:3]
+    >>> int(np.argmin(sse[:-1])), left[2], right[2]
+    (2, 1.0, 0.0)
+    """
+    moments = np.stack([w, x, y, x * x, x * y, y * y])
+    before = np.cumsum(moments, axis=-1)
+    after = before[..., -1:] - before
+    fits = []
+    for m, sx, sy, sxx, sxy, syy in (before, after):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            vxx = sxx - sx * sx / m
+            vxy = sxy - sx * sy / m
+            vyy = syy - sy * sy / m
+            slope = np.where(vxx > 1e-12 * np.maximum(sxx, 1), vxy / vxx, 0.0)
+        # an empty side, past the last cell, leaves nothing to fit
+        fits.append((np.where(m > 0, np.maximum(vyy - slope * vxy, 0), 0), slope))
+    return fits[0][0] + fits[1][0], fits[0][1], fits[1][1], before[0]
+
+
+def find_thresholds(x: np.ndarray, y: np.ndarray, keep: np.ndarray, direction: np.ndarray = None, min_size: int = 5,
+                    n_perm: int = 1000, seed: int = 0) -> pd.DataFrame:
+    """
+    The function to search the satisfaction threshold of every row of two matrices as a change point: the lower level
+    values of every row are turned in the direction of satisfaction and sorted, and every split between two distinct
+    values leaving min_size countries on both sides is tried at once (split_fits). The split with the smallest
+    residual sum of squares of the two lines is the threshold, and its F statistic against one line is compared with
+    the ones of n_perm samples where the residuals of the single line are shuffled among the countries of the row,
+    which keeps the linear trend but no threshold. All the rows and permutations are searched in batches of at most
+    MAX_CELLS cells.
+
+    :param x: matrix of the lower level data, one row per series
+    :param y: matrix of the higher level data, same shape
+    :param keep: boolean matrix of the cells to use
+    :param direction: direction of satisfaction of the lower level of every row (1 or -1), 1 if None
+    :param min_size: smallest number of countries on each side of the threshold
+    :param n_perm: number of permutations of the residuals
+    :param seed: seed of the random generator
+    :return: Data Frame with one row per series: series, n, threshold (in the units of x, halfway between the two
+    values around the split), n_before (the countries less satisfied than the threshold), slope_before and
+    slope_after (the slopes in the units of x), sse, sse_linear, f and p (the permutation p-value of f); the threshold
+    is NaN for the rows with less than 2 * min_size countries
+    """
+    n_rows, width = x.shape
+    direction = np.ones(n_rows) if direction is None else np.asarray(direction, dtype=float)
+    xs = np.where(keep, x * direction[:, None], np.inf)
+    order = np.argsort(xs, axis=1, kind='stable')
+    xs = np.take_along_axis(xs, order, axis=1)
+    w = np.take_along_axis(keep, order, axis=1).astype(float)
+    n = w.sum(axis=1)
+    # the rows are centered so that the prefix sums of the squares lose little precision
+    with np.errstate(invalid='ignore', divide='ignore'):
+        xs = np.where(w > 0, xs - np.nansum(np.where(w > 0, xs, 0), axis=1)[:, None] / n[:, None], 0)
+        ys = np.take_along_axis(np.where(keep, y, 0), order, axis=1)
+        ys = np.where(w > 0, ys - ys.sum(axis=1)[:, None] / n[:, None], 0)
+    sse, slope_before, slope_after, count = split_fits(xs, ys, w)
+    valid = (count >= min_size) & (count <= n[:, None] - min_size)
+    valid[:, :-1] &= xs[:, 1:] != xs[:, :-1]
+    valid[:, -1] = False
+    sse_linear = sse[:, -1]
+    fitted = slope_before[:, -1:] * xs * w
+    residuals = ys - fitted
+    best = np.argmin(np.where(valid, sse, np.inf), axis=1)
+    found = valid.any(axis=1)
+    rows = np.arange(n_rows)
+    sse_best = sse[rows, best]
+    dof = np.maximum(n - 4, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f = (sse_linear - sse_best) / 2 / (sse_best / dof)
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(n_perm, MAX_CELLS // (8 * n_rows * max(width, 1))))
+    hits = np.zeros(n_rows)
+    for start in range(0, n_perm, batch):
+        size = min(batch, n_perm - start)
+        # random keys sort the kept cells of every row among themselves, the left out cells stay at the end
+        shuffle = np.argsort(np.where(w > 0, rng.random((size, n_rows, width)), 2), axis=-1)
+        sample = fitted + np.take_along_axis(np.broadcast_to(residuals, shuffle.shape), shuffle, axis=-1) * w
+        sample_sse = split_fits(np.broadcast_to(xs, shuffle.shape), sample, np.broadcast_to(w, shuffle.shape))[0]
+        sample_best = np.where(valid, sample_sse, np.inf).min(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sample_f = (sample_sse[..., -1] - sample_best) / 2 / (sample_best / dof)
+        # a small tolerance so that samples tied with the data count as at least as extreme
+        hits += (sample_f >= f * (1 - 1e-9)).sum(axis=0)
+    x_sorted = np.take_along_axis(np.where(keep, x, np.nan), order, axis=1)
+    after = np.minimum(best + 1, width - 1)
+    table = pd.DataFrame({'series': rows, 'n': n.astype(int),
+                          'threshold': (x_sorted[rows, best] + x_sorted[rows, after]) / 2,
+                          'n_before': count[rows, best].astype(int),
+                          'slope_before': slope_before[rows, best] * direction,
+                          'slope_after': slope_after[rows, best] * direction,
+                          'sse': sse_best, 'sse_linear': sse_linear, 'f': f, 'p': (1 + hits) / (1 + n_perm)})
+    table.loc[~found, ['threshold', 'n_before', 'slope_before', 'slope_after', 'sse', 'f', 'p']] = np.nan
+    return table
+
+
+def threshold_hierarchy(x_list: list, y_list: list, direction: int = 1, min_size: int = 5,
+                        n_perm: int = 1000) -> pd.DataFrame:
+    """
+    The function to search the satisfaction threshold of the x_list and y_list of one analysis_* function, one series
+    per year, in one batched call of find_thresholds
+
+    :param x_list: List of Lower Level Sorted data
+    :param y_list: List of corresponding higher level data
+    :param direction: 1 when a larger lower level value is more satisfied, -1 when a smaller one is
+    :param min_size: smallest number of countries on each side of the threshold
+    :param n_perm: number of permutations of the residuals
+    :return: Data Frame of find_thresholds, the series being the positions in the lists
+
+    >>> x = np.linspace(0, 10, 60)
+    >>> noise = np.random.default_rng(0).normal(0, .1, 60)
+    >>> found = threshold_hierarchy([x, x], [np.where(x < 4, 1, 1 + (x - 4)) + noise, x / 2 + noise], n_perm=200)
+    >>> round(found['threshold'][0], 1), abs(round(found['slope_before'][0], 1)), (found['p'] < .05).tolist()
+    (4.0, 0.0, [True, False])
+    """
+    x, y, keep = pad_lists(x_list, y_list)
+    return find_thresholds(x, y, keep, np.full(len(x_list), direction), min_size, n_perm)
+
+
+def threshold_pyramid(panel: Panel, years: list = None, min_size: int = 5, n_perm: int = 1000) -> pd.DataFrame:
+    """
+    The function to search the satisfaction threshold of every pair of levels in every year in one batched call of
+    find_thresholds, the lower level being turned in its direction of satisfaction (see SATISFACTION)
+
+    :param panel: the Panel
+    :param years: years to look at, every year of the panel by default
+    :param min_size: smallest number of countries on each side of the threshold
+    :param n_perm: number of permutations of the residuals
+    :return: Data Frame of find_thresholds with the lower level, higher level and year of every series, for the
+    series with a threshold; rising tells if the higher level gets more satisfied faster past the threshold
+
+    >>> found = threshold_pyramid(Panel.from_data(), [2015, 2016], n_perm=100)
+    >>> found[['lower', 'higher', 'year']].head(2).to_dict('records')
+    [{'lower': 1, 'higher': 2, 'year': 2015}, {'lower': 1, 'higher': 2, 'year': 2016}]
+    >>> bool(found['p'].between(0, 1).all())
+    True
+    """
+    if years is None:
+        years = panel.years
+    keys, x, y, keep = pyramid_arrays(panel, years)
+    lower = np.array([SATISFACTION[LEVEL_INDICATORS[level]] for level in keys['lower']])
+    higher = np.array([SATISFACTION[LEVEL_INDICATORS[level]] for level in keys['higher']])
+    found = find_thresholds(x, y, keep, lower, min_size, n_perm)
+    found.insert(0, 'lower', keys['lower'])
+    found.insert(1, 'higher', keys['higher'])
+    found.insert(2, 'year', keys['year'])
+    found['rising'] = (found['slope_after'] - found['slope_before']) * lower * higher > 0
+    return found[found['threshold'].notna()].drop(columns='series').reset_index(drop=True)